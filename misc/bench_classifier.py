@@ -0,0 +1,66 @@
+import sys
+import glob
+import time
+import numpy as np
+
+from src.screen_reader import ScreenReader
+from src.infnotebook_compat import array_to_screen
+from src.logger import get_logger
+from src.classes import *
+logger = get_logger('bench_classifier')
+
+def detect_legacy(reader:ScreenReader):
+    '''従来のdetect_current_mode相当'''
+    if reader.is_result():
+        return detect_mode.result, None
+    elif reader.is_select():
+        return detect_mode.select, None
+    elif reader.is_option():
+        return detect_mode.option, None
+    else:
+        mode = reader.is_play()
+        if mode:
+            return detect_mode.play, mode
+        return detect_mode.init, None
+
+def bench(func, n:int) -> float:
+    '''1回あたりの所要時間(ms)'''
+    t0 = time.perf_counter()
+    for _ in range(n):
+        func()
+    return (time.perf_counter() - t0) * 1000 / n
+
+if __name__ == '__main__':
+    # 使い方: python -m misc.bench_classifier "debug/**/*.png"
+    pattern = sys.argv[1] if len(sys.argv) > 1 else 'debug/**/*.png'
+    n = 50
+    reader = ScreenReader()
+    files = glob.glob(pattern, recursive=True)
+    frames = []
+    for f in files:
+        reader.update_screen_from_file(f)
+        frames.append((f, reader.screen))
+    if not frames:
+        print(f'no images for {pattern}, using a random frame')
+        rng = np.random.default_rng(0)
+        frames.append(('random', array_to_screen(rng.integers(0, 256, (1080, 1920, 3), dtype=np.uint8))))
+
+    mismatch = 0
+    total_legacy = 0.0
+    total_new = 0.0
+    for f, screen in frames:
+        reader.update_screen(screen)
+        legacy = detect_legacy(reader)
+        new = reader.classify()
+        if legacy != new:
+            mismatch += 1
+            print(f'MISMATCH {f}: legacy={legacy}, new={new}')
+        t_legacy = bench(lambda: detect_legacy(reader), n)
+        t_new = bench(reader.classify, n)
+        total_legacy += t_legacy
+        total_new += t_new
+        print(f'{f}: {new[0].name:7s} legacy {t_legacy:.3f}ms, batched {t_new:.3f}ms')
+
+    print(f'frames={len(frames)}, mismatch={mismatch}')
+    print(f'average per frame: legacy {total_legacy/len(frames):.3f}ms, batched {total_new/len(frames):.3f}ms '
+          f'(x{total_legacy/max(total_new, 1e-9):.1f})')
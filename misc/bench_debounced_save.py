@@ -0,0 +1,64 @@
+import os
+import sys
+import time
+import shutil
+import tempfile
+
+from src.result_database import ResultDatabase
+from src.playlog_journal import PlaylogJournal
+from src.classes import *
+from src.logger import get_logger
+from misc.bench_playlog_backend import make_results
+logger = get_logger('bench_debounced_save')
+
+def run(n:int, songs:int, debounce_ms:int, journal:bool) -> tuple:
+    '''1曲ごとに従来と同じ回数(登録後、画像保存後、BPI取得後)save()を呼び、呼び出し側の待ち時間を測る。
+    Returns:
+        float: 1曲あたりのsave()の合計待ち時間(ms)
+        int: 実際の保存回数
+        float: 直近の保存の所要時間(ms)
+        int: 読み直した件数
+    '''
+    path = f'playlog_{debounce_ms}_{int(journal)}.infdc'
+    storage = PlaylogJournal(path, enabled=journal)
+    storage.write_snapshot(make_results(n))
+    rdb = ResultDatabase(storage=storage)
+    rdb.save_debounce_ms = debounce_ms
+    saves_before = rdb._saver.saves
+    waited = 0.0
+    for r in make_results(songs, seed=n + 1):
+        r.detect_mode = detect_mode.result
+        r.option.valid = True
+        r.timestamp = rdb.results[-1].timestamp + 1
+        rdb.add(r)
+        for _ in range(3):
+            t0 = time.perf_counter()
+            rdb.save()
+            waited += time.perf_counter() - t0
+            rdb.mark_updated(r)
+        time.sleep(0.05)
+    pending = rdb.save_pending
+    rdb.close()
+    saves = rdb._saver.saves - saves_before
+    loaded = len(PlaylogJournal(path, enabled=journal).load())
+    assert loaded == n + songs, (loaded, n + songs)
+    return waited * 1000 / songs, saves, rdb.last_save_ms, loaded, pending
+
+if __name__ == '__main__':
+    # 使い方: python -m misc.bench_debounced_save [件数] [曲数]
+    # save_debounce_msの有無で、1曲あたりのsave()の待ち時間(GUIスレッドが止まる時間)と実際の保存回数を比べる
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    songs = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    cwd = os.getcwd()
+    d = tempfile.mkdtemp()
+    try:
+        os.chdir(d)
+        for journal in (False, True):
+            for debounce_ms in (0, 1000):
+                waited, saves, last_ms, loaded, pending = run(n, songs, debounce_ms, journal)
+                print(f'journal={journal!s:5} debounce={debounce_ms:4}ms: save() wait {waited:8.2f}ms/song, '
+                      f'saves={saves:3} (requests={songs * 3}), last save {last_ms:7.1f}ms, '
+                      f'pending before close={pending}, reloaded {loaded} results')
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(d)
@@ -0,0 +1,69 @@
+import os
+import sys
+import time
+import pickle
+import shutil
+import tempfile
+
+from src import file_codec
+from src.logger import get_logger
+logger = get_logger('bench_file_codec')
+
+CODECS = ['none', 'zlib:1', 'zlib:6', 'zlib:9', 'lzma:0', 'lzma:6', 'bz2:1', 'bz2:9']
+TARGETS = ['playlog.infdc', 'songinfo.infdc', os.path.join('out', 'rival_log.infdc')]
+
+def load_objects(path:str) -> list:
+    '''ファイルに含まれるpickleのオブジェクトを全て読む(playlog.infdcはリザルトのlist + メタ情報)'''
+    objs = []
+    with file_codec.open_read(path) as f:
+        while True:
+            try:
+                objs.append(pickle.load(f))
+            except EOFError:
+                break
+    return objs
+
+def bench(objs:list, codec:str, tmpdir:str, repeat:int) -> tuple:
+    '''Returns: (保存の所要時間(ms), 読み込みの所要時間(ms), ファイルサイズ(byte))'''
+    path = os.path.join(tmpdir, f'bench_{codec.replace(":", "_")}.infdc')
+    t_save = t_load = 0.0
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        with file_codec.write_file(path, codec) as f:
+            for obj in objs:
+                pickle.dump(obj, f)
+        t1 = time.perf_counter()
+        loaded = load_objects(path)
+        t2 = time.perf_counter()
+        t_save += t1 - t0
+        t_load += t2 - t1
+    assert len(loaded) == len(objs)
+    return t_save * 1000 / repeat, t_load * 1000 / repeat, os.path.getsize(path)
+
+if __name__ == '__main__':
+    # 使い方: python -m misc.bench_file_codec [ファイル ...] [--repeat N]
+    # 実際のデータ(省略時はカレントディレクトリのplaylog.infdc、songinfo.infdc、out/rival_log.infdc)を
+    # 各圧縮形式で保存・読み込みし、所要時間とサイズを表示する。結果を見て設定のfile_codecを選ぶ。
+    args = sys.argv[1:]
+    repeat = 3
+    if '--repeat' in args:
+        i = args.index('--repeat')
+        repeat = int(args[i + 1])
+        del args[i:i + 2]
+    targets = args or [p for p in TARGETS if os.path.exists(p)]
+    if not targets:
+        print('対象のファイルがありません。inf_daken_counterのフォルダで実行するか、ファイルを指定してください')
+        sys.exit(1)
+    tmpdir = tempfile.mkdtemp()
+    try:
+        for path in targets:
+            t0 = time.perf_counter()
+            objs = load_objects(path)
+            t_current = (time.perf_counter() - t0) * 1000
+            print(f'{path}: {os.path.getsize(path):,} bytes, current load {t_current:.0f}ms')
+            for codec in CODECS:
+                t_save, t_load, size = bench(objs, codec, tmpdir, repeat)
+                mark = ' (default)' if codec == file_codec.DEFAULT_CODEC else ''
+                print(f'  {codec:7s}: save {t_save:8.1f}ms | load {t_load:8.1f}ms | {size:>12,} bytes{mark}')
+    finally:
+        shutil.rmtree(tmpdir)
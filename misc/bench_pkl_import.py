@@ -0,0 +1,72 @@
+import os
+import sys
+import time
+import random
+import pickle
+import shutil
+import tempfile
+
+from PySide6.QtCore import QCoreApplication
+
+from src.result_database import ResultDatabase
+from src.playlog_journal import PlaylogJournal
+from src.config_dialog import PklImportWorker
+from src.logger import get_logger
+from misc.bench_playlog_backend import make_results
+logger = get_logger('bench_pkl_import')
+
+LAMPS = ['FAILED', 'A-CLEAR', 'E-CLEAR', 'CLEAR', 'H-CLEAR', 'EXH-CLEAR', 'F-COMBO']
+CHARTS = ['SPN', 'SPH', 'SPA', 'DPN', 'DPH', 'DPA']
+
+def make_v2_items(n:int, seed:int=0) -> list:
+    '''v2のpklと同じ形式(長さ14)のリザルトを作る。同じものを2回ずつ含める'''
+    rng = random.Random(seed)
+    ret = []
+    for i in range(n // 2):
+        item = [None] * 14
+        item[1] = f'song{rng.randrange(5000)}'
+        item[2] = rng.choice(CHARTS)
+        item[3] = rng.randrange(500, 3000)
+        item[7] = rng.choice(LAMPS)
+        item[9] = rng.randrange(4000)
+        item[11] = rng.randrange(100)
+        item[-2] = rng.choice(['OFF', 'RANDOM', 'BATTLE, OFF', 'S-RANDOM'])
+        item[-1] = f'20{rng.randrange(10, 24)}-{rng.randrange(1, 13):02d}-{rng.randrange(1, 29):02d}-{rng.randrange(24):02d}-{rng.randrange(60):02d}'
+        ret += [item, list(item)]
+    return ret
+
+def run_import(pkl_path:str, n_log:int, legacy:bool) -> tuple:
+    '''n_log件のログにpklを取り込み、(所要時間(s), 登録数)を返す'''
+    storage = PlaylogJournal(f'playlog_{int(legacy)}.infdc', enabled=True)
+    storage.write_snapshot(make_results(n_log))
+    rdb = ResultDatabase(storage=storage)
+    if legacy: # 索引を使わない従来の重複確認
+        rdb._contains = lambda result: result in rdb.results
+    worker = PklImportWorker(pkl_path, rdb)
+    registered = []
+    worker.finished.connect(lambda n, total: registered.append(n))
+    t0 = time.perf_counter()
+    worker.run() # スレッドを起動せずにそのまま実行する
+    elapsed = time.perf_counter() - t0
+    rdb.close()
+    worker.deleteLater()
+    return elapsed, registered[0] if registered else None
+
+if __name__ == '__main__':
+    # 使い方: python -m misc.bench_pkl_import [取り込む件数] [既存ログの件数]
+    n_items = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    n_log = int(sys.argv[2]) if len(sys.argv) > 2 else 50000
+    app = QCoreApplication.instance() or QCoreApplication(sys.argv) # シグナルを使うため
+    cwd = os.getcwd()
+    d = tempfile.mkdtemp()
+    try:
+        os.chdir(d)
+        with open('import.pkl', 'wb') as f:
+            pickle.dump(make_v2_items(n_items), f)
+        t_legacy, n_legacy = run_import('import.pkl', n_log, legacy=True)
+        t_index, n_index = run_import('import.pkl', n_log, legacy=False)
+        print(f'import {n_items} items into {n_log} results: legacy {t_legacy:.2f}s ({n_legacy} registered), '
+              f'indexed {t_index:.2f}s ({n_index} registered), x{t_legacy/max(t_index, 1e-9):.1f}')
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(d)
@@ -0,0 +1,80 @@
+import os
+import sys
+import time
+import random
+import shutil
+import tempfile
+
+from src.result_database import ResultDatabase
+from src.playlog_journal import PlaylogJournal
+from src.playlog_sqlite import PlaylogSQLite
+from src.result import *
+from src.classes import *
+from src.logger import get_logger
+logger = get_logger('bench_playlog_backend')
+
+STYLES = [play_style.sp, play_style.dp]
+DIFFS = [difficulty.normal, difficulty.hyper, difficulty.another, difficulty.leggendaria]
+
+def make_results(n:int, seed:int=0) -> list:
+    '''5000曲x8譜面に散らばった、プレー画面/リザルト画面由来のリザルトを時刻順に作る'''
+    rng = random.Random(seed)
+    ret = []
+    t0 = 1500000000
+    for i in range(n):
+        title = f'song{rng.randrange(5000)}'
+        mode = detect_mode.play if i % 2 == 0 else detect_mode.result
+        judge = Judge(rng.randrange(2000), rng.randrange(500), rng.randrange(50), rng.randrange(20), rng.randrange(50), 0)
+        ret.append(OneResult(title=title, play_style=rng.choice(STYLES), difficulty=rng.choice(DIFFS),
+                             lamp=clear_lamp(rng.randrange(1, 8)), timestamp=t0 + i * 300, playspeed=None,
+                             option=PlayOption(None), judge=judge, score=rng.randrange(4000), bp=rng.randrange(100),
+                             detect_mode=mode))
+    return ret
+
+def timed(func, n:int=1) -> float:
+    t0 = time.perf_counter()
+    for _ in range(n):
+        func()
+    return (time.perf_counter() - t0) * 1000 / n
+
+def bench(name:str, storage, results:list, queries:list):
+    storage.write_snapshot(results)
+    t0 = time.perf_counter()
+    rdb = ResultDatabase(storage=storage)
+    t_load = (time.perf_counter() - t0) * 1000
+    t_search = timed(lambda: [rdb.search(title=t, style=s, difficulty=d) for t, s, d in queries]) / len(queries)
+    t_best = timed(lambda: [rdb.get_best(title=t, style=s, difficulty=d) for t, s, d in queries]) / len(queries)
+    # 直近1日のリザルト画面のリザルト(起動時の今日の更新・統計の表示で使う)。1回目は日時の索引の作成を含む
+    t_between = timed(lambda: rdb.results_between(results[-1].timestamp - 86400, None, detect_mode.result))
+    t_notes = timed(rdb._notes_by_date)
+    # 両方式で同じ結果になることの確認用
+    matched = sum(len(rdb.search(title=t, style=s, difficulty=d)) for t, s, d in queries)
+    notes = sum(rdb._notes_by_date().values())
+    recent = len(rdb.results_between(results[-1].timestamp - 86400, None, detect_mode.result))
+    extra = make_results(20, seed=1)
+    t_save = 0.0
+    for r in extra:
+        r.timestamp = results[-1].timestamp + 1
+        rdb.add(r)
+        t_save += timed(rdb.save)
+    rdb.close()
+    print(f'{name:8s}: load {t_load:8.0f}ms | search {t_search:7.2f}ms | get_best {t_best:7.2f}ms | '
+          f'recent results {t_between:7.2f}ms | _notes_by_date {t_notes:7.0f}ms | save after add {t_save/len(extra):7.2f}ms | '
+          f'matched={matched}, recent={recent}, notes={notes}')
+
+if __name__ == '__main__':
+    # 使い方: python -m misc.bench_playlog_backend [件数]
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 500_000
+    cwd = os.getcwd()
+    d = tempfile.mkdtemp()
+    try:
+        os.chdir(d) # playlog.infdcなどを上書きしないよう一時ディレクトリで動かす
+        results = make_results(n)
+        rng = random.Random(2)
+        queries = [(f'song{rng.randrange(5000)}', rng.choice(STYLES), rng.choice(DIFFS)) for _ in range(20)]
+        print(f'{n:,} results')
+        bench('pickle', PlaylogJournal('playlog.infdc', enabled=True), results, queries)
+        bench('sqlite', PlaylogSQLite('playlog.sqlite3'), results, queries)
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(d)
@@ -0,0 +1,50 @@
+import os
+import sys
+import time
+import shutil
+import tempfile
+
+from src.playlog_journal import PlaylogJournal
+from src.logger import get_logger
+from misc.veri_playlog_journal import make_result, add
+logger = get_logger('bench_playlog_journal')
+
+def bench(n:int, d:str):
+    results = [make_result(i) for i in range(n)]
+    path = os.path.join(d, f'playlog_{n}.infdc')
+
+    # 従来: 1曲ごとに全件をbz2(level 9)で書き出す
+    legacy = PlaylogJournal(path, enabled=False)
+    legacy.write_snapshot(results)
+    t_legacy = legacy.last_snapshot_ms
+
+    # ジャーナル: 1曲ごとに追記+fsync
+    j = PlaylogJournal(path, enabled=True)
+    results = j.load()
+    flush = []
+    for i in range(20):
+        add(j, results, make_result(n + i))
+        t0 = time.perf_counter()
+        j.flush()
+        flush.append((time.perf_counter() - t0) * 1000)
+
+    t0 = time.perf_counter()
+    loaded = PlaylogJournal(path, enabled=True).load()
+    t_load = (time.perf_counter() - t0) * 1000
+    assert len(loaded) == len(results)
+
+    t0 = time.perf_counter()
+    j.compact(lambda: results)
+    t_compact = (time.perf_counter() - t0) * 1000
+    print(f'n={n:>8,}: full save {t_legacy:8.0f}ms | journal flush avg {sum(flush)/len(flush):6.2f}ms '
+          f'max {max(flush):6.2f}ms | load(snapshot+journal) {t_load:8.0f}ms | compaction (background) {t_compact:8.0f}ms')
+
+if __name__ == '__main__':
+    # 使い方: python -m misc.bench_playlog_journal [件数 ...]
+    sizes = [int(x) for x in sys.argv[1:]] or [100_000, 1_000_000]
+    d = tempfile.mkdtemp()
+    try:
+        for n in sizes:
+            bench(n, d)
+    finally:
+        shutil.rmtree(d)
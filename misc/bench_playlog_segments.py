@@ -0,0 +1,102 @@
+import os
+import sys
+import time
+import random
+import shutil
+import datetime
+import tempfile
+
+from src.result_database import ResultDatabase
+from src.playlog_journal import PlaylogJournal
+from src.playlog_segments import PlaylogSegments
+from src.classes import *
+from src.logger import get_logger
+from misc.bench_playlog_backend import make_results, STYLES, DIFFS
+logger = get_logger('bench_playlog_segments')
+
+def make_history(n:int, years:int) -> list:
+    '''現在までのyears年間に散らばったリザルトを作る(最新のものが現在)'''
+    results = make_results(n)
+    now = time.time()
+    span = years * 365 * 86400 / n
+    for i, r in enumerate(results):
+        r.timestamp = int(now - (n - i) * span)
+    return results
+
+def timed(func):
+    t0 = time.perf_counter()
+    ret = func()
+    return (time.perf_counter() - t0) * 1000, ret
+
+def startup(rdb:ResultDatabase, start_time:int):
+    '''MainWindow.__init__()で起動時にHTMLを更新する処理(broadcast_*の中身)'''
+    rdb.get_today_updates_data(start_time)
+    rdb.get_graph_data(start_time)
+    rdb.get_today_stats_data(start_time)
+
+def run(name:str, storage, queries:list) -> dict:
+    '''起動(MainWindowの初期化まで)、今日のノーツ数、譜面の検索、古い月の集計の各所要時間(初回)を測り、結果を返す。
+    自己ベストと日ごとの集計は、古いセグメントを読み込む前(ヘッダの要約から)の値を返す
+    '''
+    t_load, rdb = timed(lambda: ResultDatabase(storage=storage))
+    t_window, _ = timed(lambda: startup(rdb, int(time.time()) - 86400))
+    loaded = len(rdb.results)
+    best = {k: best_key(v) for k, v in rdb.get_all_best_results().items()}
+    notes_by_date = rdb._notes_by_date()
+    t_today, _ = timed(lambda: rdb._notes_since(time.time() - 86400))
+    t_search, _ = timed(lambda: rdb.search(title=queries[0][0], style=queries[0][1], difficulty=queries[0][2]))
+    after_search = len(rdb.results)
+    old = datetime.datetime.now() - datetime.timedelta(days=365 * 3)
+    t_old, _ = timed(lambda: rdb.get_monthly_notes(old))
+    after_old = len(rdb.results)
+    t_all, _ = timed(rdb.load_history)
+    ret = {
+        'search': [sorted(id_key(r.result) for r in rdb.search(title=t, style=s, difficulty=d)) for t, s, d in queries],
+        'monthly': rdb.get_monthly_notes(old),
+        'notes_by_date': notes_by_date,
+        'best': best,
+        'notes_by_date(loaded)': rdb._notes_by_date(),
+        'best(loaded)': {k: best_key(v) for k, v in rdb.get_all_best_results().items()},
+        'count': len(rdb.results),
+    }
+    rdb.close()
+    print(f'{name:8s}: startup {t_load + t_window:7.0f}ms (load {t_load:.0f}ms + window {t_window:.0f}ms, {loaded:,} results) | '
+          f'today {t_today:6.1f}ms | first search {t_search:6.1f}ms ({after_search:,}) | '
+          f'3 years ago {t_old:6.1f}ms ({after_old:,}) | load_history {t_all:6.0f}ms ({ret["count"]:,})')
+    return ret
+
+def id_key(r) -> tuple:
+    return (r.timestamp, r.title, r.play_style, r.difficulty, r.score)
+
+def best_key(best) -> tuple:
+    '''自己ベストの比較用(スコア・ランプ・BPと、同点時に上書きされるオプション・最終プレー日)'''
+    ret = [best.last_result and best.last_result.timestamp]
+    for r in (best.best_score_result, best.best_lamp_result, best.min_bp_result):
+        ret.append(None if r is None else (r.timestamp, r.score, r.lamp, r.bp, str(r.option), r.notes))
+    return tuple(ret)
+
+if __name__ == '__main__':
+    # 使い方: python -m misc.bench_playlog_segments [件数] [年数]
+    # 全件を読み込むPlaylogJournalと、直近の月だけを読み込むPlaylogSegmentsの起動時間(MainWindowの初期化の処理まで)・初回の参照時間を比べる
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 300_000
+    years = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    cwd = os.getcwd()
+    d = tempfile.mkdtemp()
+    try:
+        os.chdir(d)
+        results = make_history(n, years)
+        rng = random.Random(3)
+        queries = [(f'song{rng.randrange(5000)}', rng.choice(STYLES), rng.choice(DIFFS)) for _ in range(20)]
+        PlaylogJournal('playlog.infdc', enabled=True).write_snapshot(results)
+        print(f'{n:,} results over {years} years')
+        journal = run('pickle', PlaylogJournal('playlog.infdc', enabled=True), queries)
+        segments = PlaylogSegments('playlog_segments', recent_months=13)
+        t_migrate, _ = timed(lambda: ResultDatabase(storage=segments).close()) # playlog.infdcからの移行
+        print(f'migrate : {t_migrate:7.0f}ms, {len(segments.headers)} segments')
+        seg = run('segments', PlaylogSegments('playlog_segments', recent_months=13), queries)
+        ng = [key for key in journal if journal[key] != seg[key]]
+        print('all ok' if not ng else f'MISMATCH: {ng}')
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(d)
+    sys.exit(0 if not ng else 1)
@@ -0,0 +1,44 @@
+import os
+import sys
+import time
+import shutil
+import tempfile
+
+from src.result_database import ResultDatabase
+from src.playlog_journal import PlaylogJournal
+from src.classes import *
+from src.logger import get_logger
+from misc.bench_playlog_backend import make_results
+logger = get_logger('bench_result_add')
+
+if __name__ == '__main__':
+    # 使い方: python -m misc.bench_result_add [件数 ...]
+    # ログの件数ごとに、ResultDatabase.add()1回(保存を除く)とget_best()1回の所要時間を測る
+    sizes = [int(x) for x in sys.argv[1:]] or [10_000, 100_000, 500_000]
+    cwd = os.getcwd()
+    d = tempfile.mkdtemp()
+    try:
+        os.chdir(d)
+        for n in sizes:
+            storage = PlaylogJournal(f'playlog_{n}.infdc', enabled=True)
+            storage.write_snapshot(make_results(n))
+            rdb = ResultDatabase(storage=storage)
+            extra = make_results(50, seed=n)
+            t0 = time.perf_counter()
+            for r in extra:
+                rdb.get_best(title=r.title, style=r.play_style, difficulty=r.difficulty)
+            t_best = (time.perf_counter() - t0) * 1000 / len(extra)
+            elapsed = []
+            for r in extra: # リザルト画面由来として登録する(重複確認・自己ベスト取得を含む)
+                r.detect_mode = detect_mode.result
+                r.option.valid = True
+                r.timestamp = rdb.results[-1].timestamp + 1
+                t0 = time.perf_counter()
+                rdb.add(r)
+                elapsed.append((time.perf_counter() - t0) * 1000)
+            rdb.close()
+            elapsed.sort()
+            print(f'n={n:>8,}: add() median {elapsed[len(elapsed)//2]:8.3f}ms, max {elapsed[-1]:8.3f}ms | get_best() {t_best:8.3f}ms')
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(d)
@@ -0,0 +1,52 @@
+import os
+import gc
+import sys
+import time
+import shutil
+import tempfile
+import tracemalloc
+
+from src.playlog_journal import PlaylogJournal
+from src.result import share_play_options
+from src.logger import get_logger
+from misc.bench_playlog_backend import make_results
+logger = get_logger('bench_result_memory')
+
+def load(path:str) -> list:
+    '''ResultDatabase.load()と同じ手順でplaylog.infdcを読み込む'''
+    results = PlaylogJournal(path, enabled=False).load()
+    share_play_options(results)
+    return results
+
+def measure(path:str) -> tuple:
+    '''(読み込み時間(s), 読み込んだリザルトが占めるメモリ(MB), 件数)を返す'''
+    gc.collect()
+    t0 = time.perf_counter()
+    results = load(path)
+    t_load = time.perf_counter() - t0
+    n = len(results)
+    del results
+    gc.collect()
+    tracemalloc.start()
+    results = load(path)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return t_load, current / 1024 / 1024, n
+
+if __name__ == '__main__':
+    # 使い方: python -m misc.bench_result_memory [件数 or playlog.infdcのパス]
+    arg = sys.argv[1] if len(sys.argv) > 1 else '300000'
+    cwd = os.getcwd()
+    d = tempfile.mkdtemp()
+    try:
+        if os.path.exists(arg):
+            path = os.path.abspath(arg)
+        else:
+            path = os.path.join(d, 'playlog.infdc')
+            PlaylogJournal(path, enabled=False).write_snapshot(make_results(int(arg)))
+        os.chdir(d)
+        t_load, mb, n = measure(path)
+        print(f'{n} results: load {t_load:.2f}s, memory {mb:.1f}MB ({mb*1024*1024/max(n, 1):.0f} bytes/result)')
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(d)
@@ -0,0 +1,78 @@
+import sys
+import time
+import random
+
+from src.songinfo import SongDatabase, SongQuery, INDEXED_FIELDS
+from src.classes import *
+from src.logger import get_logger
+logger = get_logger('bench_song_query')
+
+def legacy_filter(sdb:SongDatabase, title:str=None, play_style:play_style=None, difficulty:difficulty=None, level:int=None) -> list:
+    '''索引を導入する前のfilter()(全譜面を走査する)'''
+    ret = []
+    for v in sdb.songs.values():
+        if title and v.title != title:
+            continue
+        if play_style and v.play_style != play_style:
+            continue
+        if difficulty and v.difficulty != difficulty:
+            continue
+        if level and v.level and level != v.level:
+            continue
+        ret.append(v)
+    return ret
+
+def linear_query(sdb:SongDatabase, query:SongQuery) -> list:
+    '''query()と同じ条件を全譜面の走査で判定する(比較用)'''
+    return [song for song in sdb.songs.values()
+            if all(SongQuery.match(cond, INDEXED_FIELDS[field](song)) for field, cond in query.conditions.items())]
+
+def timed(func, n:int) -> float:
+    t0 = time.perf_counter()
+    for _ in range(n):
+        func()
+    return (time.perf_counter() - t0) * 1e6 / n
+
+if __name__ == '__main__':
+    # 使い方: python -m misc.bench_song_query [繰り返し回数]
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    sdb = SongDatabase()
+    rng = random.Random(5)
+    titles = sorted({s.title for s in sdb.songs.values()})
+    filters = [
+        {'play_style': play_style.sp},
+        {'play_style': play_style.sp, 'level': 12},
+        {'play_style': play_style.dp, 'difficulty': difficulty.another, 'level': 11},
+        {'title': rng.choice(titles)},
+        {'title': rng.choice(titles), 'play_style': play_style.dp},
+        {'level': 5},
+    ]
+    queries = [
+        SongQuery(play_style=play_style.sp, level=12).where(sp12_hard={unofficial_difficulty.jiriki_a, unofficial_difficulty.jiriki_s_plus}),
+        SongQuery(play_style=play_style.sp, katate=lambda band: band is not None and band >= 8),
+        SongQuery(play_style=play_style.dp, dp_unofficial=lambda v: v is not None and 12.0 <= v < 12.5),
+        SongQuery(level=[11, 12]) & SongQuery(difficulty=difficulty.leggendaria),
+    ]
+    ng = 0
+    print(f'{len(sdb.songs)} charts')
+    for cond in filters:
+        same = [id(s) for s in sdb.filter(**cond)] == [id(s) for s in legacy_filter(sdb, **cond)]
+        ng += not same
+        t_new = timed(lambda: sdb.filter(**cond), n)
+        t_old = timed(lambda: legacy_filter(sdb, **cond), n)
+        print(f'filter {str(cond)[:60]:60s}: {len(sdb.filter(**cond)):5} charts, index {t_new:8.1f}us / linear {t_old:8.1f}us {"ok" if same else "MISMATCH"}')
+    for query in queries:
+        same = [id(s) for s in sdb.query(query)] == [id(s) for s in linear_query(sdb, query)]
+        ng += not same
+        t_new = timed(lambda: sdb.query(query), n)
+        t_old = timed(lambda: linear_query(sdb, query), n)
+        print(f'query  {str(list(query.conditions))[:60]:60s}: {len(sdb.query(query)):5} charts, index {t_new:8.1f}us / linear {t_old:8.1f}us {"ok" if same else "MISMATCH"}')
+    # add()で書き換えた譜面が索引に反映されること
+    song = sdb.query(play_style=play_style.sp, level=12)[0]
+    song.level = 11
+    sdb.add(song)
+    moved = song in sdb.query(play_style=play_style.sp, level=11) and song not in sdb.query(play_style=play_style.sp, level=12)
+    ng += not moved
+    print('add() reindex', 'ok' if moved else 'MISMATCH')
+    print('all ok' if ng == 0 else f'{ng} mismatches')
+    sys.exit(0 if ng == 0 else 1)
@@ -0,0 +1,51 @@
+import os
+import sys
+import time
+import shutil
+import tempfile
+
+from src import songinfo
+from src.songinfo import SongDatabase
+from src.logger import get_logger
+logger = get_logger('bench_songinfo_load')
+
+def timed(func, n:int=5) -> float:
+    t0 = time.perf_counter()
+    for _ in range(n):
+        func()
+    return (time.perf_counter() - t0) * 1000 / n
+
+def legacy_startup():
+    '''従来の起動時の処理: ScreenReaderとResultDatabaseがそれぞれ読み込み+書き出しを行う'''
+    for _ in range(2):
+        sdb = SongDatabase()
+        sdb.save()
+
+def shared_startup(use_cache:bool):
+    '''共有インスタンスを1回だけ読み込む'''
+    songinfo._shared_database = None
+    songinfo.get_song_database(use_cache=use_cache)
+
+if __name__ == '__main__':
+    # 使い方: python -m misc.bench_songinfo_load [songinfo.infdcのパス]
+    src = os.path.abspath(sys.argv[1] if len(sys.argv) > 1 else 'songinfo.infdc')
+    cwd = os.getcwd()
+    d = tempfile.mkdtemp()
+    try:
+        os.chdir(d) # songinfo.infdcを書き換えないよう一時ディレクトリで動かす
+        shutil.copy(src, 'songinfo.infdc')
+        charts = len(SongDatabase().songs)
+        t_legacy = timed(legacy_startup)
+        t_shared = timed(lambda: shared_startup(False))
+        shared_startup(True) # キャッシュを作る
+        t_cache = timed(lambda: shared_startup(True))
+        os.utime('songinfo.infdc') # 更新日時だけが変わった場合(ハッシュで確認して再利用)
+        t_touched = timed(lambda: shared_startup(True), 1)
+        cached = songinfo.get_song_database()
+        plain = SongDatabase()
+        assert cached.songs.keys() == plain.songs.keys() and cached.lookup_keys == plain.lookup_keys
+        print(f'{charts} charts: legacy (2x load+save) {t_legacy:.0f}ms | shared {t_shared:.0f}ms | '
+              f'shared+cache {t_cache:.0f}ms | cache after touch {t_touched:.0f}ms')
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(d)
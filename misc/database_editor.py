@@ -875,10 +875,14 @@ class MainWindow(QMainWindow):
         # 現在の選択を保持
         selected_title = self._selected_title()
 
-        # フィルタ適用
+        # フィルタ適用(スタイル・レベルの指定があれば曲情報DBの索引で曲名を絞り込む)
+        titles = self.title_data.keys()
+        if ps_f is not None or lv_f is not None:
+            titles = {c.title for c in self.db.query(play_style=ps_f, level=lv_f)}
         filtered: list[str] = []
-        for title, data in self.title_data.items():
-            if srch and srch not in title.lower():
+        for title in titles:
+            data = self.title_data.get(title)
+            if data is None or srch and srch not in title.lower():
                 continue
             charts = [
                 c for (ps, _), c in data['charts'].items()
@@ -0,0 +1,129 @@
+import imagehash
+import numpy as np
+
+from src.screen_reader import ScreenReader
+from src.classes import *
+from src.define import *
+from src.result import *
+
+# ScreenReaderの読み取り処理を置き換える前の実装。veri_*.pyで新旧の結果を比べるためだけに残している
+
+def read_judge_from_result_phash(reader:ScreenReader, side:result_side) -> Judge:
+    """リザルト画面から判定部分を読み取る(1桁ずつphashを取る従来版)"""
+    img = reader.screen.original
+    out = []
+    # for item in ['pg', 'gr', 'gd', 'bd', 'pr', 'cb']:
+    for item in ['pg', 'gr', 'gd', 'bd', 'pr']:
+        line = ''
+        for idx in range(4):
+            digit = img.crop(PosResultJudge.get(side, item, idx))
+
+            fn = lambda x: 255 if x > 220 else 0
+            digit_mono = digit.convert('L').point(fn, mode='1')
+            hash = imagehash.phash(digit_mono)
+            for i,h in enumerate(hash_digits):
+                hash_target = imagehash.hex_to_hash(h)
+                if abs(hash - hash_target) < 10:
+                    if i in (0,8): # 0:198, 
+                        d_sum = np.sum(np.array(digit_mono))
+                        if d_sum > 215:
+                            line += '8'
+                        else:
+                            line += str(i)
+                    else:
+                        line += str(i)
+                    break
+        out.append(line)
+    out.append('0')
+    ret = Judge.from_list(out)
+    return ret
+
+def read_option_screen_getpixel(reader:ScreenReader) -> CurrentOption:
+    '''オプション画面を読み取る(getpixelで1点ずつ読む従来版)'''
+    img = reader.screen.original
+    ret = CurrentOption()
+    ret.valid = True
+
+    def read_style() -> play_style:
+        area = img.crop(PosOptionScreen.STYLE_AREA)
+        tmp = imagehash.average_hash(area)
+        hash_target = imagehash.hex_to_hash(PosOptionScreen.STYLE_HASH)
+        if (hash_target - tmp) < 10:
+            return play_style.dp
+        else:
+            return play_style.sp
+
+    def read_option(is_hran:bool, style:play_style) -> tuple:
+        arrange = None
+        gauge = None
+        assist = None
+        flip = None
+        if style == play_style.sp:
+            for i in range(5):
+                tmp_arrange = option_arrange(i)
+                tmp_gauge = option_gauge(i)
+                tmp_assist = option_assist(i)
+                if img.getpixel(PosOption.get(style, tmp_arrange))[0] > 100:
+                    arrange = str(tmp_arrange)
+                    if tmp_arrange == option_arrange.s_random and is_hran:
+                        arrange = 'H-RANDOM'
+                if img.getpixel(PosOption.get(style, tmp_gauge))[0] > 100:
+                    gauge = tmp_gauge
+                if img.getpixel(PosOption.get(style, tmp_assist))[0] > 100:
+                    assist = tmp_assist
+        else: # DP
+            left_arrange = None
+            right_arrange = None
+            if img.getpixel(PosOption.get(style, option_arrange.sync_ran))[0] > 100:
+                arrange = str(option_arrange.sync_ran)
+            elif img.getpixel(PosOption.get(style, option_arrange.symm_ran))[0] > 100:
+                arrange = str(option_arrange.symm_ran)
+            else:
+                for i in range(5): # 左右レーン
+                    tmp_arrange = option_arrange(i)
+                    if img.getpixel(PosOption.get(style, tmp_arrange, is_left=True))[0] > 100:
+                        left_arrange = str(tmp_arrange)
+                        if tmp_arrange == option_arrange.s_random and is_hran:
+                            left_arrange = 'H-RANDOM'
+                    if img.getpixel(PosOption.get(style, tmp_arrange, is_left=False))[0] > 100:
+                        right_arrange = str(tmp_arrange)
+                        if tmp_arrange == option_arrange.s_random and is_hran:
+                            right_arrange = 'H-RANDOM'
+                arrange = f'{left_arrange} / {right_arrange}'
+            for i in range(5): # ゲージ、アシスト
+                tmp_gauge = option_gauge(i)
+                tmp_assist = option_assist(i)
+                if img.getpixel(PosOption.get(style, tmp_gauge))[0] > 100:
+                    gauge = tmp_gauge
+                if img.getpixel(PosOption.get(style, tmp_assist))[0] > 100:
+                    assist = tmp_assist
+            if img.getpixel(PosOption.get(style, option_flip(1)))[0] > 100:
+                flip = 'FLIP'
+        # print(arrange, gauge, assist, flip)
+        return (arrange, gauge, assist, flip)
+
+    def read_hran() -> bool:
+        '''H乱かどうか'''
+        return img.getpixel(PosOptionScreen.CHECKBOX_HRAN)[-1] < 100
+
+    def read_battle() -> bool:
+        '''Battleかどうか'''
+        return img.getpixel(PosOptionScreen.CHECKBOX_BATTLE)[-1] < 100
+
+    def read_allscratch() -> bool:
+        '''ALL-SCRATCHかどうか'''
+        return img.getpixel(PosOptionScreen.CHECKBOX_ALL_SCRATCH)[-1] < 100
+
+    def read_regularspeed() -> bool:
+        '''REGUL-SPEEDかどうか'''
+        return img.getpixel(PosOptionScreen.CHECKBOX_REGUL_SPEED)[-1] < 100
+
+    ret.play_style = read_style()
+    is_hran = read_hran()
+    ret.arrange, ret.option_gauge, ret.option_assist, ret.flip = read_option(is_hran, ret.play_style)
+    if ret.play_style == play_style.dp: # SPを除外しておくことで、灰色になる場合をケアしないようにする
+        ret.battle = read_battle()
+    ret.allscratch = read_allscratch()
+    ret.regularspeed = read_regularspeed()
+
+    return ret
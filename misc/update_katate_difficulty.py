@@ -2,10 +2,8 @@
 """片手難易度表から☆11/☆12の難易度帯を取得してsonginfo.infdcへ埋め込む。"""
 
 import argparse
-import bz2
 import csv
 import io
-import pickle
 import re
 import shutil
 import subprocess
@@ -237,11 +235,9 @@ def normalize_for_fuzzy_match(title):
 
 def build_fuzzy_index(sdb):
     index = defaultdict(list)
-    for chart_id, song in sdb.songs.items():
-        if song.play_style != play_style.sp:
-            continue
+    for song in sdb.query(play_style=play_style.sp):
         key = (normalize_for_fuzzy_match(song.title), song.difficulty)
-        index[key].append(chart_id)
+        index[key].append(song.chart_id)
     return index
 
 
@@ -297,13 +293,9 @@ def update_song_database(sdb, katate, clear_missing=False):
 
 
 def load_song_database_without_autosave():
-    from src.songinfo import SongDatabase, dbfile
+    from src.songinfo import SongDatabase
 
-    sdb = object.__new__(SongDatabase)
-    with bz2.BZ2File(dbfile, "rb", compresslevel=9) as f:
-        sdb.songs = pickle.load(f)
-    sdb._rebuild_lookup_keys()
-    return sdb
+    return SongDatabase() # 読み込みのみ(save()は明示的に呼ぶ)
 
 
 def print_changes(label, changes, limit=40):
@@ -0,0 +1,95 @@
+import os
+import sys
+import time
+import random
+import shutil
+import tempfile
+
+from src.result_database import ResultDatabase
+from src.playlog_journal import PlaylogJournal
+from src.classes import *
+from src.logger import get_logger
+from misc.bench_playlog_backend import make_results
+logger = get_logger('veri_best_view')
+
+def summary(best) -> tuple:
+    '''比較用にOneBestDataの中身をtupleにする'''
+    ret = [best.title, best.style, best.difficulty, best.songinfo, best.last_result]
+    for r in (best.best_score_result, best.min_bp_result, best.best_lamp_result):
+        ret.append(None if r is None else (r.timestamp, r.score, r.bp, r.lamp, r.option, r.notes, getattr(r, 'bpim2', None)))
+    return tuple(ret)
+
+def check(rdb:ResultDatabase, label:str) -> int:
+    '''差分更新された集計と全件からの集計を比較し、不一致の件数を返す'''
+    view = rdb.get_all_best_results()
+    full = rdb._collect_best(rdb.results)
+    ng = 0
+    if view.keys() != full.keys():
+        print(f'{label}: key mismatch ({len(view)} vs {len(full)})')
+        ng += 1
+    for key in view.keys() & full.keys():
+        if summary(view[key]) != summary(full[key]):
+            print(f'{label}: MISMATCH {key}')
+            ng += 1
+    print(f'{label}: {len(view)} charts, generation={rdb.best_generation}, ng={ng}')
+    return ng
+
+if __name__ == '__main__':
+    # 使い方: python -m misc.veri_best_view [件数]
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    cwd = os.getcwd()
+    d = tempfile.mkdtemp()
+    try:
+        os.chdir(d)
+        rng = random.Random(5)
+        results = make_results(n)
+        for r in results[::5]:
+            r.option.valid = True
+        for r in results[::13]:
+            r.option.battle = True
+        storage = PlaylogJournal('playlog.infdc', enabled=True)
+        storage.write_snapshot(results)
+        rdb = ResultDatabase(storage=storage)
+
+        ng = check(rdb, 'load')
+        t0 = time.perf_counter()
+        old = rdb.get_all_best_results()
+        old_items = dict(old)
+        t_cached = (time.perf_counter() - t0) * 1000
+        t_add = []
+        t_get = []
+        for r in make_results(100, seed=6): # 既存の譜面への追加
+            r.detect_mode = detect_mode.result
+            r.option.valid = True
+            r.timestamp = rdb.results[-1].timestamp + 1
+            t0 = time.perf_counter()
+            rdb.add(r)
+            t1 = time.perf_counter()
+            rdb.get_all_best_results()
+            t_add.append((t1 - t0) * 1000)
+            t_get.append((time.perf_counter() - t1) * 1000)
+        ng += check(rdb, 'add')
+        for r in rng.sample(rdb.results, 20): # 登録済みリザルトの更新
+            r.bpim2 = rng.random() * 100
+            r.notes = 1000
+            rdb.mark_updated(r)
+        ng += check(rdb, 'mark_updated')
+        for _ in range(30): # 削除
+            rdb.remove_result(rng.choice(rdb.results))
+        ng += check(rdb, 'remove_result')
+        rdb.sort_results()
+        ng += check(rdb, 'sort_results')
+        if dict(old) != old_items: # 取得済みのスナップショットは変化しない
+            print('snapshot changed!')
+            ng += 1
+
+        t0 = time.perf_counter()
+        rdb._collect_best(rdb.results)
+        t_full = (time.perf_counter() - t0) * 1000
+        rdb.close()
+        print(f'full rebuild {t_full:.1f}ms | cached {t_cached:.3f}ms | after add(): {sum(t_get)/len(t_get):.3f}ms')
+        print('all ok' if ng == 0 else f'{ng} mismatches')
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(d)
+    sys.exit(0 if ng == 0 else 1)
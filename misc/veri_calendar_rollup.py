@@ -0,0 +1,156 @@
+import os
+import sys
+import time
+import random
+import shutil
+import datetime
+import tempfile
+from collections import defaultdict
+
+from src.result_database import ResultDatabase
+from src.playlog_journal import PlaylogJournal
+from src.classes import *
+from src.logger import get_logger
+from misc.bench_playlog_backend import make_results
+logger = get_logger('veri_calendar_rollup')
+
+class OffsetConfig:
+    '''autoload_offsetだけを持つ設定'''
+    def __init__(self, autoload_offset:int):
+        self.autoload_offset = autoload_offset
+
+# 以下は日ごとの集計を導入する前の、リザルトを1件ずつ辿る集計(autoload_offsetで日付をずらすようにしたもの)
+def legacy_date(rdb:ResultDatabase, timestamp) -> str:
+    if not timestamp:
+        return ''
+    return rdb._timestamp_text(timestamp - rdb.config.autoload_offset * 3600, '%Y-%m-%d')
+
+def legacy_daily_rows(rdb:ResultDatabase) -> list:
+    notes_by_date = defaultdict(int)
+    play_counts = defaultdict(int)
+    for result in rdb.results:
+        if result.detect_mode == detect_mode.play and result.judge:
+            notes_by_date[legacy_date(rdb, result.timestamp)] += result.judge.notes
+        if result.detect_mode == detect_mode.result:
+            play_counts[legacy_date(rdb, result.timestamp)] += 1
+    dates = sorted(set(notes_by_date.keys()) | set(play_counts.keys()), reverse=True)
+    return [{'date': d, 'notes': notes_by_date.get(d, 0), 'play_count': play_counts.get(d, 0)} for d in dates], dict(notes_by_date)
+
+def legacy_monthly(daily_items:list) -> list:
+    monthly = {}
+    for item in daily_items:
+        key = item['date'][:7]
+        entry = monthly.setdefault(key, {'month': key, 'notes': 0, 'play_count': 0, 'day_count': 0})
+        entry['notes'] += item['notes']
+        entry['play_count'] += item['play_count']
+        entry['day_count'] += 1
+    return [monthly[key] for key in sorted(monthly.keys(), reverse=True)]
+
+def legacy_yearly(daily_items:list) -> list:
+    yearly = {}
+    for item in daily_items:
+        key = item['date'][:4]
+        entry = yearly.setdefault(key, {'year': key, 'notes': 0, 'play_count': 0, 'month_count': 0})
+        entry['notes'] += item['notes']
+        entry['play_count'] += item['play_count']
+    for entry in yearly.values():
+        entry['month_count'] = len({item['date'][:7] for item in daily_items if item['date'][:4] == entry['year']})
+    return [yearly[key] for key in sorted(yearly.keys(), reverse=True)]
+
+def legacy_daily_log(rdb:ResultDatabase, date_key:str) -> list:
+    '''その日のリザルト(日時の新しい順)'''
+    chronological = sorted(rdb.results, key=lambda r: r.timestamp or 0)
+    return [id(r) for r in reversed(chronological) if r.detect_mode == detect_mode.result and legacy_date(rdb, r.timestamp) == date_key]
+
+def check(rdb:ResultDatabase, label:str, rng:random.Random) -> int:
+    '''日ごとの集計と従来の集計を比較し、不一致の件数を返す'''
+    ng = 0
+    def cmp(name, a, b):
+        nonlocal ng
+        if a != b:
+            ng += 1
+            print(f'{label}: MISMATCH {name}: new={str(a)[:200]}, legacy={str(b)[:200]}')
+    t0 = time.perf_counter()
+    daily = rdb.get_mobile_daily_folders_data('daily')
+    monthly = rdb.get_mobile_daily_folders_data('monthly')
+    yearly = rdb.get_mobile_daily_folders_data('yearly')
+    notes_by_date = rdb._notes_by_date()
+    t1 = time.perf_counter()
+    old_daily, old_notes_by_date = legacy_daily_rows(rdb)
+    t2 = time.perf_counter()
+    total = sum(item['notes'] for item in old_daily)
+    cmp('daily', (daily['items'], daily['total_notes']), (old_daily, total))
+    cmp('monthly', (monthly['items'], monthly['total_notes']), (legacy_monthly(old_daily), total))
+    cmp('yearly', (yearly['items'], yearly['total_notes']), (legacy_yearly(old_daily), total))
+    cmp('_notes_by_date', notes_by_date, old_notes_by_date)
+    with rdb.storage.lock:
+        cmp('result count', rdb._get_calendar().total.play_count, sum(1 for r in rdb.results if r.detect_mode == detect_mode.result))
+    # 日時の無いリザルトの月・年('')は、従来は開いても空だったため比較しない
+    months = [item['month'] for item in monthly['items'] if item['month']]
+    for month_key in rng.sample(months, min(5, len(months))):
+        data = rdb.get_mobile_monthly_daily_folders_data(month_key)
+        items = [item for item in old_daily if item['date'].startswith(f'{month_key}-')]
+        cmp(f'month {month_key}', (data['items'], data['total_notes']), (items, sum(item['notes'] for item in items)))
+    for year_key in [item['year'] for item in yearly['items'] if item['year']]:
+        data = rdb.get_mobile_yearly_month_folders_data(year_key)
+        items = [item for item in old_daily if item['date'].startswith(f'{year_key}-')]
+        cmp(f'year {year_key}', (data['items'], data['total_notes']), (legacy_monthly(items), sum(item['notes'] for item in items)))
+    dates = [item['date'] for item in old_daily]
+    for date_key in rng.sample(dates, min(10, len(dates))) + ['', '1999-01-01']:
+        with rdb.storage.lock:
+            new = [id(rdb.results[i]) for i in reversed(rdb._day_result_indices(date_key))]
+        cmp(f'daily log {date_key}', new, legacy_daily_log(rdb, date_key))
+    print(f'{label}: {len(rdb.results)} results, offset={rdb.config.autoload_offset}, days={len(old_daily)}, '
+          f'rollup {(t1 - t0)*1000:.1f}ms / legacy {(t2 - t1)*1000:.1f}ms, ng={ng}')
+    return ng
+
+if __name__ == '__main__':
+    # 使い方: python -m misc.veri_calendar_rollup [件数]
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    cwd = os.getcwd()
+    d = tempfile.mkdtemp()
+    ng = 0
+    try:
+        os.chdir(d)
+        rng = random.Random(11)
+        results = make_results(n)
+        for r in results[1::97]: # 判定の無いプレー画面のリザルト
+            r.detect_mode = detect_mode.play
+            r.judge = None
+        results[3].timestamp = 0 # 日時の無いリザルト
+        storage = PlaylogJournal('playlog.infdc', enabled=True)
+        storage.write_snapshot(results)
+        config = OffsetConfig(4)
+        rdb = ResultDatabase(storage=storage) # configを渡すとWebSocketサーバーが起動するため後から設定する
+        rdb.config = config
+
+        ng += check(rdb, 'load', rng)
+        for i, r in enumerate(make_results(300, seed=8)): # 追加後
+            r.timestamp = rdb.results[-1].timestamp + 1200
+            if r.option:
+                r.option.valid = True
+            rdb.add(r)
+        ng += check(rdb, 'add', rng)
+        for r in rdb.results[-50:]: # 日時の書き換え
+            r.timestamp += 86400 * 3
+            rdb.mark_updated(r)
+        ng += check(rdb, 'mark_updated', rng)
+        for _ in range(30): # 削除後
+            rdb.remove_result(rng.choice(rdb.results))
+        ng += check(rdb, 'remove_result', rng)
+        for r in make_results(200, seed=9): # 古い日時のリザルトを末尾に追加(並びが崩れる)
+            r.timestamp = rdb.results[-1].timestamp - rng.randrange(86400 * 30)
+            if r.option:
+                r.option.valid = True
+            rdb.add(r)
+        ng += check(rdb, 'unsorted', rng)
+        config.autoload_offset = 0 # 区切りの変更
+        ng += check(rdb, 'offset=0', rng)
+        rdb.sort_results()
+        ng += check(rdb, 'sort_results', rng)
+        rdb.close()
+        print('all ok' if ng == 0 else f'{ng} mismatches')
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(d)
+    sys.exit(0 if ng == 0 else 1)
@@ -0,0 +1,115 @@
+import os
+import sys
+import random
+import shutil
+import tempfile
+
+from src.result_database import ResultDatabase
+from src.playlog_journal import PlaylogJournal
+from src.playlog_sqlite import PlaylogSQLite
+from src.time_index import time_key
+from src.result import *
+from src.classes import *
+from src.logger import get_logger
+from misc.bench_playlog_backend import make_results, STYLES, DIFFS
+logger = get_logger('veri_chart_index')
+
+def linear_search(rdb:ResultDatabase, title=None, style=None, diff=None, chart_id=None, battle=False) -> list:
+    '''索引を使わない従来のsearch()相当。対象のOneResultのリストを返す'''
+    key = chart_id
+    if title is not None and style is not None and diff is not None:
+        key = calc_chart_id(title, style, diff, battle=battle)
+    return [r for r in rdb.results if rdb._result_matches_chart(r, key, title, style, diff, battle)]
+
+def linear_between(rdb:ResultDatabase, t0=None, t1=None, mode=None) -> list:
+    '''索引を使わないresults_between()相当'''
+    ret = [(time_key(r), i) for i, r in enumerate(rdb.results)
+           if (t0 is None or time_key(r) >= t0) and (t1 is None or time_key(r) < t1) and (mode is None or r.detect_mode == mode)]
+    return [rdb.results[i] for _, i in sorted(ret)]
+
+def same(a:list, b:list) -> bool:
+    return len(a) == len(b) and all(x is y for x, y in zip(a, b))
+
+def check(rdb:ResultDatabase, queries:list, ranges:list) -> int:
+    '''search()・results_between()と線形探索の結果を比較し、不一致の件数を返す'''
+    ng = 0
+    for q in queries:
+        indexed = [d.result for d in rdb.search(**q)]
+        linear = linear_search(rdb, q.get('title'), q.get('style'), q.get('difficulty'), q.get('chart_id'), q.get('battle', False))
+        if not same(indexed, linear):
+            ng += 1
+            print(f'MISMATCH {q}: indexed={len(indexed)}, linear={len(linear)}')
+    for t0, t1, mode in ranges:
+        indexed = rdb.results_between(t0, t1, mode)
+        linear = linear_between(rdb, t0, t1, mode)
+        if not same(indexed, linear):
+            ng += 1
+            print(f'MISMATCH between({t0}, {t1}, {mode}): indexed={len(indexed)}, linear={len(linear)}')
+    return ng
+
+def run(name:str, storage, results:list, rng:random.Random) -> int:
+    '''追加・削除・並べ替え・保存の各時点でsearch()・results_between()を線形探索と比べ、不一致の件数を返す'''
+    storage.write_snapshot(results)
+    rdb = ResultDatabase(storage=storage)
+
+    def queries():
+        ret = []
+        for _ in range(300):
+            title = rng.choice(rdb.results).title if rng.random() < 0.8 else f'song{rng.randrange(5000)}'
+            ret.append(dict(title=title, style=rng.choice(STYLES), difficulty=rng.choice(DIFFS), battle=rng.random() < 0.3))
+        for _ in range(100):
+            ret.append(dict(chart_id=rng.choice(rdb.results).chart_id))
+        return ret
+
+    def ranges():
+        t_max = max(time_key(r) for r in rdb.results)
+        ret = [(None, None, None), (None, None, detect_mode.result), (0, 1, None), (None, 1500000000, None)]
+        for _ in range(100):
+            t0 = rng.uniform(1500000000, t_max)
+            ret.append((t0, t0 + rng.choice([60, 3600, 86400, 86400 * 30]), rng.choice([None, detect_mode.play, detect_mode.result])))
+        ret.append((t_max - 3600, None, detect_mode.play))
+        return ret
+
+    ng = check(rdb, queries(), ranges())
+    for r in make_results(200, seed=4): # 追加後(SQLiteでは未書き込みの行)
+        r.timestamp = rdb.results[-1].timestamp + 1
+        r.option.valid = True
+        rdb.add(r)
+    rdb.results[-300].timestamp += 86400 # 日時の書き換え
+    rdb.mark_updated(rdb.results[-300])
+    ng += check(rdb, queries(), ranges())
+    rdb.save()
+    ng += check(rdb, queries(), ranges())
+    for _ in range(50): # 削除後
+        rdb.remove_result(rng.choice(rdb.results))
+    ng += check(rdb, queries(), ranges())
+    rdb.sort_results() # 並べ替え後
+    ng += check(rdb, queries(), ranges())
+    rdb.save() # 全件の書き直し後(SQLiteでは再びDBの索引を使う)
+    ng += check(rdb, queries(), ranges())
+    rdb.close()
+    print(f'{name}: {len(rdb.results)} results, ng={ng}')
+    return ng
+
+if __name__ == '__main__':
+    # 使い方: python -m misc.veri_chart_index [件数]
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    cwd = os.getcwd()
+    d = tempfile.mkdtemp()
+    try:
+        os.chdir(d)
+        rng = random.Random(3)
+        results = make_results(n)
+        for r in results[::7]: # バトル、表記ゆれ(空白・☆)、日時の無いリザルトも混ぜる
+            r.option.battle = True
+        for r in results[::11]:
+            r.title = r.title.replace('song', 'song ☆')
+        for r in results[::97]:
+            r.timestamp = 0
+        ng = run('pickle', PlaylogJournal('playlog.infdc', enabled=True), results, rng)
+        ng += run('sqlite', PlaylogSQLite('playlog.sqlite3'), results, rng)
+        print('all ok' if ng == 0 else f'{ng} mismatches')
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(d)
+    sys.exit(0 if ng == 0 else 1)
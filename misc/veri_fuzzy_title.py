@@ -0,0 +1,68 @@
+import sys
+import time
+import random
+
+from src.songinfo import SongDatabase
+from src.title_index import TitleIndex, normalize_title
+from src.logger import get_logger
+logger = get_logger('veri_fuzzy_title')
+
+def corrupt(title:str, rng:random.Random, titles:list) -> str:
+    '''曲名認識の読み違いを模した曲名(1文字の置き換え・欠落・重複)'''
+    chars = list(title)
+    i = rng.randrange(len(chars))
+    op = rng.randrange(3)
+    if op == 0:
+        chars[i] = rng.choice(rng.choice(titles))
+    elif op == 1 and len(chars) > 1:
+        del chars[i]
+    else:
+        chars.insert(i, chars[i])
+    return ''.join(chars)
+
+if __name__ == '__main__':
+    # 使い方: python -m misc.veri_fuzzy_title [件数] [下限]
+    # 1文字誤った曲名が元の曲名に読み替えられる割合と、曲情報DBに無い曲名を誤って読み替える割合を確認する
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    threshold = float(sys.argv[2]) if len(sys.argv) > 2 else 0.85
+    sdb = SongDatabase()
+    rng = random.Random(7)
+    titles = sorted({s.title for s in sdb.songs.values()})
+    t0 = time.perf_counter()
+    index = TitleIndex(titles)
+    t_build = (time.perf_counter() - t0) * 1000
+
+    # 読み違いの解決
+    resolved = wrong = 0
+    elapsed = 0.0
+    for _ in range(n):
+        title = rng.choice(titles)
+        noisy = corrupt(title, rng, titles)
+        t0 = time.perf_counter()
+        found, confidence = index.best(noisy)
+        elapsed += time.perf_counter() - t0
+        if confidence >= threshold:
+            if normalize_title(found) == normalize_title(title) or normalize_title(found) == normalize_title(noisy):
+                resolved += 1
+            else:
+                wrong += 1
+
+    # 曲情報DBに無い曲名(1割を索引から外して検索する)
+    held_out = set(rng.sample(titles, len(titles) // 10))
+    partial = TitleIndex(t for t in titles if t not in held_out)
+    false_positive = sum(1 for t in held_out if partial.best(t)[1] >= threshold)
+
+    # search_fuzzy()(譜面の存在確認込み)
+    songs = list(sdb.songs.values())
+    elapsed_db = 0.0
+    matched_db = 0
+    for _ in range(n):
+        song = rng.choice(songs)
+        t0 = time.perf_counter()
+        found, confidence = sdb.search_fuzzy(corrupt(song.title, rng, titles), song.play_style, song.difficulty, threshold)
+        elapsed_db += time.perf_counter() - t0
+        matched_db += found is song
+    print(f'{len(titles)} titles, index built in {t_build:.0f}ms, threshold={threshold}')
+    print(f'near-miss titles: resolved {resolved}/{n}, wrong {wrong}, {elapsed * 1e6 / n:.0f}us/query')
+    print(f'unknown titles  : false positive {false_positive}/{len(held_out)}')
+    print(f'search_fuzzy    : matched {matched_db}/{n}, {elapsed_db * 1e6 / n:.0f}us/query')
@@ -7,6 +7,7 @@ import imagehash
 import glob
 
 from src.screen_reader import ScreenReader
+from misc.legacy_screen_reader import read_option_screen_getpixel
 from src.logger import get_logger
 from src.result import *
 from src.result_database import ResultDatabase
@@ -26,6 +27,9 @@ if __name__ == '__main__':
         reader.update_screen_from_file(f)
         if reader.is_option():
             opt = reader.read_option_screen()
+            legacy = read_option_screen_getpixel(reader)
+            if vars(opt) != vars(legacy):
+                print('MISMATCH', f, vars(opt), vars(legacy))
             # rdb.broadcast_option_data(opt)
             print(f, opt.play_style.name, opt, opt.option_gauge)
     # rdb.shutdown_servers()
@@ -0,0 +1,216 @@
+import os
+import sys
+import time
+import random
+import shutil
+import datetime
+import tempfile
+from collections import defaultdict
+
+from src.result_database import ResultDatabase
+from src.playlog_journal import PlaylogJournal
+from src.classes import *
+from src.logger import get_logger
+from misc.bench_playlog_backend import make_results
+logger = get_logger('veri_play_columns')
+
+class ChronologicalView:
+    '''resultsを日時順(同時刻なら登録順)に並べ替えたもの。
+    従来の集計はresultsが日時順であることを前提に末尾から辿るため、これに対して実行して比較する。
+    '''
+    def __init__(self, rdb:ResultDatabase):
+        self.results = sorted(rdb.results, key=lambda r: r.timestamp or 0)
+        self._timestamp_text = rdb._timestamp_text
+
+# 以下は列ストア導入前の、リザルトを1件ずつ辿る集計
+def legacy_graph(rdb:ResultDatabase, start_time:int) -> tuple:
+    target = []
+    total = Judge()
+    for r in reversed(rdb.results):
+        if r.detect_mode == detect_mode.play:
+            if r.timestamp >= start_time:
+                target.append(r)
+                if r.judge:
+                    total += r.judge
+            else:
+                break
+    return [id(r) for r in target], (total.pg, total.gr, total.gd, total.bd, total.pr, total.cb)
+
+def legacy_monthly(rdb:ResultDatabase, target:datetime.datetime) -> int:
+    ret = 0
+    for r in reversed(rdb.results):
+        result_date = datetime.datetime.fromtimestamp(r.timestamp)
+        if r.detect_mode != detect_mode.play:
+            continue
+        if (result_date.month == target.month) and (result_date.year == target.year):
+            if r.judge:
+                ret += r.judge.notes
+        elif (result_date.year, result_date.month) > (target.year, target.month):
+            continue # 従来は翌月以降のリザルトでも打ち切っていた(当月以外は0になる)ため、ここだけ読み飛ばすよう直している
+        else:
+            break
+    return ret
+
+def legacy_recent_monthly(rdb:ResultDatabase, target:datetime.datetime, months:int) -> list:
+    month_keys = []
+    year = target.year
+    month = target.month
+    for _ in range(months):
+        month_keys.append((year, month))
+        month -= 1
+        if month == 0:
+            month = 12
+            year -= 1
+    totals = {key: 0 for key in month_keys}
+    oldest_year, oldest_month = month_keys[-1]
+    for r in reversed(rdb.results):
+        if r.detect_mode != detect_mode.play or not r.judge:
+            continue
+        result_date = datetime.datetime.fromtimestamp(r.timestamp)
+        key = (result_date.year, result_date.month)
+        if key not in totals and key < (oldest_year, oldest_month):
+            break
+        if key in totals:
+            totals[key] += r.judge.notes
+    return [{"label": f"{year}/{month:02d}", "notes": totals[(year, month)]} for year, month in reversed(month_keys)]
+
+def legacy_yearly(rdb:ResultDatabase, target:datetime.datetime) -> int:
+    ret = 0
+    for r in reversed(rdb.results):
+        if r.detect_mode != detect_mode.play or not r.judge:
+            continue
+        result_date = datetime.datetime.fromtimestamp(r.timestamp)
+        if result_date.year < target.year:
+            break
+        if result_date.year == target.year:
+            ret += r.judge.notes
+    return ret
+
+def legacy_notes_by_date(rdb:ResultDatabase) -> dict:
+    totals = defaultdict(int)
+    for result in rdb.results:
+        if result.detect_mode != detect_mode.play or not result.judge:
+            continue
+        totals[rdb._timestamp_text(result.timestamp, "%Y-%m-%d")] += result.judge.notes
+    return totals
+
+def legacy_notes_since(rdb:ResultDatabase, start_timestamp:int) -> int:
+    total = 0
+    for result in reversed(rdb.results):
+        if result.timestamp < start_timestamp:
+            break
+        if result.detect_mode == detect_mode.play and result.judge:
+            total += result.judge.notes
+    return total
+
+def legacy_daily(rdb:ResultDatabase, now:datetime.datetime) -> list:
+    daily_judges = defaultdict(Judge)
+    for r in reversed(rdb.results):
+        if r.detect_mode != detect_mode.play or not r.judge:
+            continue
+        r_date = datetime.datetime.fromtimestamp(r.timestamp).date()
+        if (now.date() - r_date).days > 14:
+            break
+        daily_judges[r_date] += r.judge
+    ret = []
+    for i in range(14, -1, -1):
+        d = now.date() - datetime.timedelta(days=i)
+        j = daily_judges.get(d, Judge())
+        ret.append({"date": d.strftime("%m/%d"), "pg": j.pg, "gr": j.gr, "gd": j.gd, "bd": j.bd})
+    return ret
+
+def call(func):
+    '''funcの返り値。例外が出た場合は例外名(判定の無いリザルトでは従来の集計も例外になる)'''
+    try:
+        return func()
+    except Exception as e:
+        return type(e).__name__
+
+def check(rdb:ResultDatabase, label:str, rng:random.Random) -> int:
+    '''列ストアでの集計と従来の集計を比較し、不一致の件数を返す'''
+    ng = 0
+    view = ChronologicalView(rdb)
+    t_new = t_old = 0.0
+    def cmp(name, new, old):
+        nonlocal ng, t_new, t_old
+        t0 = time.perf_counter()
+        a = call(new)
+        t1 = time.perf_counter()
+        b = call(old)
+        t2 = time.perf_counter()
+        t_new += t1 - t0
+        t_old += t2 - t1
+        if a != b:
+            ng += 1
+            print(f'{label}: MISMATCH {name}: new={str(a)[:200]}, legacy={str(b)[:200]}')
+    last = view.results[-1].timestamp
+    now = datetime.datetime.fromtimestamp(last)
+    starts = [last - rng.randrange(0, 86400 * 3) for _ in range(5)] + [last + 1]
+    targets = [now, now + datetime.timedelta(days=40)] + [datetime.datetime.fromtimestamp(last - rng.randrange(0, 86400 * 700)) for _ in range(5)]
+    for start in starts:
+        def graph(): # get_graph_data, get_today_stats_dataの本日分
+            target, j = rdb._today_play_results(start)
+            return len(target), (j.pg, j.gr, j.gd, j.bd, j.pr, j.cb)
+        cmp(f'today total({start})', graph, lambda: (lambda t, j: (len(t), j))(*legacy_graph(view, start)))
+        cmp(f'_notes_since({start})', lambda: rdb._notes_since(start), lambda: legacy_notes_since(view, start))
+        cmp(f'today target({start})', lambda: [id(r) for r in rdb._today_play_results(start)[0]], lambda: legacy_graph(view, start)[0])
+    cmp('_notes_since(0)', lambda: rdb._notes_since(0), lambda: legacy_notes_since(view, 0))
+    for target in targets:
+        cmp(f'get_monthly_notes({target})', lambda: rdb.get_monthly_notes(target), lambda: legacy_monthly(view, target))
+        cmp(f'get_recent_monthly_notes({target})', lambda: rdb.get_recent_monthly_notes(target, 12), lambda: legacy_recent_monthly(view, target, 12))
+        cmp(f'get_yearly_notes({target})', lambda: rdb.get_yearly_notes(target), lambda: legacy_yearly(view, target))
+    cmp('_notes_by_date', lambda: dict(rdb._notes_by_date()), lambda: dict(legacy_notes_by_date(rdb)))
+    cmp('daily_notes', lambda: rdb.get_today_stats_data(last)['daily_notes'], lambda: legacy_daily(view, datetime.datetime.now()))
+    for _ in range(5):
+        t0 = last - rng.randrange(0, 86400 * 60)
+        t1 = t0 + rng.randrange(0, 86400 * 10)
+        for mode in (None, detect_mode.play, detect_mode.result):
+            cmp(f'results_between({t0}, {t1}, {mode})', lambda: [id(r) for r in rdb.results_between(t0, t1, mode)],
+                lambda: [id(r) for r in view.results if t0 <= (r.timestamp or 0) < t1 and mode in (None, r.detect_mode)])
+    cmp('results_between(0, 1)', lambda: [id(r) for r in rdb.results_between(0, 1)], lambda: [id(r) for r in view.results if not r.timestamp])
+    print(f'{label}: {len(rdb.results)} results, columns {t_new*1000:.1f}ms / legacy {t_old*1000:.1f}ms, ng={ng}')
+    return ng
+
+if __name__ == '__main__':
+    # 使い方: python -m misc.veri_play_columns [件数]
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    cwd = os.getcwd()
+    d = tempfile.mkdtemp()
+    try:
+        os.chdir(d)
+        rng = random.Random(7)
+        results = make_results(n)
+        end = int(time.time()) # 直近14日分の集計も確認できるよう、最後のリザルトを現在時刻にする
+        for i, r in enumerate(results):
+            r.timestamp = end - (n - i) * 300
+        for r in results[1:n - 3000:97]: # 判定の無いプレー画面のリザルト(get_graph_dataの対象外の範囲)
+            r.detect_mode = detect_mode.play
+            r.judge = None
+        storage = PlaylogJournal('playlog.infdc', enabled=True)
+        storage.write_snapshot(results)
+        rdb = ResultDatabase(storage=storage)
+
+        ng = check(rdb, 'load', rng)
+        for r in make_results(300, seed=8): # 追加後
+            r.timestamp = rdb.results[-1].timestamp + 120
+            r.detect_mode = detect_mode.play
+            rdb.add(r)
+        ng += check(rdb, 'add', rng)
+        for _ in range(30): # 削除後
+            rdb.remove_result(rng.choice(rdb.results))
+        ng += check(rdb, 'remove_result', rng)
+        for r in make_results(200, seed=9): # 古い日時のリザルトを末尾に追加(並びが崩れる)
+            r.timestamp = rdb.results[-1].timestamp - rng.randrange(86400 * 30)
+            r.detect_mode = detect_mode.play
+            rdb.add(r)
+        rdb.results[5].timestamp = 0 # 日時の無いリザルト
+        rdb.mark_updated(rdb.results[5])
+        ng += check(rdb, 'unsorted', rng)
+        rdb.sort_results()
+        ng += check(rdb, 'sort_results', rng)
+        rdb.close()
+        print('all ok' if ng == 0 else f'{ng} mismatches')
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(d)
+    sys.exit(0 if ng == 0 else 1)
@@ -0,0 +1,117 @@
+import os
+import sys
+import bz2
+import pickle
+import shutil
+import tempfile
+
+from src.playlog_journal import PlaylogJournal, encode_record
+from src.result_database import ResultDatabase
+from src.result import *
+from src.classes import *
+from src.logger import get_logger
+logger = get_logger('veri_playlog_journal')
+
+def make_result(i:int) -> OneResult:
+    return OneResult(title=f'song{i % 1000}', play_style=play_style.sp, difficulty=difficulty.another,
+                     lamp=clear_lamp.hard, timestamp=1700000000 + i, playspeed=None, option=PlayOption(None),
+                     judge=Judge(i, 10, 5, 1, 2, 3), score=1000 + i, bp=3, detect_mode=detect_mode.result)
+
+def key(r:OneResult) -> tuple:
+    return (r.title, r.timestamp, r.score, r.image_path)
+
+def check(name:str, results:list, expected:list):
+    ok = [key(r) for r in results] == [key(r) for r in expected]
+    print(f"{'OK  ' if ok else 'FAIL'} {name}: {len(results)} results (expected {len(expected)})")
+    return ok
+
+def new_journal(d:str) -> PlaylogJournal:
+    return PlaylogJournal(os.path.join(d, 'playlog.infdc'), enabled=True)
+
+def add(j:PlaylogJournal, results:list, r:OneResult):
+    results.append(r)
+    j.record_add(r)
+
+if __name__ == '__main__':
+    # 使い方: python -m misc.veri_playlog_journal
+    # 一時ディレクトリ上で、各タイミングでの異常終了を再現して読み込み結果を確認する
+    ok = True
+    d = tempfile.mkdtemp()
+    try:
+        # 1. 追記と読み込み
+        j = new_journal(d)
+        expected = j.load()
+        for i in range(100):
+            add(j, expected, make_result(i))
+        j.flush()
+        expected[10].image_path = 'a.png'
+        j.record_set(10, expected[10])
+        j.flush()
+        ok &= check('append + set', new_journal(d).load(), expected)
+
+        # 2. 書き込み途中で落ちた末尾レコード
+        with open(j.path, 'ab') as f:
+            f.write(encode_record(('add', make_result(999)))[:-5])
+        j2 = new_journal(d)
+        ok &= check('torn tail is dropped', j2.load(), expected)
+        add(j2, expected, make_result(100))
+        j2.flush()
+        ok &= check('append after torn tail', new_journal(d).load(), expected)
+
+        # 3. 畳み込み: ジャーナル退避後、スナップショット置き換え前に終了
+        j3 = new_journal(d)
+        expected = j3.load()
+        os.replace(j3.path, j3.old_path)
+        j3._new_journal(j3.generation + 1)
+        add(j3, expected, make_result(101))
+        j3.flush()
+        j3._close_file()
+        ok &= check('crash before snapshot replace', new_journal(d).load(), expected)
+        ok &= check('  .. reload after recovery', new_journal(d).load(), expected)
+
+        # 4. 畳み込み: スナップショット置き換え後、退避したジャーナルの削除前に終了
+        j4 = new_journal(d)
+        expected = j4.load()
+        add(j4, expected, make_result(102))
+        j4.flush()
+        shutil.copy(j4.path, j4.path + '.bak')
+        j4.compact(lambda: expected)
+        os.replace(j4.path + '.bak', j4.old_path)
+        ok &= check('crash before removing old journal', new_journal(d).load(), expected)
+
+        # 5. 全件書き出し: スナップショット置き換え後、ジャーナルの作り直し前に終了
+        j5 = new_journal(d)
+        expected = j5.load()
+        add(j5, expected, make_result(103))
+        j5.flush()
+        shutil.copy(j5.path, j5.path + '.bak')
+        expected.pop(0) # 削除は全件書き出しになる
+        j5.write_snapshot(expected)
+        os.replace(j5.path + '.bak', j5.path)
+        ok &= check('crash before resetting journal', new_journal(d).load(), expected)
+
+        # 6. 従来形式(listのみ)のスナップショットからの移行
+        with bz2.BZ2File(os.path.join(d, 'playlog.infdc'), 'wb', compresslevel=9) as f:
+            pickle.dump(expected, f)
+        if os.path.exists(j5.path):
+            os.remove(j5.path)
+        j6 = new_journal(d)
+        ok &= check('legacy snapshot', j6.load(), expected)
+        add(j6, expected, make_result(104))
+        j6.flush()
+        ok &= check('legacy snapshot + journal', new_journal(d).load(), expected)
+
+        # 7. 登録済みの古いリザルトをDetailedResult経由で書き換えた場合もジャーナルに残る
+        rdb = ResultDatabase(storage=new_journal(d))
+        target = rdb.results[5]
+        detail = [x for x in rdb.search(chart_id=target.chart_id) if x.result is target][0]
+        detail._set_bpim2(BpiDetail(value=12.34, source='bpim2', arena_averages=None))
+        rdb.storage.flush()
+        loaded = new_journal(d).load()
+        bpim2_ok = getattr(loaded[5], 'bpim2', None) == 12.34
+        print(f"{'OK  ' if bpim2_ok else 'FAIL'} in-place bpim2 update of an old result")
+        ok &= bpim2_ok
+    finally:
+        shutil.rmtree(d)
+    print('all ok' if ok else 'FAILED')
+    sys.exit(0 if ok else 1)
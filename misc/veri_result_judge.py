@@ -0,0 +1,52 @@
+import sys
+import glob
+import time
+
+from src.screen_reader import ScreenReader
+from misc.legacy_screen_reader import read_judge_from_result_phash
+from src.logger import get_logger
+from src.classes import *
+logger = get_logger('veri_result_judge')
+
+def read(func, side:result_side):
+    '''(pg, gr, gd, bd, pr)のtupleを返す。読み取りに失敗した場合は例外名'''
+    try:
+        j = func(side)
+        return (j.pg, j.gr, j.gd, j.bd, j.pr)
+    except Exception as e:
+        return type(e).__name__
+
+if __name__ == '__main__':
+    # 使い方: python -m misc.veri_result_judge "debug/rival_or_rader/rad*.png"
+    # veri_result.pyと同じ画像で、バッチ版とphash版の判定読み取り結果を比較する
+    pattern = sys.argv[1] if len(sys.argv) > 1 else 'debug/rival_or_rader/rad*.png'
+    reader = ScreenReader()
+    n_files = 0
+    n_digits = 0
+    n_mismatch = 0
+    t_batch = 0.0
+    t_phash = 0.0
+    for f in glob.glob(pattern, recursive=True):
+        reader.update_screen_from_file(f)
+        if not reader.is_result():
+            print('not result...', f)
+            continue
+        for side in result_side:
+            t0 = time.perf_counter()
+            batch = read(reader.read_judge_from_result, side)
+            t1 = time.perf_counter()
+            phash = read(lambda side: read_judge_from_result_phash(reader, side), side)
+            t2 = time.perf_counter()
+            t_batch += t1 - t0
+            t_phash += t2 - t1
+            n_digits += 20
+            if batch != phash:
+                n_mismatch += 1
+                print(f'MISMATCH {f} ({side.name}): batch={batch}, phash={phash}')
+        n_files += 1
+
+    if n_files == 0:
+        print(f'no result images for {pattern}')
+    else:
+        print(f'files={n_files}, digits={n_digits}, mismatched sides={n_mismatch}')
+        print(f'average per side: batch {t_batch*1000/(n_files*2):.3f}ms, phash {t_phash*1000/(n_files*2):.3f}ms')
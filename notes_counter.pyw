@@ -33,10 +33,13 @@ except ImportError:
     print("有効にするには: pip install keyboard")
 
 from src.config import Config
+from src import file_codec
 from src.classes import detect_mode, play_style, difficulty, clear_lamp
 from src.funcs import *
 from src.obs_websocket_manager import OBSWebSocketManager
-from src.songinfo import SongDatabase, download_latest_songinfo
+from src.frame_capture import FrameCapture
+from src.infnotebook_compat import array_to_screen
+from src.songinfo import get_song_database, download_latest_songinfo
 from src.screen_reader import ScreenReader
 from src.result import OneResult, DetailedResult, bpim2_savecache
 from src.result_database import ResultDatabase
@@ -132,11 +135,15 @@ class MainWindow(MainWindowUI):
     def __init__(self):
         # 設定とデータベースの初期化
         self.config = Config()
+        try:
+            file_codec.set_default_codec(self.config.file_codec)
+        except ValueError:
+            logger.error(traceback.format_exc())
         super().__init__(self.config)
         self.save_image_requested.connect(self.save_image)
         self.manual_music_select_import_requested.connect(self.manual_music_select_import)
         self.bpim2_fetch_finished.connect(self.on_bpim2_fetch_finished)
-        self.song_database = SongDatabase()
+        self.song_database = get_song_database(use_cache=self.config.songinfo_cache) # ScreenReader・ResultDatabaseと共有
         self.result_database = ResultDatabase(config=self.config)
         self.rival_manager = RivalManager(parent=self)
         self.result_database.rival_manager = self.rival_manager
@@ -204,10 +211,10 @@ class MainWindow(MainWindowUI):
         # アプリ起動時のOBS処理
         self.execute_obs_triggers('app_start')
 
-        # メインループタイマーの設定（100ms間隔）
-        self.main_timer = QTimer()
-        self.main_timer.timeout.connect(self.main_loop)
-        self.main_timer.start(100)
+        # キャプチャ専用スレッド（間隔は画面ごとに可変）。新しいフレームが届くたびにメインループを実行
+        self.frame_capture = FrameCapture(self.obs_manager)
+        self.frame_capture.frame_ready.connect(self.main_loop)
+        self.frame_capture.start()
         
         # 表示更新タイマー（500ms間隔）
         self.display_timer = QTimer()
@@ -246,9 +253,9 @@ class MainWindow(MainWindowUI):
     def on_songinfo_update_finished(self, success: bool, message: str):
         """DL済みの曲情報DBを即座に再読込し、表示データへ反映"""
         if success:
-            self.song_database.load()
-            self.result_database.song_database.load()
-            self.screen_reader.songinfo.load()
+            self.song_database.load() # ScreenReader・ResultDatabaseと共有しているため1回でよい
+            self.result_database.invalidate_best_results()
+            self.screen_reader.recognition_cache.clear()
             self.result_database.broadcast_today_updates_data(self.start_time_with_offset)
             self.result_database.broadcast_today_stats_data(self.start_time_with_offset)
             if self.result_pre and self.result_pre.chart_id:
@@ -385,20 +392,23 @@ class MainWindow(MainWindowUI):
         '''本日の判定内訳(play中の判定合計)を対象ログから集計'''
         self.today_judge.reset()
         self.play_count = 0
-        for r in reversed(self.result_database.results):
-            if r.detect_mode == detect_mode.play and r.judge:
-                if r.timestamp >= self.start_time_with_offset:
-                    self.play_count += 1
-                    self.today_judge += r.judge
-                else:
-                    break
+        for r in self.result_database.results_between(self.start_time_with_offset, None, detect_mode.play):
+            if r.judge:
+                self.play_count += 1
+                self.today_judge += r.judge
 
     def update_all_configs(self):
         """全てのクラスに設定を反映"""
         self.config.load_config()  # 最新の設定を読み込み
+        try:
+            file_codec.set_default_codec(self.config.file_codec)
+        except ValueError:
+            logger.error(traceback.format_exc())
         self.obs_manager.set_config(self.config)
         self.result_database.config = self.config
-        self.result_database.song_database.load()  # 必要に応じて再読み込み
+        get_song_database(use_cache=self.config.songinfo_cache)
+        self.song_database.load()  # songinfo.infdcが変わっていれば再読み込み
+        self.result_database.invalidate_best_results()
         if hasattr(self.result_database, "restart_mobile_http_server"):
             self.result_database.restart_mobile_http_server()
 
@@ -430,6 +440,13 @@ class MainWindow(MainWindowUI):
             if getattr(self.screen_reader.screen, 'original', None) is None:
                 self.statusBar().showMessage("保存できるゲーム画面がありません", 3000)
                 return False
+            if not self.screen_reader.is_full_resolution():
+                # 画面判定用の縮小フレームしか無い場合は等倍で取り直す
+                np_value = self.obs_manager.capture_frame()
+                if np_value is None:
+                    self.statusBar().showMessage("保存できるゲーム画面がありません", 3000)
+                    return False
+                self.screen_reader.update_screen(array_to_screen(np_value))
 
             date = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
             if self.screen_reader.is_result():
@@ -437,8 +454,10 @@ class MainWindow(MainWindowUI):
                 if not detailed_result:
                     self.statusBar().showMessage("リザルト画面を読み取れませんでした", 3000)
                     return False
-                # TODO ここで最後に追加したresultを使うほうがよい、自己べ情報が上書きされるため
-                if self.result_database.results:
+                # 最後に追加したresultを使う(古いリザルトの読み込みでresultsの末尾とは限らないため)
+                if self.result_database.last_added_result is not None:
+                    detailed_result.result = self.result_database.last_added_result
+                elif self.result_database.results:
                     detailed_result.result = self.result_database.results[-1]
                 result = detailed_result.result
                 if skip_no_update and (self.config.autosave_image_mode == config_autosave_image.only_updates): # 更新している場合のみ保存
@@ -510,6 +529,7 @@ class MainWindow(MainWindowUI):
             screen.save(full_path)
             if self.screen_reader.is_result() and detailed_result and detailed_result.result:
                 detailed_result.result.image_path = str(full_path)
+                self.result_database.mark_updated(detailed_result.result)
                 self.result_database.save()
             self.statusBar().showMessage(f"保存しました -> {filename}", 10000)
             return True
@@ -552,25 +572,34 @@ class MainWindow(MainWindowUI):
             # 例: 自動制御を一時停止など
 
     def main_loop(self):
-        """メインループ - 100ms毎に呼ばれる"""
+        """メインループ - キャプチャスレッドが新しいフレームを取得する毎に呼ばれる"""
         try:
-            if not self.obs_manager.is_capture_ready():
+            # 常に最新フレームだけを処理する。処理が遅れて溜まった通知は空振りする
+            frame = self.frame_capture.take_latest()
+            if frame is None:
                 return
 
-            self.obs_manager.screenshot()
-            if self.obs_manager.screen is None:
-                return
-
-            self.screen_reader.update_screen(self.obs_manager.screen)
+            self.screen_reader.update_screen(array_to_screen(frame.np_value), frame.timestamp)
 
             # 現在のゲーム画面状態を判定
             new_mode = self.detect_current_mode()
+            self.frame_capture.set_mode(new_mode)
+
+            # 縮小フレームでは画面判定のみ行い、OCRが必要な画面なら等倍フレームを待つ
+            if not self.screen_reader.is_full_resolution() and new_mode != detect_mode.init:
+                self.frame_capture.scheduler.request_full_resolution()
+                return
 
             # モードが変わった場合のイベント処理
             if new_mode != self.current_mode:
+                logger.debug(f"{self.current_mode.name} -> {new_mode.name}, {self.screen_reader.frame_gate}, {self.screen_reader.recognition_cache}")
                 self.on_mode_changed(self.current_mode, new_mode)
                 self.current_mode = new_mode
 
+            # 認識対象の領域が前フレームから変わっていなければ、認識以降の処理を省略
+            if not self.screen_reader.is_changed(self.current_mode):
+                return
+
             # 各モードでの処理
             if self.current_mode == detect_mode.select:
                 self.process_select_mode()
@@ -586,18 +615,8 @@ class MainWindow(MainWindowUI):
     
     def detect_current_mode(self) -> detect_mode:
         """現在のゲーム画面状態を判定"""
-        if self.screen_reader.is_result():
-            return detect_mode.result
-        elif self.screen_reader.is_select():
-            return detect_mode.select
-        elif self.screen_reader.is_option():
-            return detect_mode.option
-        else:
-            play_mode = self.screen_reader.is_play()
-            if play_mode:
-                return detect_mode.play
-            else:
-                return detect_mode.init
+        mode, _ = self.screen_reader.classify()
+        return mode
     
     def on_mode_changed(self, old_mode: detect_mode, new_mode: detect_mode):
         """モード変更時の処理"""
@@ -710,6 +729,8 @@ class MainWindow(MainWindowUI):
         """選曲画面での処理"""
         detailed_result = self.screen_reader.read_music_select_screen()
         if not detailed_result:
+            # 読み取れなかった画面は変化なしとして省略させない
+            self.screen_reader.frame_gate.reset()
             return False
         result = detailed_result.result
         result.timestamp = 0 # 更新日は不明という扱いにする
@@ -839,6 +860,7 @@ class MainWindow(MainWindowUI):
             return
         result.bpim2 = bpi_detail.value
         result.bpim2_arena_averages = bpi_detail.arena_averages
+        self.result_database.mark_updated(result)
         arena_count = len(bpi_detail.arena_averages or [])
         logger.info(f"BPIM2 fetched: {result.title} {get_chart_name(result.play_style, result.difficulty)} score={result.score} bpi={bpi_detail.value:.2f} arena_averages={arena_count}")
         self.result_database.save()
@@ -906,6 +928,8 @@ class MainWindow(MainWindowUI):
         # logger.debug(f"mode:{self.last_play_mode}, self.current_judge = {self.current_judge}")
         if tmp:
             self.current_judge = tmp
+        else:
+            self.screen_reader.frame_gate.reset()
         # TODO 多分websocketなのでプレイ中に都度送信しても負荷が低い
         # self.result_database.broadcast_graph_data(self.start_time_with_offset)
     
@@ -913,6 +937,10 @@ class MainWindow(MainWindowUI):
         """リザルト画面での処理"""
         try:
             detailed_result = self.screen_reader.read_result_screen()
+            if not detailed_result or not detailed_result.result or not detailed_result.result.chart_id:
+                # 読み取りに失敗した場合、同じ画面でも次のフレームで読み直す(登録前に省略されないように)
+                self.screen_reader.frame_gate.reset()
+                return
             result = detailed_result.result
             result.timestamp = self.result_timestamp
             if result and result.chart_id:
@@ -949,11 +977,14 @@ class MainWindow(MainWindowUI):
                         ,battle=result.option.battle
                         ,playspeed=result.playspeed
                     )
+                else:
+                    # 同じ認識結果が2回続くまでは、監視領域が変わっていなくても次のフレームを読む
+                    self.screen_reader.frame_gate.reset()
 
                 self.result_pre = result
         except Exception:
             # logger.error(f"リザルト処理エラー: {traceback.format_exc()}")
-            pass
+            self.screen_reader.frame_gate.reset()
 
     def process_option_mode(self):
         """オプション画面での処理"""
@@ -968,6 +999,9 @@ class MainWindow(MainWindowUI):
         # グローバルホットキーの解除
         self.remove_global_hotkeys()
         
+        # キャプチャスレッドを停止
+        self.frame_capture.stop()
+
         # OBS接続を切断（監視スレッドも停止）
         self.obs_manager.disconnect()
 
@@ -986,7 +1020,6 @@ class MainWindow(MainWindowUI):
             bpim2_savecache()
         
         # タイマーを停止
-        self.main_timer.stop()
         self.display_timer.stop()
         self.select_bpim2_timer.stop()
 
@@ -994,6 +1027,9 @@ class MainWindow(MainWindowUI):
         if self.score_viewer is not None:
             self.score_viewer.close()
 
+        # プレーログの未保存分を書き出し
+        self.result_database.close()
+
         # WebSocketサーバーとHTMLサーバーを停止
         if hasattr(self.result_database, 'shutdown_servers'):
             self.result_database.shutdown_servers()
@@ -1021,13 +1057,7 @@ class MainWindow(MainWindowUI):
     def _collect_today_updates(self) -> str:
         '''本日のリザルトからレベル別ランプ更新数・新規AA/AAA/MAX-数を集計'''
         # 本日のresultモードのリザルトを収集
-        today_results = []
-        for r in reversed(self.result_database.results):
-            if r.detect_mode == detect_mode.result:
-                if r.timestamp >= self.start_time_with_offset:
-                    today_results.append(r)
-                else:
-                    break
+        today_results = self.result_database.results_between(self.start_time_with_offset, None, detect_mode.result)[::-1]
 
         if not today_results:
             return ""
@@ -107,6 +107,20 @@ build_exe_options = {
         "src.obs_dialog",
         "src.direct_window_capture",
         "src.mobile_http_server",
+        "src.frame_capture",
+        "src.frame_gate",
+        "src.fast_imagehash",
+        "src.screen_classifier",
+        "src.recognition_cache",
+        "src.playlog_journal",
+        "src.playlog_sqlite",
+        "src.play_columns",
+        "src.calendar_rollup",
+        "src.time_index",
+        "src.debounced_saver",
+        "src.playlog_segments",
+        "src.file_codec",
+        "src.title_index",
         # ctypes関連（Windows APIアクセスに必要）
         "ctypes",
         "ctypes.wintypes",
@@ -0,0 +1,203 @@
+"""プレーログの日・月・年ごとの集計(ノーツ数、リザルト数、判定の合計)。
+
+年 -> 月 -> 日 の木で集計を持ち、リザルトの追加・削除のたびに該当する日から根までの各段を更新する。
+日付はautoload_offset(時間)だけずらした時刻で決める。例えばoffsetが4なら、午前4時までのプレーは前日に数える。
+日時が無いリザルト(timestampが0やNone)は日付""として数える(年・月のキーも"")。
+"""
+
+import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from src.play_columns import JUDGE_FIELDS, PlayColumns
+
+
+class CalendarTotal:
+    """1つの日・月・年(または全期間)の集計"""
+    __slots__ = ('notes', 'plays', 'play_count', 'judge', 'children')
+
+    def __init__(self, has_children: bool = True):
+        self.notes = 0
+        '''プレー画面から登録したリザルトのノーツ数(pg+gr+gd+bd)の合計'''
+        self.plays = 0
+        '''プレー画面から登録した、判定のあるリザルトの件数'''
+        self.play_count = 0
+        '''リザルト画面から登録したリザルトの件数'''
+        self.judge = [0] * len(JUDGE_FIELDS)
+        '''プレー画面から登録したリザルトの判定の合計。並びはJUDGE_FIELDS'''
+        self.children: Optional[Dict[str, 'CalendarTotal']] = {} if has_children else None
+        '''1段下の集計(年なら月、月なら日)。日ではNone'''
+
+    def _add(self, notes: int, plays: int, play_count: int, judge, sign: int):
+        self.notes += sign * notes
+        self.plays += sign * plays
+        self.play_count += sign * play_count
+        for i, v in enumerate(judge):
+            self.judge[i] += sign * v
+
+    @property
+    def empty(self) -> bool:
+        return self.plays <= 0 and self.play_count <= 0
+
+    def __repr__(self):
+        return f"CalendarTotal(notes={self.notes}, plays={self.plays}, play_count={self.play_count})"
+
+
+class CalendarRollup:
+    """日・月・年ごとの集計の木。rebuild()で全件から作り、add_row()で1件ずつ追従する。"""
+    def __init__(self):
+        self.offset_hours = 0
+        '''日付の区切りを0時から何時間ずらすか(autoload_offset)'''
+        self.total = CalendarTotal()
+        '''全期間の集計。childrenは年ごとの集計'''
+        self.synced = False
+        '''集計がリザルトと一致しているかどうか。Falseなら次の参照時に作り直す'''
+
+    def day_key(self, timestamp) -> str:
+        """timestampの日付('%Y-%m-%d')。日時が無い、または変換できない場合は''"""
+        if not timestamp or timestamp != timestamp: # 0, None, NaN
+            return ''
+        try:
+            return datetime.datetime.fromtimestamp(timestamp - self.offset_hours * 3600).strftime('%Y-%m-%d')
+        except Exception:
+            return ''
+
+    def day_range(self, date_key: str) -> Optional[Tuple[float, float]]:
+        """日付date_keyに数えるtimestampの範囲[begin, end)。date_keyが日付でなければNone"""
+        try:
+            date = datetime.datetime.strptime(date_key, '%Y-%m-%d')
+        except (TypeError, ValueError):
+            return None
+        offset = self.offset_hours * 3600
+        return date.timestamp() + offset, (date + datetime.timedelta(days=1)).timestamp() + offset
+
+    def _apply(self, date_key: str, notes: int, plays: int, play_count: int, judge, sign: int = 1):
+        """日付date_keyとその月・年・全期間の集計に加算(sign=-1なら減算)する"""
+        path = (date_key[:4], date_key[:7], date_key)
+        nodes = [self.total]
+        for depth, key in enumerate(path):
+            children = nodes[-1].children
+            node = children.get(key)
+            if node is None:
+                if sign < 0:
+                    return
+                node = children[key] = CalendarTotal(has_children=depth < len(path) - 1)
+            nodes.append(node)
+        for node in nodes:
+            node._add(notes, plays, play_count, judge, sign)
+        if sign < 0: # 空になった日・月・年を取り除く
+            for depth in range(len(path), 0, -1):
+                node = nodes[depth]
+                if node.empty or (node.children is not None and not node.children):
+                    del nodes[depth - 1].children[path[depth - 1]]
+
+    def add_row(self, timestamp, judge, play: bool, has_judge: bool, is_result: bool, sign: int = 1):
+        """PlayColumns.row()の1行を集計に加える(sign=-1なら取り除く)"""
+        counted = play and has_judge
+        if not counted and not is_result:
+            return
+        notes = sum(judge[:4]) if counted else 0
+        self._apply(
+            self.day_key(timestamp), notes, int(counted), int(is_result),
+            judge if counted else (0,) * len(JUDGE_FIELDS), sign,
+        )
+
+    def add_summary(self, timestamp, plays: int, play_count: int, judge):
+        """リザルトを読み込まずに、要約(件数と判定の合計)を日付timestampの集計に加える。
+        プレーログの分割保存で、読み込んでいないセグメントの分を数えるために使う
+        """
+        self._apply(self.day_key(timestamp), sum(judge[:4]), plays, play_count, judge)
+
+    def rebuild(self, columns: PlayColumns, offset_hours: int = 0):
+        """columnsの全行から集計を作り直す"""
+        self.offset_hours = offset_hours
+        self.total = CalendarTotal()
+        counted = columns.play & columns.has_judge
+        target = counted | columns.result
+        ts = columns.timestamp[target]
+        judge = np.where(counted[target][:, None], columns.judge[target], 0)
+        counted = counted[target]
+        is_result = columns.result[target]
+        no_time = (ts == 0) | np.isnan(ts)
+        keys, idx = self._day_keys(ts[~no_time] - offset_hours * 3600)
+        if no_time.any():
+            keys.append('')
+            day_idx = np.empty(len(ts), dtype=np.int64)
+            day_idx[~no_time] = idx
+            day_idx[no_time] = len(keys) - 1
+        else:
+            day_idx = idx
+        n = len(keys)
+        plays = np.bincount(day_idx, weights=counted, minlength=n).astype(np.int64)
+        play_count = np.bincount(day_idx, weights=is_result, minlength=n).astype(np.int64)
+        judge_sums = np.zeros((n, len(JUDGE_FIELDS)), dtype=np.int64)
+        np.add.at(judge_sums, day_idx, judge)
+        for i, key in enumerate(keys):
+            if plays[i] or play_count[i]:
+                sums = judge_sums[i].tolist()
+                self._apply(key, sum(sums[:4]), int(plays[i]), int(play_count[i]), sums)
+        self.synced = True
+
+    def _day_keys(self, ts: np.ndarray) -> Tuple[List[str], np.ndarray]:
+        """ずらし済みのtimestampの列を日付に振り分ける。
+        Returns:
+            List[str]: 日付のリスト
+            np.ndarray: 各行の日付のリストでの位置
+        """
+        if len(ts) == 0:
+            return [], np.empty(0, dtype=np.int64)
+        try:
+            first = datetime.datetime.fromtimestamp(ts.min()).date()
+            last = datetime.datetime.fromtimestamp(ts.max()).date()
+        except (OverflowError, OSError, ValueError):
+            first = last = None
+        if first is None or (last - first).days > 100000: # 範囲外の日時がある場合は1件ずつ変換する
+            keys = {}
+            idx = np.array([
+                keys.setdefault(self.day_key(t + self.offset_hours * 3600), len(keys)) for t in ts.tolist()
+            ], dtype=np.int64)
+            return list(keys), idx
+        # 各日の0時を境界として振り分ける
+        dates = [first + datetime.timedelta(days=i) for i in range((last - first).days + 1)]
+        starts = [datetime.datetime(d.year, d.month, d.day).timestamp() for d in dates]
+        idx = np.searchsorted(starts, ts, side='right') - 1
+        return [d.strftime('%Y-%m-%d') for d in dates], idx
+
+    # 参照
+    def years(self) -> List[Tuple[str, CalendarTotal]]:
+        """年ごとの集計(新しい順)"""
+        return sorted(self.total.children.items(), reverse=True)
+
+    def months(self, year_key: Optional[str] = None) -> List[Tuple[str, CalendarTotal]]:
+        """月ごとの集計(新しい順)。year_keyを指定した場合はその年のみ"""
+        if year_key is not None:
+            year = self.total.children.get(year_key)
+            return sorted(year.children.items(), reverse=True) if year else []
+        return sorted(
+            (item for year in self.total.children.values() for item in year.children.items()), reverse=True
+        )
+
+    def days(self, month_key: Optional[str] = None) -> List[Tuple[str, CalendarTotal]]:
+        """日ごとの集計(新しい順)。month_key('%Y-%m')を指定した場合はその月のみ"""
+        if month_key is not None:
+            month = self.month(month_key)
+            return sorted(month.children.items(), reverse=True) if month else []
+        return sorted(self._iter_days(), reverse=True)
+
+    def _iter_days(self) -> Iterator[Tuple[str, CalendarTotal]]:
+        for year in self.total.children.values():
+            for month in year.children.values():
+                yield from month.children.items()
+
+    def month(self, month_key: str) -> Optional[CalendarTotal]:
+        year = self.total.children.get(month_key[:4])
+        return year.children.get(month_key) if year else None
+
+    def day(self, date_key: str) -> Optional[CalendarTotal]:
+        month = self.month(date_key[:7])
+        return month.children.get(date_key) if month else None
+
+    def notes_by_date(self) -> Dict[str, int]:
+        """日付ごとのノーツ数(プレー画面からのリザルトがある日のみ)"""
+        return {key: node.notes for key, node in self._iter_days() if node.plays}
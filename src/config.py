@@ -22,6 +22,20 @@ class Config:
         """直接取得対象のウィンドウタイトル。exe一致時のフォールバックも行う。"""
         self.direct_capture_all_monitors = False
         """直接取得時に常に全モニターを対象にするか。Falseの場合は対象ウィンドウ位置から自動判定する。"""
+        self.obs_capture_in_memory = True
+        """OBS取得時にPNGファイルを介さずWebSocket応答(base64)から直接画像を得るか。失敗時はファイル経由にフォールバックする。"""
+        self.playlog_backend = "pickle"
+        """プレーログの保存形式。pickle(playlog.infdc)、sqlite(playlog.sqlite3)またはsegments(playlog_segments/に月ごとに分割)。
+        sqlite・segmentsへの切り替え時はplaylog.infdcから移行する。"""
+        self.playlog_recent_months = 13
+        """playlog_backendがsegmentsの場合に起動時に読み込む直近の月数。古い月は必要になった時点で読み込む。"""
+        self.songinfo_cache = False
+        """songinfo.infdcを展開済みの状態でsonginfo.cacheに保存し、起動時の読み込みを速くするか。songinfo.infdcが変わると作り直す。"""
+        self.file_codec = "bz2:9"
+        """playlog.infdc、songinfo.infdc、out/rival_log.infdcの圧縮形式(none, zlib:1-9, lzma:0-9, bz2:1-9)。
+        読み込み時は形式を自動で判別する。比較はmisc/bench_file_codec.pyで行える。"""
+        self.playlog_journal = True
+        """プレーログを追記型のジャーナルで保存するか。Falseなら保存のたびに全件を書き出す。"""
         self.autoload_offset = 4
         self.main_window_geometry = None
 
@@ -100,6 +114,12 @@ class Config:
                     self.direct_capture_exe = config_data.get("direct_capture_exe", "bm2dx.exe")
                     self.direct_capture_title = config_data.get("direct_capture_title", "beatmania IIDX INFINITAS")
                     self.direct_capture_all_monitors = config_data.get("direct_capture_all_monitors", False)
+                    self.obs_capture_in_memory = config_data.get("obs_capture_in_memory", True)
+                    self.playlog_backend = config_data.get("playlog_backend", "pickle")
+                    self.playlog_recent_months = config_data.get("playlog_recent_months", 13)
+                    self.songinfo_cache = config_data.get("songinfo_cache", False)
+                    self.file_codec = config_data.get("file_codec", "bz2:9")
+                    self.playlog_journal = config_data.get("playlog_journal", True)
                     self.keep_on_top = config_data.get("keep_on_top", False)
                     self.enable_autotweet = config_data.get("enable_autotweet", False)
                     self.enable_judge = config_data.get("enable_judge", True)
@@ -181,6 +201,12 @@ class Config:
             "direct_capture_exe": self.direct_capture_exe,
             "direct_capture_title": self.direct_capture_title,
             "direct_capture_all_monitors": self.direct_capture_all_monitors,
+            "obs_capture_in_memory": self.obs_capture_in_memory,
+            "playlog_backend": self.playlog_backend,
+            "playlog_recent_months": self.playlog_recent_months,
+            "songinfo_cache": self.songinfo_cache,
+            "file_codec": self.file_codec,
+            "playlog_journal": self.playlog_journal,
             "keep_on_top": self.keep_on_top,
             "enable_autotweet": self.enable_autotweet,
             "enable_judge": self.enable_judge,
@@ -7,7 +7,8 @@ from PySide6.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QFormLayout,
                                QLineEdit, QSpinBox, QCheckBox, QPushButton,
                                QGroupBox, QFileDialog, QTabWidget, QWidget,
                                QLabel, QDialogButtonBox, QRadioButton,
-                               QButtonGroup, QScrollArea, QGridLayout, QProgressBar)
+                               QButtonGroup, QScrollArea, QGridLayout, QProgressBar,
+                               QComboBox)
 from PySide6.QtCore import Qt, QThread, Signal
 from PySide6.QtGui import QIntValidator
 import os
@@ -75,8 +76,8 @@ class ImageImportWorker(QThread):
             # 完了通知
             self.finished.emit(registered_count, total_count)
             
+            self.result_database.sort_results()
             self.result_database.save()
-            self.result_database.results.sort()
                 
         except Exception as e:
             self.error.emit(str(e))
@@ -165,6 +166,10 @@ class PklImportWorker(QThread):
 
 class ConfigDialog(QDialog):
     """設定ダイアログクラス"""
+    PLAYLOG_BACKENDS = ('pickle', 'sqlite', 'segments')
+    '''プレーログの保存形式の選択肢(Config.playlog_backendの値)。ボタンのIDは並び順'''
+    FILE_CODECS = ('bz2:9', 'zlib:6', 'lzma:6', 'none')
+    '''保存ファイルの圧縮形式の選択肢(Config.file_codecの値)'''
     
     def __init__(self, config: Config, result_database:ResultDatabase=None, screen_reader:ScreenReader=None, parent=None):
         super().__init__(parent)
@@ -236,6 +241,9 @@ class ConfigDialog(QDialog):
         self.direct_capture_all_monitors_check = QCheckBox(self.ui.feature.direct_capture_all_monitors)
         self.direct_capture_all_monitors_check.setToolTip(self.ui.feature.direct_capture_all_monitors_tip)
         game_capture_layout.addWidget(self.direct_capture_all_monitors_check)
+        self.obs_capture_in_memory_check = QCheckBox(self.ui.feature.obs_capture_in_memory)
+        self.obs_capture_in_memory_check.setToolTip(self.ui.feature.obs_capture_in_memory_tip)
+        game_capture_layout.addWidget(self.obs_capture_in_memory_check)
         self.capture_method_group.idClicked.connect(self._update_direct_capture_option_enabled)
 
         self.enable_music_select_score_import_check = QCheckBox(self.ui.feature.enable_music_select_score_import)
@@ -296,6 +304,10 @@ class ConfigDialog(QDialog):
             self.mobile_score_server_port_edit,
         )
 
+        self.songinfo_cache_check = QCheckBox(self.ui.feature.songinfo_cache)
+        self.songinfo_cache_check.setToolTip(self.ui.feature.songinfo_cache_tip)
+        other_layout.addRow(self.songinfo_cache_check)
+
         # 最前面表示 
         self.keep_on_top_check = QCheckBox(self.ui.feature.keep_on_top)
         other_layout.addRow(self.keep_on_top_check)
@@ -330,8 +342,15 @@ class ConfigDialog(QDialog):
         return widget
 
     def _update_direct_capture_option_enabled(self, *_args):
-        """直接取得向けの詳細設定を、直接取得選択時だけ操作可能にする。"""
+        """直接取得・OBS WebSocket経由向けの詳細設定を、それぞれの選択時だけ操作可能にする。"""
         self.direct_capture_all_monitors_check.setEnabled(self.capture_method_group.checkedId() == 0)
+        self.obs_capture_in_memory_check.setEnabled(self.capture_method_group.checkedId() == 1)
+
+    def _update_playlog_option_enabled(self, *_args):
+        """保存形式ごとの詳細設定を、その形式の選択時だけ操作可能にする。"""
+        backend = self.PLAYLOG_BACKENDS[max(self.playlog_backend_group.checkedId(), 0)]
+        self.playlog_journal_check.setEnabled(backend == 'pickle')
+        self.playlog_recent_months_spin.setEnabled(backend == 'segments')
 
     def on_browse_clicked(self):
         """フォルダ参照ボタン押下時の処理"""
@@ -543,6 +562,39 @@ class ConfigDialog(QDialog):
         # ワーカースレッドの参照
         self.pkl_import_worker = None
 
+        # プレーログの保存グループ
+        playlog_group = QGroupBox(self.ui.data_import.playlog_group)
+        playlog_layout = QFormLayout()
+        playlog_group.setLayout(playlog_layout)
+
+        playlog_layout.addRow(QLabel(self.ui.data_import.playlog_restart_note))
+
+        self.playlog_backend_group = QButtonGroup()
+        backend_layout = QHBoxLayout()
+        for i, backend in enumerate(self.PLAYLOG_BACKENDS):
+            radio = QRadioButton(getattr(self.ui.data_import, f'playlog_backend_{backend}'))
+            self.playlog_backend_group.addButton(radio, i)
+            backend_layout.addWidget(radio)
+        backend_layout.addStretch()
+        playlog_layout.addRow(self.ui.data_import.playlog_backend, backend_layout)
+        self.playlog_backend_group.idClicked.connect(self._update_playlog_option_enabled)
+
+        self.playlog_journal_check = QCheckBox(self.ui.data_import.playlog_journal)
+        self.playlog_journal_check.setToolTip(self.ui.data_import.playlog_journal_tip)
+        playlog_layout.addRow(self.playlog_journal_check)
+
+        self.playlog_recent_months_spin = QSpinBox()
+        self.playlog_recent_months_spin.setRange(1, 120)
+        self.playlog_recent_months_spin.setToolTip(self.ui.data_import.playlog_recent_months_tip)
+        playlog_layout.addRow(self.ui.data_import.playlog_recent_months, self.playlog_recent_months_spin)
+
+        self.file_codec_combo = QComboBox()
+        self.file_codec_combo.addItems(self.FILE_CODECS)
+        self.file_codec_combo.setToolTip(self.ui.data_import.file_codec_tip)
+        playlog_layout.addRow(self.ui.data_import.file_codec, self.file_codec_combo)
+
+        layout.addWidget(playlog_group)
+
         layout.addStretch()
         return widget
 
@@ -783,6 +835,9 @@ class ConfigDialog(QDialog):
         self.direct_capture_all_monitors_check.setChecked(
             bool(getattr(self.config, 'direct_capture_all_monitors', False))
         )
+        self.obs_capture_in_memory_check.setChecked(
+            bool(getattr(self.config, 'obs_capture_in_memory', True))
+        )
         self._update_direct_capture_option_enabled()
         self.autoload_offset_spin.setValue(self.config.autoload_offset)
         if hasattr(self, 'websocket_data_port') and hasattr(self.config, 'websocket_data_port'):
@@ -796,6 +851,8 @@ class ConfigDialog(QDialog):
                 str(getattr(self.config, 'mobile_score_server_port', 8787))
             )
         
+        self.songinfo_cache_check.setChecked(bool(getattr(self.config, 'songinfo_cache', False)))
+        
         # 画像保存先 (Configクラスに image_save_path プロパティがある前提)
         if hasattr(self.config, 'image_save_path'):
             self.image_save_path_edit.setText(self.config.image_save_path)
@@ -823,6 +880,20 @@ class ConfigDialog(QDialog):
         if hasattr(self.config, 'include_legacy_v2_logs'):
             self.include_legacy_v2_logs_check.setChecked(self.config.include_legacy_v2_logs)
 
+        # プレーログの保存
+        backend = getattr(self.config, 'playlog_backend', 'pickle')
+        button = self.playlog_backend_group.button(
+            self.PLAYLOG_BACKENDS.index(backend) if backend in self.PLAYLOG_BACKENDS else 0
+        )
+        button.setChecked(True)
+        self.playlog_journal_check.setChecked(bool(getattr(self.config, 'playlog_journal', True)))
+        self.playlog_recent_months_spin.setValue(getattr(self.config, 'playlog_recent_months', 13))
+        file_codec = getattr(self.config, 'file_codec', self.FILE_CODECS[0])
+        if self.file_codec_combo.findText(file_codec) < 0: # config.jsonで直接指定したレベルなど
+            self.file_codec_combo.addItem(file_codec)
+        self.file_codec_combo.setCurrentText(file_codec)
+        self._update_playlog_option_enabled()
+
         if hasattr(self.config, 'enable_katate_difficulty_display'):
             self.enable_katate_difficulty_display_check.setChecked(
                 self.config.enable_katate_difficulty_display
@@ -862,6 +933,7 @@ class ConfigDialog(QDialog):
             else 'obs_websocket'
         )
         self.config.direct_capture_all_monitors = self.direct_capture_all_monitors_check.isChecked()
+        self.config.obs_capture_in_memory = self.obs_capture_in_memory_check.isChecked()
         self.config.autoload_offset = self.autoload_offset_spin.value()
         # WebSocketデータポート設定
         try:
@@ -882,6 +954,8 @@ class ConfigDialog(QDialog):
         except ValueError:
             logger.warning("スマホ用HTTPポート番号の変換に失敗しました。デフォルト値を使用します")
         
+        self.config.songinfo_cache = self.songinfo_cache_check.isChecked()
+        
         # 画像保存先
         self.config.image_save_path = self.image_save_path_edit.text()
         
@@ -896,6 +970,10 @@ class ConfigDialog(QDialog):
         self.config.modify_rivalarea_mode = config_modify_rivalarea(self.rivalarea_button_group.checkedId())
         self.config.write_statistics = self.write_statistics_check.isChecked()
         self.config.include_legacy_v2_logs = self.include_legacy_v2_logs_check.isChecked()
+        self.config.playlog_backend = self.PLAYLOG_BACKENDS[max(self.playlog_backend_group.checkedId(), 0)]
+        self.config.playlog_journal = self.playlog_journal_check.isChecked()
+        self.config.playlog_recent_months = self.playlog_recent_months_spin.value()
+        self.config.file_codec = self.file_codec_combo.currentText()
         self.config.enable_katate_difficulty_display = self.enable_katate_difficulty_display_check.isChecked()
         self.config.enable_katate_tweet_grouping = self.enable_katate_tweet_grouping_check.isChecked()
         
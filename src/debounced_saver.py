@@ -0,0 +1,108 @@
+"""保存要求をまとめてバックグラウンドで実行する仕組み。
+
+1曲の間にsave()が何度も(プレー終了、リザルト登録、画像保存後など)呼ばれるため、
+最初の要求から一定時間内の要求を1回の保存にまとめ、GUIスレッドの外で実行する。
+"""
+
+import threading
+import time
+import traceback
+from typing import Callable, Optional
+
+from src.logger import get_logger
+logger = get_logger(__name__)
+
+
+class DebouncedSaver:
+    """request()で保存を予約し、最初の予約からdelay_ms後に専用スレッドでsave_funcを1回呼ぶ。
+
+    delay_msが0以下なら予約せずにその場で保存する。flush()で予約分を直ちに保存する(終了時用)。
+    """
+    def __init__(self, save_func: Callable[[], None], name: str = "SaveThread"):
+        self._save_func = save_func
+        self._name = name
+        self._cond = threading.Condition()
+        self._save_lock = threading.Lock()
+        self._due: Optional[float] = None
+        '''予約中の保存を行う時刻(time.monotonic())。予約が無ければNone'''
+        self._saving = 0
+        '''実行中(実行待ちを含む)の保存の数'''
+        self._stopped = False
+        self._thread: Optional[threading.Thread] = None
+        self.requests = 0
+        '''受け付けた保存要求の数'''
+        self.saves = 0
+        '''実際に保存した回数'''
+        self.last_save_ms = 0.0
+        '''直近の保存の所要時間(ms)'''
+
+    @property
+    def pending(self) -> bool:
+        '''未実行の保存予約がある、または保存中かどうか'''
+        with self._cond:
+            return self._due is not None or self._saving > 0
+
+    def request(self, delay_ms: int):
+        """保存を予約する。既に予約があればその保存にまとめる"""
+        self.requests += 1
+        if delay_ms <= 0:
+            with self._cond:
+                self._due = None # 予約分もこの保存にまとめる
+                self._saving += 1
+            self._run_save()
+            return
+        with self._cond:
+            if self._due is None:
+                self._due = time.monotonic() + delay_ms / 1000
+            self._stopped = False
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, daemon=True, name=self._name)
+                self._thread.start()
+            self._cond.notify()
+
+    def flush(self):
+        """予約中の保存があれば直ちに実行し、保存中のものがあれば完了を待つ"""
+        with self._cond:
+            due = self._due
+            self._due = None
+            if due is None:
+                while self._saving:
+                    self._cond.wait()
+                return
+            self._saving += 1
+        self._run_save()
+
+    def stop(self):
+        """予約分を保存してスレッドを止める"""
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+        if self._thread:
+            self._thread.join(timeout=10.0)
+            self._thread = None
+        self.flush()
+
+    def _run_save(self):
+        with self._save_lock:
+            started = time.perf_counter()
+            try:
+                self._save_func()
+                self.saves += 1
+            except Exception:
+                logger.error(traceback.format_exc())
+            finally:
+                self.last_save_ms = (time.perf_counter() - started) * 1000
+                with self._cond:
+                    self._saving -= 1
+                    self._cond.notify_all()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._stopped and (self._due is None or time.monotonic() < self._due):
+                    self._cond.wait(None if self._due is None else self._due - time.monotonic())
+                if self._stopped:
+                    return
+                self._due = None
+                self._saving += 1
+            self._run_save()
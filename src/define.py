@@ -2,6 +2,15 @@
 """
 from src.classes import *
 
+CAPTURE_SIZE = (1920, 1080)
+'''座標定義の基準となるキャプチャ解像度'''
+
+def scale_box(box:tuple, scale:float) -> tuple:
+    '''基準解像度での矩形(x0, y0, x1, y1)を縮小フレーム上の矩形に変換する'''
+    if scale == 1:
+        return box
+    return tuple(int(round(v * scale)) for v in box)
+
 judge_digits = [20910,8415,19635,18615,17085,20655,23205,13515,24225,23205]
 hash_digits = [
     'a800800080002000', # 0
@@ -36,6 +45,16 @@ class PosIsPlay:
 
 class PosPlayJudge:
     '''プレー画面における詳細判定部分の座標を返すクラス。'''
+    ROWS = 6
+    '''判定の行数(pg～cb)'''
+    DIGITS = 4
+    '''1行あたりの桁数'''
+    CELL = 11
+    '''1桁の幅・高さ'''
+    PITCH_X = 14
+    '''桁の間隔(幅11+隙間3)'''
+    PITCH_Y = 16
+    '''行の間隔(高さ11+隙間5)'''
     _COORDS = {
         play_mode.sp_1p_l:       (632,  969),
         play_mode.sp_1p_r:       (1049, 969),
@@ -56,6 +75,12 @@ class PosPlayJudge:
 class PosResultJudge:
     '''Result画面における詳細判定部分の座標を返すクラス。'''
     items = ['pg', 'gr', 'gd', 'bd', 'pr', 'cb']
+    PITCH = 28
+    '''桁・行の間隔(px)'''
+    W = 23
+    '''1桁の幅'''
+    H = 15
+    '''1桁の高さ'''
     @classmethod
     def get(cls, mode: result_side, item: str, idx: int):
         '''モードに対する判定部分の位置を返す。img.crop()でそのまま使えるようにtupleで返す。'''
@@ -74,7 +99,7 @@ class PosResultJudge:
             else: # combo break
                 x = 1773 + 28*idx
                 y = 981
-        return (x, y, x+23, y+15)
+        return (x, y, x+cls.W, y+cls.H)
 
 class PosOption:
     _COORDS = {
@@ -168,4 +193,28 @@ class PosResultScreen:
 
 class PosIsPlayHash:
     '''プレー画面判定用のハッシュ'''
-    HASH = '105f487f5effb700'
\ No newline at end of file
+    HASH = '105f487f5effb700'
+
+class PosFrameGate:
+    '''フレーム変化検出(FrameGate)で監視する領域。選曲画面はinfnotebookの切り出し範囲を使う。
+
+    リザルト画面は認識で読む部分(曲情報、オプション・ランプ・スコア・ミスカウント、判定内訳)だけを監視し、
+    背景や中央の挑戦状のエフェクトでは変化しないようにする。
+    プレーサイドは認識するまで分からないため、1P・2Pの両方の領域を監視する。
+    '''
+    RESULT_SIDE_OFFSET = 1350
+    '''2P側の領域の、1P側からのx方向のずれ'''
+    RESULT_INFORMATIONS = (560, 912, 1360, 1060)
+    '''曲名・難易度・レベル・ノーツ数'''
+    RESULT_DETAILS_1P = (25, 192, 545, 788)
+    '''オプション・クリアランプ・DJレベル・スコア・ミスカウント(1P側、判定内訳の上まで)'''
+    RESULT_JUDGE_1P = PosResultJudge.get(result_side._1p, 'pg', 0)[:2] + PosResultJudge.get(result_side._1p, 'cb', 3)[2:]
+    '''判定内訳(1P側)'''
+    RESULT = [
+        RESULT_INFORMATIONS,
+        RESULT_DETAILS_1P,
+        (RESULT_DETAILS_1P[0] + RESULT_SIDE_OFFSET, RESULT_DETAILS_1P[1], RESULT_DETAILS_1P[2] + RESULT_SIDE_OFFSET, RESULT_DETAILS_1P[3]),
+        RESULT_JUDGE_1P,
+        PosResultJudge.get(result_side._2p, 'pg', 0)[:2] + PosResultJudge.get(result_side._2p, 'cb', 3)[2:],
+    ]
+    OPTION = [(200, 540, 1740, 910)]
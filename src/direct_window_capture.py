@@ -4,6 +4,7 @@ from __future__ import annotations
 
 import ctypes
 import sys
+import threading
 import time
 from ctypes import wintypes
 
@@ -72,6 +73,8 @@ class DirectWindowCapture:
         self.has_successful_frame = False
         self.read_attempt_count = 0
         self._next_error_log_at = 0.0
+        self._qt_fallback_skipped = False
+        self._qt_fallback_warned = False
 
     def set_config(self, config: Config) -> None:
         self.config = config
@@ -103,9 +106,13 @@ class DirectWindowCapture:
                 self.has_successful_frame = False
                 return None
 
+            self._qt_fallback_skipped = False
             image = self._grab_client_area(hwnd, x, y, width, height)
             if image is None:
-                self.last_error = "対象ウィンドウの画像取得に失敗しました"
+                if self._qt_fallback_skipped:
+                    self.last_error = "GDI/ImageGrabで取得できません(QtのgrabWindowはキャプチャスレッドから使えません)"
+                else:
+                    self.last_error = "対象ウィンドウの画像取得に失敗しました"
                 self.hwnd = None
                 self.has_successful_frame = False
                 return None
@@ -256,6 +263,14 @@ class DirectWindowCapture:
             except Exception as e:
                 self._log_error("ImageGrabで直接キャプチャできませんでした: %s", e)
 
+        # QtのgrabWindowはGUIスレッド以外から呼べないため、キャプチャスレッドでは使わない
+        if threading.current_thread() is not threading.main_thread():
+            self._qt_fallback_skipped = True
+            if not self._qt_fallback_warned:
+                self._qt_fallback_warned = True
+                logger.warning("GDI/ImageGrabで直接キャプチャできず、QtのgrabWindowはキャプチャスレッドから使えないためフレームを取得できません")
+            return None
+
         screen = QGuiApplication.primaryScreen()
         if screen is None:
             return None
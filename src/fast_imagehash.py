@@ -0,0 +1,117 @@
+"""imagehashと同じ値を返す、numpyによるバッチ版ハッシュ計算。
+
+imagehash.average_hash()/phash()は PIL の convert('L') と LANCZOS 縮小を使うため、
+同じ結果を得るには Pillow の固定小数点演算(libImaging/Resample.c)をそのままなぞる必要がある。
+係数行列は入出力サイズごとに一度だけ作り、同じサイズの切り出し画像はまとめて行列演算する。
+"""
+
+import math
+from functools import lru_cache
+from typing import Dict, List, Sequence, Tuple
+
+import imagehash
+import numpy as np
+import scipy.fftpack
+
+_PRECISION_BITS = 32 - 8 - 2
+_HALF = 1 << (_PRECISION_BITS - 1)
+_LANCZOS_SUPPORT = 3.0
+
+
+def _sinc(x: float) -> float:
+    if x == 0.0:
+        return 1.0
+    x = x * math.pi
+    return math.sin(x) / x
+
+
+def _lanczos(x: float) -> float:
+    if -3.0 <= x < 3.0:
+        return _sinc(x) * _sinc(x / 3)
+    return 0.0
+
+
+@lru_cache(maxsize=None)
+def resample_coeffs(in_size: int, out_size: int) -> np.ndarray:
+    """Pillowと同じLANCZOS係数を(out_size, in_size)の固定小数点行列として返す"""
+    scale = in_size / out_size
+    filterscale = max(scale, 1.0)
+    support = _LANCZOS_SUPPORT * filterscale
+    ret = np.zeros((out_size, in_size), dtype=np.int64)
+    for xx in range(out_size):
+        center = (xx + 0.5) * scale
+        ss = 1.0 / filterscale
+        xmin = max(int(center - support + 0.5), 0)
+        xmax = min(int(center + support + 0.5), in_size) - xmin
+        k = [_lanczos((x + xmin - center + 0.5) * ss) for x in range(xmax)]
+        ww = sum(k)
+        for x in range(xmax):
+            w = k[x] / ww if ww != 0.0 else k[x]
+            if w < 0:
+                ret[xx, x + xmin] = int(-0.5 + w * (1 << _PRECISION_BITS))
+            else:
+                ret[xx, x + xmin] = int(0.5 + w * (1 << _PRECISION_BITS))
+    ret.setflags(write=False)
+    return ret
+
+
+def to_luma(rgb: np.ndarray) -> np.ndarray:
+    """PIL の convert('L') と同じ輝度変換。(..., 3) -> (...) のuint8"""
+    rgb = rgb.astype(np.int32)
+    return ((rgb[..., 0] * 19595 + rgb[..., 1] * 38470 + rgb[..., 2] * 7471 + 0x8000) >> 16).astype(np.uint8)
+
+
+def resize_lanczos(gray: np.ndarray, out_w: int, out_h: int) -> np.ndarray:
+    """(n, h, w)のuint8画像群をPIL.Image.resize(LANCZOS)と同じ値で(n, out_h, out_w)に変換"""
+    # 積和は2**53未満の整数に収まるため、float64の行列積(BLAS)でも誤差なく計算できる
+    n, h, w = gray.shape
+    ret = gray
+    if w != out_w: # 横方向
+        kx = resample_coeffs(w, out_w).astype(np.float64)
+        acc = (ret.astype(np.float64) @ kx.T).astype(np.int64)
+        ret = np.clip((acc + _HALF) >> _PRECISION_BITS, 0, 255).astype(np.uint8)
+    if h != out_h: # 縦方向
+        ky = resample_coeffs(h, out_h).astype(np.float64)
+        acc = (ky @ ret.astype(np.float64)).astype(np.int64)
+        ret = np.clip((acc + _HALF) >> _PRECISION_BITS, 0, 255).astype(np.uint8)
+    return ret
+
+
+def average_hash_bits(rgb: np.ndarray, hash_size: int = 8) -> np.ndarray:
+    """同サイズのRGB画像群(n, h, w, 3)のaverage_hashを(n, hash_size**2)のbool配列で返す"""
+    pixels = resize_lanczos(to_luma(rgb), hash_size, hash_size).reshape(len(rgb), -1)
+    return pixels > pixels.mean(axis=1, keepdims=True)
+
+
+def phash_bits(gray: np.ndarray, hash_size: int = 8, highfreq_factor: int = 4) -> np.ndarray:
+    """同サイズのグレースケール画像群(n, h, w)のphashを(n, hash_size**2)のbool配列で返す"""
+    img_size = hash_size * highfreq_factor
+    pixels = resize_lanczos(gray, img_size, img_size)
+    # imagehash.phashと同じく縦→横の順にDCTをかける(1枚ずつ処理した場合と同じ値になる)
+    dct = scipy.fftpack.dct(scipy.fftpack.dct(pixels, axis=1), axis=2)
+    lowfreq = dct[:, :hash_size, :hash_size].reshape(len(gray), -1)
+    return lowfreq > np.median(lowfreq, axis=1, keepdims=True)
+
+
+def hex_to_bits(hex_str: str) -> np.ndarray:
+    """imagehash.hex_to_hashと同じ並びのbool配列(64,)を返す"""
+    return imagehash.hex_to_hash(hex_str).hash.flatten()
+
+
+class BatchAverageHasher:
+    """フレーム内の複数領域のaverage_hashを、領域サイズごとにまとめて計算するクラス"""
+    def __init__(self, boxes: Sequence[Tuple[int, int, int, int]]):
+        self.boxes = list(boxes)
+        groups: Dict[Tuple[int, int], List[int]] = {}
+        for i, (x0, y0, x1, y1) in enumerate(self.boxes):
+            groups.setdefault((y1 - y0, x1 - x0), []).append(i)
+        self.groups = [(np.array(idx), [self.boxes[i] for i in idx]) for idx in groups.values()]
+        '''(元のインデックス, 矩形リスト)のリスト'''
+
+    def hash_bits(self, np_value: np.ndarray) -> np.ndarray:
+        """全領域のaverage_hashを(len(boxes), 64)のbool配列で返す"""
+        ret = np.empty((len(self.boxes), 64), dtype=bool)
+        for idx, boxes in self.groups:
+            crops = np.stack([np_value[y0:y1, x0:x1, :3] for x0, y0, x1, y1 in boxes])
+            ret[idx] = average_hash_bits(crops)
+        return ret
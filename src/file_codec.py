@@ -0,0 +1,156 @@
+"""playlog.infdc、songinfo.infdc、out/rival_log.infdcなどの保存ファイルの圧縮形式。
+
+形式は 'bz2:9' のように「コーデック名:レベル」で指定する(レベルは省略可)。
+    none        無圧縮
+    zlib:1-9    deflate(gzip形式)。圧縮・展開ともに速い
+    lzma:0-9    xz形式。最も小さくなるが圧縮が遅い
+    bz2:1-9     従来の形式
+
+bz2は従来どおりヘッダ無しで書く(旧バージョン・配布中のsonginfo.infdcと互換)。
+それ以外は MAGIC + コーデック番号(1byte) のヘッダを先頭に置き、読み込み時はヘッダ(bz2は'BZh')から形式を判別する。
+"""
+
+import bz2
+import gzip
+import lzma
+import os
+import zlib
+from contextlib import contextmanager
+from typing import Tuple
+
+MAGIC = b'INFDC\x00'
+BZ2_MAGIC = b'BZh'
+CODEC_IDS = {'none': 0, 'zlib': 1, 'lzma': 2, 'bz2': 3}
+'''コーデック名 -> ヘッダに書く番号'''
+DEFAULT_LEVELS = {'none': 0, 'zlib': 6, 'lzma': 6, 'bz2': 9}
+DEFAULT_CODEC = 'bz2:9'
+
+_default_codec = DEFAULT_CODEC
+
+
+def parse_codec(spec: str) -> Tuple[str, int]:
+    """'zlib:1'のような指定を(コーデック名, レベル)にする。不正な指定はValueError"""
+    name, _, level = str(spec or DEFAULT_CODEC).strip().lower().partition(':')
+    if name not in CODEC_IDS:
+        raise ValueError(f'unknown codec: {spec}')
+    level = int(level) if level else DEFAULT_LEVELS[name]
+    if not (1 if name == 'bz2' else 0) <= level <= 9:
+        raise ValueError(f'invalid level: {spec}')
+    return name, level
+
+
+def set_default_codec(spec: str):
+    """codecを省略した書き込みで使う形式を設定する(設定のfile_codec)"""
+    global _default_codec
+    parse_codec(spec)
+    _default_codec = spec
+
+
+def get_default_codec() -> str:
+    return _default_codec
+
+
+def detect_codec(head: bytes) -> str:
+    """ファイル先頭のバイト列から形式を判別する"""
+    if head.startswith(MAGIC) and len(head) > len(MAGIC):
+        for name, codec_id in CODEC_IDS.items():
+            if head[len(MAGIC)] == codec_id:
+                return name
+        raise ValueError(f'unknown codec id: {head[len(MAGIC)]}')
+    if head.startswith(BZ2_MAGIC):
+        return 'bz2'
+    raise ValueError('unknown file format')
+
+
+def _wrap_read(raw, name: str):
+    if name == 'zlib':
+        return gzip.GzipFile(fileobj=raw, mode='rb')
+    if name == 'lzma':
+        return lzma.LZMAFile(raw, 'rb')
+    if name == 'bz2':
+        return bz2.BZ2File(raw, 'rb')
+    return raw
+
+
+def _wrap_write(raw, name: str, level: int):
+    if name == 'zlib':
+        return gzip.GzipFile(fileobj=raw, mode='wb', compresslevel=level, mtime=0)
+    if name == 'lzma':
+        return lzma.LZMAFile(raw, 'wb', preset=level)
+    if name == 'bz2':
+        return bz2.BZ2File(raw, 'wb', compresslevel=level)
+    return raw
+
+
+@contextmanager
+def open_read(path: str):
+    """形式を判別して展開しながら読むファイルオブジェクトを返す"""
+    with open(path, 'rb') as raw:
+        head = raw.read(len(MAGIC) + 1)
+        name = detect_codec(head)
+        if name == 'bz2' and not head.startswith(MAGIC):
+            raw.seek(0)
+        f = _wrap_read(raw, name)
+        try:
+            yield f
+        finally:
+            if f is not raw:
+                f.close()
+
+
+@contextmanager
+def open_write(raw, codec: str = None):
+    """開いたファイル(raw)に、codecの形式で圧縮しながら書くファイルオブジェクトを返す。
+    codecを省略した場合はset_default_codec()の形式。閉じた後のflush・fsyncは呼び出し側で行う。
+    """
+    name, level = parse_codec(codec or _default_codec)
+    if name != 'bz2':
+        raw.write(MAGIC + bytes([CODEC_IDS[name]]))
+    f = _wrap_write(raw, name, level)
+    try:
+        yield f
+    finally:
+        if f is not raw:
+            f.close()
+
+
+@contextmanager
+def write_file(path: str, codec: str = None):
+    """pathに一時ファイル経由でcodecの形式で書き込む。正常に抜けた場合だけ置き換える"""
+    tmp = path + '.tmp'
+    try:
+        with open(tmp, 'wb') as raw:
+            with open_write(raw, codec) as f:
+                yield f
+            raw.flush()
+            os.fsync(raw.fileno())
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def compress(data: bytes, codec: str = None) -> bytes:
+    """bytesをcodecの形式(ヘッダ付き。bz2はヘッダ無し)に圧縮する"""
+    name, level = parse_codec(codec or _default_codec)
+    if name == 'bz2':
+        return bz2.compress(data, compresslevel=level)
+    header = MAGIC + bytes([CODEC_IDS[name]])
+    if name == 'zlib':
+        return header + zlib.compress(data, level)
+    if name == 'lzma':
+        return header + lzma.compress(data, preset=level)
+    return header + data
+
+
+def decompress(data: bytes) -> bytes:
+    """compress()したbytesを形式を判別して展開する"""
+    name = detect_codec(data[:len(MAGIC) + 1])
+    if name == 'bz2':
+        return bz2.decompress(data)
+    body = memoryview(data)[len(MAGIC) + 1:]
+    if name == 'zlib':
+        return zlib.decompress(body)
+    if name == 'lzma':
+        return lzma.decompress(body)
+    return bytes(body)
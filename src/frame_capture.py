@@ -0,0 +1,265 @@
+"""キャプチャ専用スレッドとフレームリングバッファ"""
+
+import threading
+import time
+import traceback
+from collections import deque
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from PySide6.QtCore import QObject, Signal
+
+from src.classes import detect_mode
+from src.define import CAPTURE_SIZE
+from src.logger import get_logger
+logger = get_logger(__name__)
+
+
+@dataclass
+class CapturedFrame:
+    """リングバッファから取り出した1フレーム"""
+    seq: int
+    '''通し番号(1始まり)'''
+    timestamp: float
+    '''キャプチャ時刻(time.monotonic())'''
+    np_value: np.ndarray
+    '''RGB画像。次のtake_latest()まではキャプチャスレッドに上書きされない'''
+
+
+class FrameRing:
+    """事前確保したnumpyバッファを使い回す固定長のフレームリング。
+
+    書き込み側(キャプチャスレッド)は、最新フレームと読み出し中フレーム以外の
+    スロットに書き込む。読み出し側は常に最新フレームだけを取り出し、
+    読まれずに上書きされた古いフレームは破棄(dropped)として数える。
+    縮小フレームと等倍フレームが交互に来ても確保し直さないよう、各スロットは解像度ごとにバッファを持つ。
+    """
+    def __init__(self, size: int = 3, shape=(1080, 1920, 3)):
+        if size < 3:
+            raise ValueError('FrameRing needs at least 3 slots')
+        self._buffers: List[Dict[tuple, np.ndarray]] = [{tuple(shape): np.empty(shape, dtype=np.uint8)} for _ in range(size)]
+        '''スロットごとの 解像度(shape) -> バッファ'''
+        self._shapes: List[tuple] = [tuple(shape)] * size
+        '''スロットごとの書き込まれたフレームの解像度'''
+        self._seq = [0] * size
+        self._timestamps = [0.0] * size
+        self._lock = threading.Lock()
+        self._latest: Optional[int] = None
+        '''最新フレームのスロット番号'''
+        self._reading: Optional[int] = None
+        '''読み出し側が保持しているスロット番号'''
+        self._next_seq = 1
+        self._last_taken_seq = 0
+        self.written = 0
+        '''書き込まれたフレーム数'''
+        self.dropped = 0
+        '''読まれずに破棄されたフレーム数'''
+
+    def write(self, np_value: np.ndarray, timestamp: float) -> int:
+        """フレームを空きスロットにコピーして公開する。通し番号を返す。"""
+        with self._lock:
+            idx = next(i for i in range(len(self._buffers)) if i != self._latest and i != self._reading)
+        shape = np_value.shape
+        buf = self._buffers[idx].get(shape)
+        if buf is None:
+            # 初めての解像度の場合のみ確保する
+            buf = np.empty(shape, dtype=np.uint8)
+            self._buffers[idx][shape] = buf
+        np.copyto(buf, np_value)
+        with self._lock:
+            if self._latest is not None and self._seq[self._latest] > self._last_taken_seq:
+                self.dropped += 1
+            seq = self._next_seq
+            self._next_seq += 1
+            self._seq[idx] = seq
+            self._shapes[idx] = shape
+            self._timestamps[idx] = timestamp
+            self._latest = idx
+            self.written += 1
+        return seq
+
+    def take_latest(self) -> Optional[CapturedFrame]:
+        """未読の最新フレームを取り出す。新しいフレームが無ければNone。"""
+        with self._lock:
+            idx = self._latest
+            if idx is None or self._seq[idx] <= self._last_taken_seq:
+                return None
+            self._reading = idx
+            self._last_taken_seq = self._seq[idx]
+            return CapturedFrame(self._seq[idx], self._timestamps[idx], self._buffers[idx][self._shapes[idx]])
+
+
+class CaptureScheduler:
+    """キャプチャ解像度を決めるクラス。
+
+    画面判定(is_*)は小さなハッシュ領域しか見ないため、通常は縮小フレームを要求する。
+    OCRが必要な画面(選曲/プレー/リザルト/オプション)にいる間、プレー終了後にリザルト画面を待つ間、
+    およびrequest_full_resolution()された直後は等倍フレームを要求する。
+    縮小フレームで判定を取りこぼした場合に備え、一定間隔で等倍フレームも取得する。
+    """
+    FULL_RESOLUTION_MODES = (detect_mode.select, detect_mode.play, detect_mode.result, detect_mode.option)
+    REFRESH_INTERVAL = 2.0
+    '''縮小フレーム運用中に等倍フレームを挟む間隔(秒)'''
+    LOWRES_WIDTH = 640
+    '''画面判定だけ行う間に要求する縮小フレームの幅'''
+
+    def __init__(self, lowres_width: int = LOWRES_WIDTH):
+        self.lowres_width = lowres_width
+        '''縮小フレームの幅。0なら常に等倍'''
+        self.mode = detect_mode.init
+        self._full_requested = True
+        self._last_full_at = 0.0
+
+    @property
+    def lowres_size(self) -> Tuple[int, int]:
+        w, h = CAPTURE_SIZE
+        return (self.lowres_width, round(h * self.lowres_width / w))
+
+    def set_mode(self, mode: detect_mode):
+        """直近フレームの画面判定結果を通知する(GUIスレッド)"""
+        self.mode = mode
+
+    def request_full_resolution(self):
+        """次のキャプチャを等倍で行うよう要求する(GUIスレッド)"""
+        self._full_requested = True
+
+    def next_size(self, now: float, awaiting_result: bool = False) -> Optional[Tuple[int, int]]:
+        """次のキャプチャ解像度。等倍ならNone(キャプチャスレッド)
+
+        Args:
+            awaiting_result (bool): プレー終了後にリザルト画面を待っている間ならTrue(PollingScheduler.awaiting_result())
+        """
+        if (not self.lowres_width or self.lowres_width >= CAPTURE_SIZE[0]
+                or self._full_requested or awaiting_result
+                or self.mode in self.FULL_RESOLUTION_MODES
+                or now - self._last_full_at >= self.REFRESH_INTERVAL):
+            self._full_requested = False
+            self._last_full_at = now
+            return None
+        return self.lowres_size
+
+
+class PollingScheduler:
+    """現在のdetect_modeと直近の画面遷移からキャプチャ間隔を決めるクラス。
+
+    - 基本はINTERVAL_MSのモード別の値
+    - 画面遷移の直後はBURST_DURATION_MSの間BURST_INTERVAL_MSで取得する
+    - プレー終了(play->init)後はリザルト画面が来るまで遷移直後の間隔を維持する
+    - initがIDLE_AFTER_SEC以上続いた場合はIDLE_INTERVAL_MSまで落とす
+    """
+    INTERVAL_MS = {
+        'init': 300,
+        'select': 100,
+        'play': 50,
+        'result': 100,
+        'option': 100,
+    }
+    '''画面(detect_modeの名前)ごとのキャプチャ間隔(ms)'''
+    BURST_INTERVAL_MS = 33
+    '''画面遷移の直後、およびプレー終了からリザルト画面までのキャプチャ間隔(ms)'''
+    BURST_DURATION_MS = 1500
+    '''画面遷移の直後にBURST_INTERVAL_MSで取得する時間(ms)'''
+    IDLE_AFTER_SEC = 60
+    '''init(タイトル画面など)がこの秒数続いたらIDLE_INTERVAL_MSまで間隔を広げる'''
+    IDLE_INTERVAL_MS = 1000
+    '''init継続時のキャプチャ間隔(ms)'''
+    RESULT_WAIT_SEC = 10.0
+    '''プレー終了後にリザルト画面を待つ最大時間(秒)'''
+
+    def __init__(self):
+        self.mode = detect_mode.init
+        self.changed_at = time.monotonic()
+        self.transitions = deque(maxlen=16)
+        '''直近の画面遷移 (時刻, 遷移前, 遷移後)'''
+
+    def set_mode(self, mode: detect_mode, now: float = None):
+        """直近フレームの画面判定結果を通知する(GUIスレッド)"""
+        if mode == self.mode:
+            return
+        now = time.monotonic() if now is None else now
+        self.transitions.append((now, self.mode, mode))
+        self.mode = mode
+        self.changed_at = now
+
+    def awaiting_result(self, now: float) -> bool:
+        """プレー終了(play->init)後、リザルト画面を待っている間ならTrue"""
+        if self.mode != detect_mode.init or not self.transitions:
+            return False
+        _, old_mode, _ = self.transitions[-1]
+        return old_mode == detect_mode.play and now - self.changed_at < self.RESULT_WAIT_SEC
+
+    def interval(self, now: float) -> float:
+        """次のキャプチャまでの間隔(秒)"""
+        elapsed = now - self.changed_at
+        if elapsed * 1000 < self.BURST_DURATION_MS or self.awaiting_result(now):
+            return self.BURST_INTERVAL_MS / 1000
+        interval_ms = self.INTERVAL_MS.get(self.mode.name, 100)
+        if self.mode == detect_mode.init and elapsed >= self.IDLE_AFTER_SEC:
+            interval_ms = max(interval_ms, self.IDLE_INTERVAL_MS)
+        return interval_ms / 1000
+
+
+class FrameCapture(QObject):
+    """OBSWebSocketManager.capture_frame()を専用スレッドで回し、FrameRingに格納する。
+
+    新しいフレームが入るたびにframe_readyを発行するので、
+    GUIスレッド側はtake_latest()で最新フレームだけを処理すればよい。
+    """
+    frame_ready = Signal()
+
+    def __init__(self, obs_manager, ring_size: int = 3):
+        super().__init__()
+        self.obs_manager = obs_manager
+        self.scheduler = CaptureScheduler()
+        '''キャプチャ解像度の決定'''
+        self.polling = PollingScheduler()
+        '''キャプチャ間隔の決定'''
+        self.ring = FrameRing(ring_size)
+        self.thread: Optional[threading.Thread] = None
+        self.stop_event = threading.Event()
+        self.last_capture_ms = 0.0
+        '''直近のキャプチャ所要時間(ms)'''
+
+    def start(self):
+        """キャプチャスレッドを開始"""
+        if self.thread and self.thread.is_alive():
+            return
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._run, daemon=True, name="FrameCaptureThread")
+        self.thread.start()
+        logger.info("Frame capture thread started")
+
+    def stop(self):
+        """キャプチャスレッドを停止"""
+        self.stop_event.set()
+        if self.thread:
+            self.thread.join(timeout=2.0)
+            self.thread = None
+        logger.info(f"Frame capture thread stopped (written={self.ring.written}, dropped={self.ring.dropped})")
+
+    def take_latest(self) -> Optional[CapturedFrame]:
+        """未読の最新フレームを取り出す"""
+        return self.ring.take_latest()
+
+    def set_mode(self, mode: detect_mode):
+        """直近フレームの画面判定結果を各スケジューラに通知する(GUIスレッド)"""
+        self.scheduler.set_mode(mode)
+        self.polling.set_mode(mode)
+
+    def _run(self):
+        while not self.stop_event.is_set():
+            started = time.monotonic()
+            try:
+                if self.obs_manager.is_capture_ready():
+                    np_value = self.obs_manager.capture_frame(
+                        self.scheduler.next_size(started, self.polling.awaiting_result(started)))
+                    self.last_capture_ms = (time.monotonic() - started) * 1000
+                    if np_value is not None:
+                        self.ring.write(np_value, started)
+                        self.frame_ready.emit()
+            except Exception:
+                logger.error(traceback.format_exc())
+            # OBSが詰まった場合でも次の要求までは最低限待つ
+            wait = self.polling.interval(started) - (time.monotonic() - started)
+            self.stop_event.wait(max(wait, 0.005))
@@ -0,0 +1,77 @@
+"""フレーム変化検出。画面が変わっていなければ認識処理を省略するためのもの。"""
+
+import zlib
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from src.classes import detect_mode
+
+
+class FrameGate:
+    """モードごとに監視領域の間引きチェックサム(指紋)を取り、前フレームからの変化を判定する。
+
+    同じ指紋のフレームが settle+1 回処理された後は、変化するまでcheck()がFalseを返す。
+    リザルト画面は同じ認識結果が2回続いたときに登録するため、settle=1で2回目までは通す。
+    認識に失敗したフレームと、リザルト画面で認識結果が前回と異なったフレームは呼び出し側でreset()し、
+    同じ画面でも次のフレームを認識させる(監視領域の外だけが変わっている間に登録を取りこぼさないように)。
+    """
+    def __init__(self, regions: Dict[detect_mode, List], step: int = 2, settle: int = 1):
+        self.regions = regions
+        '''モード -> 監視領域のリスト。(x0, y0, x1, y1)またはnumpyのスライスtuple'''
+        self.step = step
+        '''チェックサムを取る際の間引き幅(px)'''
+        self.settle = settle
+        self.hits = 0
+        '''変化なしとして処理を省略した回数'''
+        self.misses = 0
+        '''変化ありとして処理した回数'''
+        self._mode: Optional[detect_mode] = None
+        self._fingerprint = None
+        self._repeat = 0
+
+    def reset(self):
+        """直前の指紋を破棄する。次のcheck()は必ずTrueになる。"""
+        self._mode = None
+        self._fingerprint = None
+        self._repeat = 0
+
+    def fingerprint(self, mode: detect_mode, np_value: np.ndarray) -> Optional[tuple]:
+        """modeの監視領域ごとのチェックサムを返す。監視領域が無いモードはNone。"""
+        regions = self.regions.get(mode)
+        if not regions:
+            return None
+        ret = []
+        for region in regions:
+            if isinstance(region[0], slice):
+                roi = np_value[region]
+            else:
+                x0, y0, x1, y1 = region
+                roi = np_value[y0:y1, x0:x1]
+            ret.append(zlib.crc32(np.ascontiguousarray(roi[::self.step, ::self.step])))
+        return tuple(ret)
+
+    def check(self, mode: detect_mode, np_value: np.ndarray) -> bool:
+        """認識処理を行うべきならTrue、前フレームから変化が無く省略してよいならFalse"""
+        fp = self.fingerprint(mode, np_value)
+        if fp is None:
+            return True
+        if mode == self._mode and fp == self._fingerprint:
+            self._repeat += 1
+        else:
+            self._mode = mode
+            self._fingerprint = fp
+            self._repeat = 0
+        if self._repeat > self.settle:
+            self.hits += 1
+            return False
+        self.misses += 1
+        return True
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def __str__(self):
+        return f"FrameGate(hits={self.hits}, misses={self.misses}, hit_rate={self.hit_rate*100:.1f}%)"
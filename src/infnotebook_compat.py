@@ -3,6 +3,7 @@
 from pathlib import Path
 import sys
 
+import cv2
 import numpy as np
 from PIL import Image
 
@@ -31,6 +32,29 @@ def pil_image_to_screen(image: Image.Image, filename: str = 'direct_capture.png'
     return Screen(np.array(image.convert('RGB')), filename)
 
 
+def array_to_screen(np_value: np.ndarray, filename: str = 'capture.png'):
+    """RGB配列からコピーせずにinfnotebook.capture.Screenを作る"""
+    if Screen is None:
+        raise ImportError('infnotebook capture.Screen is not available')
+
+    return Screen(np_value, filename)
+
+
+def decode_image_array(data: bytes) -> np.ndarray:
+    """エンコード済み画像(PNG等)のバイト列をファイルを介さずRGB配列にする"""
+    np_value = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if np_value is None:
+        raise ValueError('failed to decode screenshot image')
+    # OpenCVはBGR順なので、同じバッファ上でRGBに並べ替える
+    cv2.cvtColor(np_value, cv2.COLOR_BGR2RGB, dst=np_value)
+    return np_value
+
+
+def decode_screenimage(data: bytes, filename: str = 'memory_capture.png'):
+    """エンコード済み画像(PNG等)のバイト列をファイルを介さずScreenにする"""
+    return array_to_screen(decode_image_array(data), filename)
+
+
 class Screenshot:
     """旧API互換用のダミー。現状本アプリでは直接使用しない。"""
 
@@ -1,8 +1,11 @@
 import time
+import base64
 import threading
 import traceback
 import functools
 from typing import Callable, Optional, List, Dict, Any
+import numpy as np
+from PIL import Image
 from PySide6.QtCore import QObject, Signal
 
 import logging
@@ -12,6 +15,9 @@ from src.funcs import load_ui_text
 from src.direct_window_capture import DirectWindowCapture
 logger = get_logger(__name__)
 
+MEMORY_CAPTURE_MAX_FAILURES = 5
+'''メモリ上でのスクリーンショット取得がこの回数続けて失敗したら、再接続までファイル経由で取得する'''
+
 # obsws_pythonライブラリの接続エラートレースバックを抑制
 logging.getLogger('obsws_python').setLevel(logging.CRITICAL)
 
@@ -24,7 +30,9 @@ def _require_connection(func):
             logger.warning(f"OBS not connected (calling {func.__name__})")
             return None
         try:
-            return func(self, *args, **kwargs)
+            # ReqClientはスレッドセーフではないため、要求～応答を排他する
+            with self._client_lock:
+                return func(self, *args, **kwargs)
         except Exception as e:
             logger.error(f"Failed to {func.__name__}: {e}")
             return None
@@ -74,7 +82,15 @@ class OBSWebSocketManager(QObject):
         self.picw = 1920
         self.pich = 1080
         self.screen = None
+        self.last_capture_timings: Dict[str, Any] = {}
+        """直近フレームのキャプチャ所要時間(ms)。method='memory'/'file'"""
         self.direct_capture: Optional[DirectWindowCapture] = None
+        self._client_lock = threading.RLock()
+        '''ReqClientへの要求を排他するロック(キャプチャスレッドと共用)'''
+        self._capture_lock = threading.Lock()
+        '''capture_frame()の多重実行を防ぐロック'''
+        self._memory_capture_failures = 0
+        '''メモリ上でのスクリーンショット取得の連続失敗回数。接続のたびに0に戻す'''
 
         # 起動時シーンコレクション切り替えフラグ（disconnect後にリセット）
         self._scene_collection_applied = False
@@ -83,10 +99,11 @@ class OBSWebSocketManager(QObject):
         """設定をセット"""
         self.config = config
         self.ui = load_ui_text(config)
-        if self.direct_capture is None:
-            self.direct_capture = DirectWindowCapture(config)
-        else:
-            self.direct_capture.set_config(config)
+        with self._capture_lock:
+            if self.direct_capture is None:
+                self.direct_capture = DirectWindowCapture(config)
+            else:
+                self.direct_capture.set_config(config)
         logger.info(f"OBS WebSocket config set: {config.websocket_host}:{config.websocket_port}")
 
     def is_direct_capture(self) -> bool:
@@ -157,6 +174,7 @@ class OBSWebSocketManager(QObject):
             self.client.get_version()
             
             self.is_connected = True
+            self._memory_capture_failures = 0
             self._emit_status(f"{self.ui.obs.status_connected} ({self.config.websocket_host}:{self.config.websocket_port})", True)
 
             # 起動時シーンコレクション切り替え
@@ -254,7 +272,8 @@ class OBSWebSocketManager(QObject):
                 if self.is_connected and self.client:
                     # 接続中の場合、pingして確認
                     try:
-                        self.client.get_version()
+                        with self._client_lock:
+                            self.client.get_version()
                         consecutive_failures = 0  # 成功したらカウンタリセット
                         
                     except Exception as e:
@@ -292,6 +311,7 @@ class OBSWebSocketManager(QObject):
                             
                             # 成功
                             self.is_connected = True
+                            self._memory_capture_failures = 0
                             self._emit_status(f"{self.ui.obs.status_reconnected} ({self.config.websocket_host}:{self.config.websocket_port})", True)
                             logger.info("OBS reconnection successful")
                             consecutive_failures = 0
@@ -476,37 +496,133 @@ class OBSWebSocketManager(QObject):
     
     def screenshot(self):
         """設定された方式のキャプチャをself.screenに格納"""
-        import os
+        from src.infnotebook_compat import array_to_screen
 
-        if self.is_direct_capture():
-            from src.infnotebook_compat import pil_image_to_screen
+        np_value = self.capture_frame()
+        self.screen = array_to_screen(np_value) if np_value is not None else None
 
-            if self.direct_capture is None:
-                self.direct_capture = DirectWindowCapture(self.config)
-            image = self.direct_capture.read_frame()
-            self.screen = pil_image_to_screen(image) if image is not None else None
-            return
+    def capture_frame(self, size: Optional[tuple] = None) -> Optional[np.ndarray]:
+        """設定された方式でキャプチャし、RGBのnumpy配列を返す。失敗時はNone。
+
+        キャプチャスレッドとGUIスレッドの双方から呼ばれるため排他する。
+
+        Args:
+            size: OBS取得時に要求する(幅, 高さ)。Noneなら等倍(picw x pich)。
+                直接取得では縮小しても取得コストが変わらないため常に等倍で返す。
+        """
+        with self._capture_lock:
+            if self.is_direct_capture():
+                if self.direct_capture is None:
+                    self.direct_capture = DirectWindowCapture(self.config)
+                image = self.direct_capture.read_frame()
+                return np.array(image.convert('RGB')) if image is not None else None
+
+            if getattr(self.config, 'obs_capture_in_memory', True) and self._memory_capture_failures < MEMORY_CAPTURE_MAX_FAILURES:
+                np_value = self._capture_in_memory(size)
+                if np_value is not None:
+                    return np_value
+            return self._capture_via_file(size)
+
+    def _capture_in_memory(self, size: Optional[tuple] = None) -> Optional[np.ndarray]:
+        """GetSourceScreenshotのbase64応答をファイルを介さずデコードする。失敗時はNone。"""
+        from src.infnotebook_compat import decode_image_array
+
+        if not self.is_connected or not self.client:
+            return None
+        try:
+            t0 = time.perf_counter()
+            # ファイル経由に切り替えるだけなので、_require_connectionを通さずエラーログを出さない
+            with self._client_lock:
+                image_data = self._request_screenshot_data(self.config.monitor_source_name, size=size)
+            if not image_data:
+                self._on_memory_capture_failed("empty response")
+                return None
+            t1 = time.perf_counter()
+            # "data:image/png;base64,...." 形式
+            payload = base64.b64decode(image_data.split(',', 1)[-1])
+            np_value = decode_image_array(payload)
+            t2 = time.perf_counter()
+            self.last_capture_timings = {
+                'method': 'memory',
+                'fetch_ms': (t1 - t0) * 1000,
+                'decode_ms': (t2 - t1) * 1000,
+                'total_ms': (t2 - t0) * 1000,
+            }
+            logger.debug(
+                f"capture(memory): fetch {(t1 - t0) * 1000:.1f}ms, decode {(t2 - t1) * 1000:.1f}ms, "
+                f"total {(t2 - t0) * 1000:.1f}ms, {len(payload)} bytes"
+            )
+            self._memory_capture_failures = 0
+            return np_value
+        except Exception as e:
+            self._on_memory_capture_failed(e)
+            return None
+
+    def _on_memory_capture_failed(self, reason):
+        """メモリ上での取得の失敗を数え、続けて失敗する場合は次の接続までファイル経由に切り替える"""
+        self._memory_capture_failures += 1
+        logger.debug(f"in-memory screenshot failed, fallback to file: {reason}")
+        if self._memory_capture_failures == MEMORY_CAPTURE_MAX_FAILURES:
+            logger.info(f"in-memory screenshot failed {MEMORY_CAPTURE_MAX_FAILURES} times in a row, using file capture until reconnect")
+
+    def _capture_via_file(self, size: Optional[tuple] = None) -> Optional[np.ndarray]:
+        """out/capture.pngへ保存してから読み込む従来方式。失敗時はNone。"""
+        import os
 
-        from src.infnotebook_compat import open_screenimage
-        
         os.makedirs('out', exist_ok=True)
         dst = os.path.abspath('out/capture.png')
-        
+
         try:
-            if self.save_screenshot_dst(self.config.monitor_source_name, dst):
-                self.screen = open_screenimage(dst)
-            else:
-                self.screen = None
+            t0 = time.perf_counter()
+            if not self.save_screenshot_dst(self.config.monitor_source_name, dst, size=size):
+                return None
+            t1 = time.perf_counter()
+            np_value = np.array(Image.open(dst).convert('RGB'))
+            t2 = time.perf_counter()
+            self.last_capture_timings = {
+                'method': 'file',
+                'fetch_ms': (t1 - t0) * 1000,
+                'decode_ms': (t2 - t1) * 1000,
+                'total_ms': (t2 - t0) * 1000,
+            }
+            logger.debug(
+                f"capture(file): save {(t1 - t0) * 1000:.1f}ms, load {(t2 - t1) * 1000:.1f}ms, "
+                f"total {(t2 - t0) * 1000:.1f}ms"
+            )
+            return np_value
         except Exception as e:
             # logger.error(f"Screenshot failed: {e}")
-            self.screen = None
+            return None
+
+    @_require_connection
+    def get_screenshot_data(self, source: str, disable_wh:bool=False, size:tuple=None) -> Optional[str]:
+        """スクリーンショットをbase64文字列(data URI)として取得"""
+        return self._request_screenshot_data(source, disable_wh, size)
+
+    def _request_screenshot_data(self, source: str, disable_wh:bool=False, size:tuple=None) -> Optional[str]:
+        """get_screenshot_data()の本体。_client_lockを取った状態で呼ぶこと。失敗時は例外を送出する"""
+        if disable_wh:
+            picw = None
+            pich = None
+        elif size:
+            picw, pich = size
+        else:
+            picw = self.picw
+            pich = self.pich
+        res = self.client.get_source_screenshot(
+            source, 'png',
+            picw, pich, 100
+        )
+        return res.image_data
     
     @_require_connection
-    def save_screenshot_dst(self, source: str, dst: str, disable_wh:bool=False) -> bool:
+    def save_screenshot_dst(self, source: str, dst: str, disable_wh:bool=False, size:tuple=None) -> bool:
         """スクリーンショットを保存"""
         if disable_wh:
             picw = None
             pich = None
+        elif size:
+            picw, pich = size
         else:
             picw = self.picw
             pich = self.pich
@@ -0,0 +1,126 @@
+"""プレーログの時刻と判定内訳を列ごとのnumpy配列で持つストア。ノーツ数などの集計用。
+
+ResultDatabase.resultsと同じ並びで1リザルト1行を持ち、
+プレー画面から登録したリザルト(detect_mode.play)かどうか、リザルト画面から登録したもの(detect_mode.result)かどうか、
+判定の有無をフラグで持つ。
+集計はリザルトを1件ずつ辿る代わりに、対象の行(日時の範囲はTimeIndexで引く)の配列の和で行う。
+"""
+
+from operator import attrgetter
+
+import numpy as np
+
+from src.classes import detect_mode
+
+JUDGE_FIELDS = ('pg', 'gr', 'gd', 'bd', 'pr', 'cb')
+'''judge列の並び'''
+
+_COLUMNS = ('_timestamp', '_judge', '_play', '_has_judge', '_result')
+
+
+class PlayColumns:
+    """リザルトの時刻・判定内訳の列。append()/delete()で追従し、並べ替えの後はrebuild()で作り直す。"""
+    def __init__(self):
+        self._timestamp = np.empty(0, dtype=np.float64)
+        self._judge = np.empty((0, len(JUDGE_FIELDS)), dtype=np.int64)
+        self._play = np.empty(0, dtype=bool)
+        self._has_judge = np.empty(0, dtype=bool)
+        self._result = np.empty(0, dtype=bool)
+        self.size = 0
+        '''登録済みの行数'''
+
+    @staticmethod
+    def _row(result) -> tuple:
+        ts = result.timestamp
+        judge = result.judge
+        return (
+            np.nan if ts is None else ts,
+            tuple(getattr(judge, f) for f in JUDGE_FIELDS) if judge else (0,) * len(JUDGE_FIELDS),
+            result.detect_mode == detect_mode.play,
+            bool(judge),
+            result.detect_mode == detect_mode.result,
+        )
+
+    def rebuild(self, results: list):
+        """resultsから全行を作り直す"""
+        n = len(results)
+        timestamps = [r.timestamp for r in results]
+        judges = [r.judge for r in results]
+        play = detect_mode.play
+        mode_result = detect_mode.result
+        get_judge = attrgetter(*JUDGE_FIELDS)
+        zero = (0,) * len(JUDGE_FIELDS)
+        self._timestamp = np.array([np.nan if t is None else t for t in timestamps], dtype=np.float64).reshape(n)
+        self._judge = np.array([get_judge(j) if j else zero for j in judges], dtype=np.int64).reshape(n, len(JUDGE_FIELDS))
+        self._play = np.fromiter((r.detect_mode == play for r in results), dtype=bool, count=n)
+        self._has_judge = np.fromiter((bool(j) for j in judges), dtype=bool, count=n)
+        self._result = np.fromiter((r.detect_mode == mode_result for r in results), dtype=bool, count=n)
+        self.size = n
+
+    def _reserve(self, size: int):
+        capacity = len(self._timestamp)
+        if size <= capacity:
+            return
+        capacity = max(size, capacity * 2, 1024)
+        for name in _COLUMNS:
+            old = getattr(self, name)
+            new = np.zeros((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:self.size] = old[:self.size]
+            setattr(self, name, new)
+
+    def set(self, idx: int, result):
+        """idx行目をresultの内容で置き換える"""
+        ts, judge, play, has_judge, is_result = self._row(result)
+        self._timestamp[idx] = ts
+        self._judge[idx] = judge
+        self._play[idx] = play
+        self._has_judge[idx] = has_judge
+        self._result[idx] = is_result
+
+    def delete(self, idx: int):
+        """idx行目を削除する"""
+        n = self.size
+        for name in _COLUMNS:
+            column = getattr(self, name)
+            column[idx:n - 1] = column[idx + 1:n]
+        self.size -= 1
+
+    def row(self, idx: int) -> tuple:
+        """idx行目の(timestamp, 判定内訳のtuple, play, has_judge, result)"""
+        return (
+            float(self._timestamp[idx]),
+            tuple(int(v) for v in self._judge[idx]),
+            bool(self._play[idx]),
+            bool(self._has_judge[idx]),
+            bool(self._result[idx]),
+        )
+
+    def append(self, result):
+        """末尾にresultの行を追加する"""
+        self._reserve(self.size + 1)
+        self.size += 1
+        self.set(self.size - 1, result)
+
+    # 集計用の読み取り専用ビュー(size行分)
+    @property
+    def timestamp(self) -> np.ndarray:
+        return self._timestamp[:self.size]
+
+    @property
+    def judge(self) -> np.ndarray:
+        '''(行数, 6)の判定内訳。並びはJUDGE_FIELDS'''
+        return self._judge[:self.size]
+
+    @property
+    def play(self) -> np.ndarray:
+        '''detect_mode.playのリザルトかどうか'''
+        return self._play[:self.size]
+
+    @property
+    def has_judge(self) -> np.ndarray:
+        return self._has_judge[:self.size]
+
+    @property
+    def result(self) -> np.ndarray:
+        '''detect_mode.resultのリザルトかどうか'''
+        return self._result[:self.size]
@@ -0,0 +1,347 @@
+"""プレーログ(playlog.infdc)のジャーナル保存。
+
+従来は保存のたびに全リザルトをpickle+bz2(level 9)で書き直していたが、
+ジャーナルモードでは追加・更新されたリザルトだけをレコードとしてジャーナルに追記しfsyncする。
+ジャーナルはアイドル時にバックグラウンドでスナップショット(playlog.infdc)へ畳み込む。
+
+ファイル構成:
+    playlog.infdc       スナップショット。file_codecの形式(既定はbz2)で圧縮した pickle(リザルトのlist) + pickle({'journal_generation': 世代})
+                        bz2の場合は、先頭のlistだけを読む従来の読み込み処理とも互換がある。
+    playlog.journal     現在のジャーナル。先頭レコードは('header', 世代)で、その世代のスナップショットに対する差分を表す
+    playlog.journal.old 畳み込み中のジャーナル。畳み込みが完了すると削除される
+
+レコードは 長さ(4byte) + crc32(4byte) + pickle の形式で、
+書き込み途中で落ちた末尾のレコードは読み込み時に捨てる。
+"""
+
+import gc
+import os
+import pickle
+import struct
+import threading
+import time
+import traceback
+import zlib
+from contextlib import contextmanager
+from typing import Callable, List, Optional, Tuple
+
+from src import file_codec
+from src.logger import get_logger
+logger = get_logger(__name__)
+
+_FRAME = struct.Struct('<II')
+'''レコードの前置き(長さ, crc32)'''
+
+
+@contextmanager
+def gc_paused():
+    """大量のリザルトを読み込む間、循環参照のGCを止める。
+    読み込み中に何度も走る全世代のGCが、件数が多いと読み込み時間の3割ほどを占めるため。
+    """
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def encode_record(record: tuple) -> bytes:
+    """レコードをジャーナルに書き込むバイト列にする"""
+    payload = pickle.dumps(record, protocol=pickle.HIGHEST_PROTOCOL)
+    return _FRAME.pack(len(payload), zlib.crc32(payload)) + payload
+
+
+def decode_records(data: bytes) -> Tuple[List[tuple], int]:
+    """ジャーナルのバイト列をレコードのリストに戻す。
+
+    Returns:
+        List[tuple]: 正常に読めたレコード
+        int: 正常に読めた末尾の位置。これより後ろは書き込み途中で壊れている
+    """
+    records = []
+    pos = 0
+    while pos + _FRAME.size <= len(data):
+        length, crc = _FRAME.unpack_from(data, pos)
+        start = pos + _FRAME.size
+        payload = data[start:start + length]
+        if len(payload) != length or zlib.crc32(payload) != crc:
+            break
+        try:
+            records.append(pickle.loads(payload))
+        except Exception:
+            break
+        pos = start + length
+    return records, pos
+
+
+class PlaylogJournal:
+    """プレーログのスナップショット+ジャーナルを管理するクラス。
+
+    record_add()/record_set()でレコードを溜め、flush()でジャーナルに追記する。
+    ジャーナルを使わない場合(enabled=False)はflush()の代わりにwrite_snapshot()で全件を書き出す。
+    リザルトのlistの変更とrecord_*()の呼び出しは、lockを取った状態で行うこと。
+    """
+    def __init__(self, snapshot_path: str = 'playlog.infdc', enabled: bool = True,
+                 compact_records: int = 200, compact_idle_sec: float = 30.0):
+        self.snapshot_path = snapshot_path
+        self.path = os.path.splitext(snapshot_path)[0] + '.journal'
+        '''現在のジャーナル'''
+        self.old_path = self.path + '.old'
+        '''畳み込み中のジャーナル'''
+        self.enabled = enabled
+        '''Falseなら従来通り保存のたびに全件を書き出す'''
+        self.compact_records = compact_records
+        '''ジャーナルのレコード数がこれ以上になったら畳み込む'''
+        self.compact_idle_sec = compact_idle_sec
+        '''最後の追記からこの秒数が経ったら(アイドル時)畳み込む'''
+        self.generation = 0
+        '''スナップショットの世代。畳み込むたびに1増える'''
+        self.lock = threading.RLock()
+        self._compact_lock = threading.Lock()
+        self._pending: List[bytes] = []
+        self._file = None
+        self.records = 0
+        '''現在のジャーナルのレコード数(ヘッダを除く)'''
+        self.last_append = time.monotonic()
+        self.last_flush_ms = 0.0
+        '''直近のflush()の所要時間(ms)'''
+        self.last_snapshot_ms = 0.0
+        '''直近のスナップショット書き出しの所要時間(ms)'''
+        self._snapshotting = False
+        '''write_snapshot()でスナップショットを書き出している間はTrue。flush()は書き出し後まで待たせる'''
+        self._thread: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+
+    # 読み込み
+    def _read_snapshot(self) -> Tuple[list, int]:
+        if not os.path.exists(self.snapshot_path):
+            return [], 0
+        with file_codec.open_read(self.snapshot_path) as f, gc_paused():
+            results = pickle.load(f)
+            try:
+                meta = pickle.load(f)
+            except EOFError: # 従来形式
+                meta = {}
+        return results, meta.get('journal_generation', 0)
+
+    def _replay(self, path: str, results: list, generation: int) -> Tuple[bool, int, int]:
+        """ジャーナルをresultsに適用する。
+
+        Returns:
+            bool: 適用したかどうか(スナップショットに畳み込み済みなら適用しない)
+            int: 正常に読めた末尾の位置
+            int: 適用したレコード数
+        """
+        with open(path, 'rb') as f:
+            data = f.read()
+        records, valid_end = decode_records(data)
+        if valid_end != len(data):
+            logger.warning(f"journal {path}: dropped broken tail ({len(data) - valid_end} bytes)")
+        if not records or records[0][0] != 'header' or records[0][1] < generation:
+            return False, valid_end, 0
+        for record in records[1:]:
+            if record[0] == 'add':
+                results.append(record[1])
+            elif record[0] == 'set':
+                _, idx, result = record
+                if idx < len(results):
+                    results[idx] = result
+        return True, valid_end, len(records) - 1
+
+    def load(self) -> list:
+        """スナップショットを読み、ジャーナルを適用した全リザルトを返す"""
+        with self._compact_lock, self.lock:
+            self._close_file()
+            self._pending = []
+            self.records = 0
+            results, self.generation = self._read_snapshot()
+            old_applied = False
+            if os.path.exists(self.old_path):
+                old_applied, _, _ = self._replay(self.old_path, results, self.generation)
+            current_applied = False
+            if os.path.exists(self.path):
+                current_applied, valid_end, self.records = self._replay(self.path, results, self.generation)
+            if old_applied:
+                # 畳み込みの途中(スナップショットの置き換え前)で終了していた場合は、ここで畳み込みを完了させる
+                logger.info("journal: finishing interrupted compaction")
+                self._write_snapshot_locked(results)
+            else:
+                if os.path.exists(self.old_path): # 畳み込み済み
+                    os.remove(self.old_path)
+                if current_applied:
+                    with open(self.path, 'r+b') as f:
+                        f.truncate(valid_end)
+                elif os.path.exists(self.path): # スナップショットに畳み込み済みのジャーナル
+                    os.remove(self.path)
+            logger.info(f"playlog loaded: {len(results)} results, generation={self.generation}, journal records={self.records}")
+            return results
+
+    # 書き込み
+    def _close_file(self):
+        if self._file:
+            self._file.close()
+            self._file = None
+
+    def _open_file(self):
+        if self._file is None:
+            if not os.path.exists(self.path) or os.path.getsize(self.path) == 0:
+                self._new_journal(self.generation)
+            else:
+                self._file = open(self.path, 'ab')
+        return self._file
+
+    def _new_journal(self, generation: int):
+        """ヘッダのみの新しいジャーナルを作る"""
+        self._close_file()
+        self._file = open(self.path, 'wb')
+        self._file.write(encode_record(('header', generation)))
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self.records = 0
+
+    def record_add(self, result):
+        """リザルトの追加を記録する"""
+        with self.lock:
+            if self.enabled:
+                self._pending.append(encode_record(('add', result)))
+
+    def record_set(self, index: int, result):
+        """results[index]の内容が変わったことを記録する"""
+        with self.lock:
+            if self.enabled:
+                self._pending.append(encode_record(('set', index, result)))
+
+    @property
+    def pending(self) -> int:
+        '''未書き込みのレコード数'''
+        return len(self._pending)
+
+    def flush(self):
+        """溜めたレコードをジャーナルに追記してfsyncする"""
+        with self.lock:
+            if not self._pending or self._snapshotting: # 書き出し中のレコードは新しいジャーナルに書く
+                return
+            started = time.perf_counter()
+            f = self._open_file()
+            f.write(b''.join(self._pending))
+            f.flush()
+            os.fsync(f.fileno())
+            self.records += len(self._pending)
+            self._pending = []
+            self.last_append = time.monotonic()
+            self.last_flush_ms = (time.perf_counter() - started) * 1000
+
+    def _dump_snapshot(self, results: list, generation: int):
+        """スナップショットを一時ファイルに書いてから置き換える"""
+        started = time.perf_counter()
+        tmp = self.snapshot_path + '.tmp'
+        with open(tmp, 'wb') as raw:
+            with file_codec.open_write(raw) as f:
+                pickle.dump(results, f)
+                pickle.dump({'journal_generation': generation}, f)
+            raw.flush()
+            os.fsync(raw.fileno())
+        os.replace(tmp, self.snapshot_path)
+        self.last_snapshot_ms = (time.perf_counter() - started) * 1000
+
+    def _write_snapshot_locked(self, results: list):
+        generation = self.generation + 1
+        self._dump_snapshot(results, generation)
+        self._pending = []
+        self._switch_generation(generation)
+
+    def _switch_generation(self, generation: int):
+        """スナップショットを書き出した後、ジャーナルをその世代のものに切り替える"""
+        self.generation = generation
+        if self.enabled:
+            self._new_journal(generation)
+        else:
+            self._close_file()
+            if os.path.exists(self.path):
+                os.remove(self.path)
+        if os.path.exists(self.old_path):
+            os.remove(self.old_path)
+
+    def write_snapshot(self, results: list):
+        """全件をスナップショットに書き出し、ジャーナルを空にする(同期処理)。
+
+        compact()と同様、lockを持つのはlistの複製とジャーナルの切り替えの間だけで、pickle・圧縮はlockの外で行う。
+        書き出し中に記録されたレコードは溜めておき、書き出し後の新しいジャーナルに追記する。
+        """
+        with self._compact_lock:
+            with self.lock:
+                results = list(results)
+                generation = self.generation + 1
+                pending = self._pending
+                self._pending = []
+                self._snapshotting = True
+            try:
+                self._dump_snapshot(results, generation)
+            except Exception:
+                with self.lock:
+                    self._pending = pending + self._pending
+                    self._snapshotting = False
+                raise
+            with self.lock:
+                self._snapshotting = False
+                self._switch_generation(generation)
+
+    def compact(self, get_results: Callable[[], list]):
+        """ジャーナルをスナップショットに畳み込む。
+
+        ジャーナルを.oldに退避して新しいジャーナルに切り替えた後、その時点の全件を書き出す。
+        書き出し中の追記は新しいジャーナルに入るので、lockを持つのは切り替えの間だけ。
+        """
+        with self._compact_lock:
+            with self.lock:
+                self.flush()
+                if self.records == 0 and os.path.exists(self.snapshot_path):
+                    return
+                results = list(get_results())
+                generation = self.generation + 1
+                self._close_file()
+                if os.path.exists(self.path):
+                    os.replace(self.path, self.old_path)
+                self._new_journal(generation)
+            started = time.perf_counter()
+            self._dump_snapshot(results, generation)
+            with self.lock:
+                self.generation = generation
+                if os.path.exists(self.old_path):
+                    os.remove(self.old_path)
+            logger.info(f"journal compacted: {len(results)} results, generation={generation}, {(time.perf_counter() - started)*1000:.0f}ms")
+
+    def should_compact(self, now: float = None) -> bool:
+        """アイドル状態で、ジャーナルが十分に溜まっていればTrue"""
+        now = time.monotonic() if now is None else now
+        return (self.enabled and self.records >= self.compact_records
+                and not self._pending and now - self.last_append >= self.compact_idle_sec)
+
+    # バックグラウンドでの畳み込み
+    def start(self, get_results: Callable[[], list]):
+        """アイドル時に畳み込みを行うスレッドを開始"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, args=(get_results,), daemon=True, name="PlaylogCompactionThread")
+        self._thread.start()
+
+    def stop(self):
+        """畳み込みスレッドを停止し、未書き込みのレコードを書き出す"""
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=10.0)
+            self._thread = None
+        with self.lock:
+            self.flush()
+            self._close_file()
+
+    def _run(self, get_results: Callable[[], list]):
+        while not self._stop_event.wait(1.0):
+            try:
+                if self.should_compact():
+                    self.compact(get_results)
+            except Exception:
+                logger.error(traceback.format_exc())
@@ -0,0 +1,387 @@
+"""プレーログの月ごとの分割保存(playlog_segments/)。
+
+リザルトを日時の月ごとのセグメントファイルに分けて保存する。各ファイルの先頭には小さな要約(ヘッダ)を置き、
+起動時は全セグメントのヘッダと直近の数ヶ月分だけを読み込む。古いセグメントは、
+その期間・譜面のリザルトが必要になった時点でResultDatabaseが読み込む(load_segments())。
+自己ベストと日ごとの集計は、読み込んでいないセグメントの分をヘッダの要約から求める。
+
+ファイル構成:
+    playlog_segments/YYYY-MM.seg   その月のリザルト
+    playlog_segments/undated.seg   日時の無いリザルト(選曲画面から登録したものなど)
+
+セグメントファイルは MAGIC + ヘッダ長(4byte) + pickle(ヘッダ) + file_codecで圧縮したpickle(リザルトのlist) の形式で、
+一時ファイルに書いてから置き換える。
+"""
+
+import datetime
+import glob
+import os
+import pickle
+import struct
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from src import file_codec
+from src.classes import detect_mode
+from src.logger import get_logger
+from src.play_columns import JUDGE_FIELDS
+from src.playlog_journal import gc_paused
+from src.result import OneBestData
+logger = get_logger(__name__)
+
+MAGIC = b'INFDCSEG'
+_HEADER_LEN = struct.Struct('<I')
+SEGMENT_VERSION = 3
+UNDATED = 'undated'
+'''日時の無いリザルトのセグメント名'''
+DAY_BUCKET_SEC = 900
+'''ヘッダの日ごとの集計の時間の刻み(秒)。日付の区切り(0時+autoload_offset)がどのタイムゾーンでもこの倍数になるよう15分'''
+
+
+def segment_key(result) -> str:
+    """resultを入れるセグメント名('YYYY-MM'またはUNDATED)"""
+    if not result.timestamp:
+        return UNDATED
+    try:
+        return datetime.datetime.fromtimestamp(result.timestamp).strftime('%Y-%m')
+    except Exception:
+        return UNDATED
+
+
+def chart_key(result) -> tuple:
+    """ヘッダに載せる譜面のキー。ResultDatabase._chart_index_key()と同じ値"""
+    battle = bool(result.option.battle) if result.option else False
+    return (result.chart_lookup_key, battle)
+
+
+def best_candidates(results: list) -> Dict[tuple, list]:
+    """自己ベストの集計(ResultDatabase._apply_best())に影響しうるリザルトを、自己ベストのキーごとにresultsの並び順で返す。
+
+    セグメント内で最高スコア・最高ランプ・最小BP(死亡時を除く)のリザルト(同点は全て)、
+    最も新しいリザルトと、最後のノーツ数のあるリザルト。これより劣るリザルトは、
+    他のセグメントと合わせて集計しても結果を変えない。
+    """
+    groups: Dict[tuple, list] = {}
+    for r in results:
+        key = OneBestData.key_of(r)
+        if key is not None:
+            groups.setdefault(key, []).append(r)
+    ret = {}
+    for key, group in groups.items():
+        score = max((r.score for r in group if r.score), default=None)
+        lamp = max((r.lamp.value for r in group if r.lamp), default=None)
+        bp = min((r.bp for r in group if r.bp is not None and not r.dead), default=None)
+        last = max(r.timestamp or 0 for r in group)
+        notes = next((r for r in reversed(group) if r.notes), None)
+        last_result = next(r for r in group if (r.timestamp or 0) == last)
+        ret[key] = [
+            r for r in group
+            if (r.score and r.score == score) or (r.lamp and r.lamp.value == lamp)
+            or (bp is not None and r.bp == bp and not r.dead) or r is last_result or r is notes
+        ]
+    return ret
+
+
+def _day_bucket(timestamp) -> int:
+    """日ごとの集計用に、timestampをDAY_BUCKET_SEC単位に切り捨てたもの。日時の無いリザルトは0"""
+    if not timestamp or timestamp != timestamp: # 0, None, NaN
+        return 0
+    return int(timestamp // DAY_BUCKET_SEC * DAY_BUCKET_SEC)
+
+
+def make_header(key: str, results: list) -> dict:
+    """セグメントの要約。読み込まずに範囲・譜面の有無の判定と、自己ベスト・日ごとの集計を行うために使う"""
+    timestamps = [r.timestamp or 0 for r in results]
+    days: Dict[int, list] = {}
+    for r in results:
+        counted = r.detect_mode == detect_mode.play and bool(r.judge)
+        is_result = r.detect_mode == detect_mode.result
+        if not counted and not is_result:
+            continue
+        day = days.setdefault(_day_bucket(r.timestamp), [0, 0, [0] * len(JUDGE_FIELDS)])
+        if counted:
+            day[0] += 1
+            for i, field in enumerate(JUDGE_FIELDS):
+                day[2][i] += getattr(r.judge, field)
+        day[1] += int(is_result)
+    return {
+        'version': SEGMENT_VERSION,
+        'key': key,
+        'count': len(results),
+        'first': min(timestamps) if timestamps else 0, # 最も古いリザルトの日時
+        'last': max(timestamps) if timestamps else 0,
+        'charts': {chart_key(r) for r in results}, # リザルトのある譜面(chart_key())
+        'chart_ids': {r.chart_id for r in results},
+        'bests': best_candidates(results), # 自己ベストのキー -> 集計に影響しうるリザルト
+        # DAY_BUCKET_SECごとの(プレー画面から登録した判定のあるリザルト数, リザルト画面から登録したリザルト数, 判定の合計)
+        'days': {t: (plays, play_count, tuple(judge)) for t, (plays, play_count, judge) in days.items()},
+        'images': sum(1 for r in results if r.detect_mode == detect_mode.result and getattr(r, 'image_path', None)), # 画像を保存したリザルトの件数
+    }
+
+
+class PlaylogSegments:
+    """月ごとのセグメントファイルにプレーログを保存するクラス。
+
+    PlaylogJournalと同じインターフェースを持つ。record_add()/record_set()で変更のあったセグメントを覚え、
+    flush()でそのセグメントだけを書き直す。読み込んでいないセグメントには触れない。
+    """
+    def __init__(self, path: str = 'playlog_segments', recent_months: int = 13):
+        self.path = path
+        self.recent_months = recent_months
+        '''起動時に読み込む直近の月数(今月を含む)'''
+        self.enabled = True
+        '''追記型の保存先かどうか(PlaylogJournalとの互換用。常にTrue)'''
+        self.lock = threading.RLock()
+        self._flush_lock = threading.Lock()
+        '''flush()同士の排他。lockより先に取る'''
+        self.headers: Dict[str, dict] = {}
+        '''セグメント名 -> ヘッダ(読み込み済みかどうかに関わらず全セグメント)'''
+        self._segments: Dict[str, list] = {}
+        '''読み込み済みのセグメント名 -> リザルトのlist'''
+        self._owner: Dict[int, str] = {}
+        '''id(リザルト) -> 所属するセグメント名'''
+        self._dirty = set()
+        self.last_flush_ms = 0.0
+        '''直近のflush()の所要時間(ms)'''
+        self.last_snapshot_ms = 0.0
+        '''直近の全件書き込みの所要時間(ms)'''
+        self.last_load_ms = 0.0
+        '''直近の読み込み(load()/load_recent()/load_segments())の所要時間(ms)'''
+
+    def exists(self) -> bool:
+        """セグメントのディレクトリがあるかどうか(移行が必要かの判定用)"""
+        return os.path.isdir(self.path)
+
+    def _file(self, key: str) -> str:
+        return os.path.join(self.path, f'{key}.seg')
+
+    # 読み込み
+    def _read_header(self, file) -> dict:
+        if file.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f'not a playlog segment: {file.name}')
+        length, = _HEADER_LEN.unpack(file.read(_HEADER_LEN.size))
+        return pickle.loads(file.read(length))
+
+    def _read_headers(self):
+        self.headers = {}
+        for file in sorted(glob.glob(os.path.join(self.path, '*.seg'))):
+            key = os.path.splitext(os.path.basename(file))[0]
+            with open(file, 'rb') as f:
+                header = self._read_header(f)
+            if header.get('version') != SEGMENT_VERSION: # 旧バージョンのヘッダは作り直す
+                header = self._write_segment(key, self._read_segment(key))
+                logger.info(f"playlog segment {key}: header updated to version {SEGMENT_VERSION}")
+            if header is not None:
+                self.headers[key] = header
+
+    def _read_segment(self, key: str) -> list:
+        with open(self._file(key), 'rb') as f:
+            self._read_header(f)
+            data = file_codec.decompress(f.read())
+        with gc_paused():
+            return pickle.loads(data)
+
+    def _attach(self, key: str, results: list):
+        self._segments[key] = results
+        for r in results:
+            self._owner[id(r)] = key
+
+    def recent_keys(self, now: Optional[datetime.datetime] = None) -> List[str]:
+        """起動時に読み込むセグメント名(直近recent_monthsヶ月分と日時の無いもの)"""
+        now = now or datetime.datetime.now()
+        month = now.year * 12 + now.month - 1 - (self.recent_months - 1)
+        oldest = f'{month // 12:04d}-{month % 12 + 1:02d}'
+        return [key for key in self.headers if key == UNDATED or key >= oldest]
+
+    def load(self) -> list:
+        """全セグメントを読み込む"""
+        with self.lock:
+            self._read_headers()
+            return self._load_initial(list(self.headers))
+
+    def load_recent(self) -> list:
+        """全セグメントのヘッダと、直近のセグメントのリザルトを読み込む"""
+        with self.lock:
+            self._read_headers()
+            return self._load_initial(self.recent_keys())
+
+    def _load_initial(self, keys: List[str]) -> list:
+        started = time.perf_counter()
+        self._segments = {}
+        self._owner = {}
+        self._dirty = set()
+        results = []
+        for key in sorted(keys):
+            segment = self._read_segment(key)
+            self._attach(key, segment)
+            results.extend(segment)
+        self.last_load_ms = (time.perf_counter() - started) * 1000
+        logger.info(f"playlog loaded from {self.path}: {len(results)} results in {len(keys)}/{len(self.headers)} segments, {self.last_load_ms:.0f}ms")
+        return results
+
+    def unloaded_keys(self) -> List[str]:
+        """まだ読み込んでいないセグメント名"""
+        with self.lock:
+            return [key for key in self.headers if key not in self._segments]
+
+    def load_segments(self, keys) -> List[Tuple[str, list]]:
+        """指定したセグメント(読み込み済みのものは除く)を読み込み、(セグメント名, リザルトのlist)のlistをセグメント名順で返す"""
+        with self.lock:
+            started = time.perf_counter()
+            ret = []
+            for key in sorted(keys):
+                if key in self._segments or key not in self.headers:
+                    continue
+                segment = self._read_segment(key)
+                self._attach(key, segment)
+                ret.append((key, segment))
+            self.last_load_ms = (time.perf_counter() - started) * 1000
+            if ret:
+                logger.info(f"playlog segments loaded: {sum(len(segment) for _, segment in ret)} results, {self.last_load_ms:.0f}ms")
+            return ret
+
+    def segments_between(self, t0: Optional[float], t1: Optional[float]) -> List[str]:
+        """未読み込みのセグメントのうち、t0 <= 日時 < t1 のリザルトを含みうるもの"""
+        with self.lock:
+            return [
+                key for key, header in self.headers.items()
+                if key not in self._segments
+                and (t1 is None or header['first'] < t1)
+                and (t0 is None or header['last'] >= t0)
+            ]
+
+    def segments_with_chart(self, key: tuple = None, chart_id: str = None) -> List[str]:
+        """未読み込みのセグメントのうち、譜面(chart_key()またはchart_id)のリザルトを含むもの"""
+        with self.lock:
+            return [
+                name for name, header in self.headers.items()
+                if name not in self._segments
+                and ((key is not None and key in header['charts']) or (chart_id is not None and chart_id in header['chart_ids']))
+            ]
+
+    def unloaded_headers(self) -> List[dict]:
+        """まだ読み込んでいないセグメントのヘッダ"""
+        with self.lock:
+            return [header for key, header in self.headers.items() if key not in self._segments]
+
+    def best_candidates(self, best_key: tuple = None) -> List[Tuple[float, list]]:
+        """未読み込みのセグメントの、自己ベストの集計に影響しうるリザルト(best_candidates())。
+        (セグメントの最も新しいリザルトの日時, リザルトのlist)のlistをセグメント名順で返す。
+        best_keyを指定した場合はその自己ベストのキーのもののみ
+        """
+        with self.lock:
+            ret = []
+            for header in sorted(self.unloaded_headers(), key=lambda h: h['key']):
+                if best_key is None:
+                    results = [r for group in header['bests'].values() for r in group]
+                else:
+                    results = list(header['bests'].get(best_key, ()))
+                if results:
+                    ret.append((header['last'], results))
+            return ret
+
+    def segments_with_images(self) -> List[str]:
+        """未読み込みのセグメントのうち、画像を保存したリザルトを含むもの"""
+        with self.lock:
+            return [key for key, header in self.headers.items() if key not in self._segments and header['images']]
+
+    # 書き込み
+    def record_add(self, result):
+        """リザルトの追加を記録する。追加先のセグメントは読み込み済みであること"""
+        with self.lock:
+            key = segment_key(result)
+            self._segments.setdefault(key, []).append(result)
+            self._owner[id(result)] = key
+            self._dirty.add(key)
+
+    def record_set(self, index: int, result):
+        """resultの内容が変わったことを記録する(indexは互換用で使わない)。月が変わった場合は移動する"""
+        with self.lock:
+            key = segment_key(result)
+            old = self._owner.get(id(result))
+            if old is not None and old != key:
+                self._segments[old] = [r for r in self._segments[old] if r is not result]
+                self._dirty.add(old)
+                self._segments.setdefault(key, []).append(result)
+                self._owner[id(result)] = key
+            self._dirty.add(key)
+
+    @property
+    def pending(self) -> int:
+        '''書き直しが必要なセグメントの数'''
+        return len(self._dirty)
+
+    def _write_segment(self, key: str, results: list) -> Optional[dict]:
+        """セグメントをファイルに書き、ヘッダを返す。空のセグメントはファイルを消してNoneを返す"""
+        file = self._file(key)
+        if not results:
+            if os.path.exists(file):
+                os.remove(file)
+            return None
+        header = make_header(key, results)
+        payload = pickle.dumps(header, protocol=pickle.HIGHEST_PROTOCOL)
+        tmp = file + '.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(MAGIC)
+            f.write(_HEADER_LEN.pack(len(payload)))
+            f.write(payload)
+            f.write(file_codec.compress(pickle.dumps(results, protocol=pickle.HIGHEST_PROTOCOL)))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, file)
+        return header
+
+    def flush(self):
+        """変更のあったセグメントを書き直す。
+        lockを持つのはセグメントのlistの複製とヘッダの更新の間だけで、pickle・圧縮はlockの外で行う。
+        """
+        with self._flush_lock:
+            with self.lock:
+                if not self._dirty:
+                    return
+                started = time.perf_counter()
+                items = [(key, list(self._segments.get(key, []))) for key in sorted(self._dirty)]
+                self._dirty = set()
+            os.makedirs(self.path, exist_ok=True)
+            written = {}
+            try:
+                for key, results in items:
+                    written[key] = self._write_segment(key, results)
+            finally:
+                with self.lock:
+                    self._dirty.update(key for key, _ in items if key not in written) # 失敗した分は次回書き直す
+                    for key, header in written.items():
+                        if header is not None:
+                            self.headers[key] = header
+                        elif not self._segments.get(key): # 書き出し中に追加されていなければ消す
+                            self._segments.pop(key, None)
+                            self.headers.pop(key, None)
+                    self.last_flush_ms = (time.perf_counter() - started) * 1000
+
+    def write_snapshot(self, results: list):
+        """読み込み済みのセグメントをresultsの内容で書き直す(削除・並べ替えの後)。
+        resultsに含まれるのは読み込み済みのセグメントのリザルトのみであること。未読み込みのセグメントはそのまま残す。
+        """
+        started = time.perf_counter()
+        with self.lock:
+            grouped: Dict[str, list] = {}
+            for r in results:
+                grouped.setdefault(segment_key(r), []).append(r)
+            for key in set(self._segments) | set(grouped):
+                new = grouped.get(key, [])
+                old = self._segments.get(key, [])
+                if len(new) != len(old) or any(a is not b for a, b in zip(new, old)):
+                    self._dirty.add(key)
+                self._segments[key] = new
+            self._owner = {id(r): key for key, segment in self._segments.items() for r in segment}
+        self.flush()
+        self.last_snapshot_ms = (time.perf_counter() - started) * 1000
+
+    def start(self, get_results=None):
+        """PlaylogJournalとの互換用。バックグラウンド処理は無い。"""
+        pass
+
+    def stop(self):
+        """未書き込みの変更を書き込む"""
+        self.flush()
@@ -0,0 +1,281 @@
+"""プレーログのSQLite保存(playlog.sqlite3)。
+
+PlaylogJournalと同じインターフェースを持ち、ResultDatabaseの保存先として選択できる。
+resultsテーブルのidはResultDatabase.resultsでの位置(0始まり)と一致させており、
+譜面・日時・detect_modeの索引で該当するリザルトの位置だけを引けるようにしている。
+ResultDatabaseはこの保存先の間、譜面・日時の検索をメモリ上の索引の代わりにDBの索引で行う。
+judges・optionsテーブルは外部ツールから参照するためのもので、アプリからは読まない。
+OneResultそのものはpayload列にpickleで保存し、読み込み時はこちらから復元する。
+"""
+
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from typing import List, Optional
+
+from src.logger import get_logger
+from src.playlog_journal import gc_paused
+logger = get_logger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    id          INTEGER PRIMARY KEY,
+    title       TEXT,
+    play_style  INTEGER,
+    difficulty  INTEGER,
+    battle      INTEGER NOT NULL,
+    lookup_key  TEXT,
+    chart_id    TEXT,
+    timestamp   REAL,
+    detect_mode INTEGER,
+    lamp        INTEGER,
+    score       INTEGER,
+    bp          INTEGER,
+    playspeed   REAL,
+    dead        INTEGER,
+    payload     BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS judges (
+    result_id INTEGER PRIMARY KEY REFERENCES results(id),
+    pg INTEGER, gr INTEGER, gd INTEGER, bd INTEGER, pr INTEGER, cb INTEGER
+);
+CREATE TABLE IF NOT EXISTS options (
+    result_id    INTEGER PRIMARY KEY REFERENCES results(id),
+    arrange      TEXT,
+    flip         TEXT,
+    assist       TEXT,
+    battle       INTEGER,
+    allscratch   INTEGER,
+    regularspeed INTEGER,
+    valid        INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_results_chart ON results(lookup_key, battle);
+CREATE INDEX IF NOT EXISTS idx_results_chart_id ON results(chart_id);
+CREATE INDEX IF NOT EXISTS idx_results_timestamp ON results(timestamp);
+CREATE INDEX IF NOT EXISTS idx_results_mode_timestamp ON results(detect_mode, timestamp);
+-- detect_modeだけの索引は値の種類が少なく使われないため、日時との複合索引に置き換えた
+DROP INDEX IF EXISTS idx_results_detect_mode;
+"""
+
+
+def lookup_key_text(key: Optional[tuple]) -> Optional[str]:
+    """calc_chart_lookup_key()の値をlookup_key列に入れる文字列にしたもの"""
+    if key is None:
+        return None
+    return f"{key[0]}\t{key[1].name}\t{key[2].name}"
+
+
+def _enum_value(value):
+    return value.value if value is not None else None
+
+
+def _bool(value):
+    return None if value is None else int(bool(value))
+
+
+class PlaylogSQLite:
+    """プレーログをSQLite(WALモード)に保存するクラス。
+
+    record_add()/record_set()で変更を溜め、flush()で1トランザクションで書き込む。
+    削除・並べ替えの後はwrite_snapshot()で全件を書き直す。
+    """
+    def __init__(self, path: str = 'playlog.sqlite3'):
+        self.path = path
+        self.enabled = True
+        '''追記型の保存先かどうか(PlaylogJournalとの互換用。常にTrue)'''
+        self.lock = threading.RLock()
+        self._pending = []
+        self.synced = 0
+        '''DBに書き込み済みの件数'''
+        self._next_id = 0
+        self.last_flush_ms = 0.0
+        '''直近のflush()の所要時間(ms)'''
+        self.last_snapshot_ms = 0.0
+        '''直近の全件書き込みの所要時間(ms)'''
+        self._conn: Optional[sqlite3.Connection] = None
+        self._snapshotting = False
+        '''write_snapshot()で行を作っている間はTrue。flush()は全件の書き込み後まで待たせる'''
+        self._generation = 0
+        '''ResultDatabase.resultsの位置が変わった(削除・並べ替え)回数'''
+        self._db_generation = 0
+        '''DBの行が対応している_generation'''
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('PRAGMA synchronous=NORMAL')
+            self._conn.executescript(_SCHEMA)
+        return self._conn
+
+    def exists(self) -> bool:
+        """DBファイルがあるかどうか(移行が必要かの判定用)"""
+        return os.path.exists(self.path)
+
+    def load(self) -> list:
+        """全リザルトをid順に読み込む"""
+        with self.lock:
+            rows = self.conn.execute('SELECT payload FROM results ORDER BY id').fetchall()
+            with gc_paused():
+                results = [pickle.loads(payload) for payload, in rows]
+            self.synced = self._next_id = len(results)
+            self._pending = []
+            logger.info(f"playlog loaded from {self.path}: {len(results)} results")
+            return results
+
+    # 書き込み
+    @staticmethod
+    def _rows(idx: int, result):
+        battle = bool(result.option.battle) if result.option else False
+        judge = result.judge
+        option = result.option
+        result_row = (
+            idx, result.title, _enum_value(result.play_style), _enum_value(result.difficulty), int(battle),
+            lookup_key_text(result.chart_lookup_key),
+            result.chart_id,
+            result.timestamp, _enum_value(result.detect_mode), _enum_value(result.lamp),
+            result.score, result.bp, result.playspeed, _bool(result.dead),
+            pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL),
+        )
+        judge_row = (idx, judge.pg, judge.gr, judge.gd, judge.bd, judge.pr, judge.cb) if judge else None
+        option_row = (
+            idx, option.arrange, option.flip, option.assist, _bool(option.battle),
+            _bool(option.allscratch), _bool(option.regularspeed), _bool(option.valid),
+        ) if option else None
+        return result_row, judge_row, option_row
+
+    def _write_rows(self, items, rows=None):
+        if rows is None:
+            rows = [self._rows(idx, result) for idx, result in items]
+        ids = [(idx,) for idx, _ in items]
+        conn = self.conn
+        conn.executemany('DELETE FROM judges WHERE result_id=?', ids)
+        conn.executemany('DELETE FROM options WHERE result_id=?', ids)
+        conn.executemany(f'INSERT OR REPLACE INTO results VALUES ({",".join("?" * 15)})', [r for r, _, _ in rows])
+        conn.executemany('INSERT INTO judges VALUES (?,?,?,?,?,?,?)', [j for _, j, _ in rows if j])
+        conn.executemany('INSERT INTO options VALUES (?,?,?,?,?,?,?,?)', [o for _, _, o in rows if o])
+
+    def record_add(self, result):
+        """リザルトの追加を記録する"""
+        with self.lock:
+            self._pending.append((self._next_id, result))
+            self._next_id += 1
+
+    def record_set(self, index: int, result):
+        """results[index]の内容が変わったことを記録する"""
+        with self.lock:
+            self._pending.append((index, result))
+
+    @property
+    def pending(self) -> int:
+        '''未書き込みの変更数'''
+        return len(self._pending)
+
+    def flush(self):
+        """溜めた変更を1トランザクションで書き込む"""
+        with self.lock:
+            if not self._pending or self._snapshotting:
+                return
+            started = time.perf_counter()
+            latest = dict(self._pending) # 同じidへの複数の変更は最後のものだけ
+            with self.conn:
+                self._write_rows(sorted(latest.items()))
+            self.synced = self._next_id
+            self._pending = []
+            self.last_flush_ms = (time.perf_counter() - started) * 1000
+
+    def write_snapshot(self, results: list):
+        """全件を書き直す。lockを持つのはlistの複製とDBへの書き込みの間だけで、行のpickleはlockの外で行う。
+        pickle中に記録された変更は全件の書き込み後のflush()で書き込む。
+        """
+        started = time.perf_counter()
+        with self.lock:
+            items = list(enumerate(results))
+            generation = self._generation
+            self._pending = []
+            self._next_id = len(items)
+            self._snapshotting = True
+        try:
+            rows = [self._rows(idx, result) for idx, result in items]
+            with self.lock:
+                with self.conn:
+                    self.conn.execute('DELETE FROM judges')
+                    self.conn.execute('DELETE FROM options')
+                    self.conn.execute('DELETE FROM results')
+                    self._write_rows(items, rows)
+                self.synced = len(items)
+                self._db_generation = generation
+                self.last_snapshot_ms = (time.perf_counter() - started) * 1000
+        finally:
+            with self.lock:
+                self._snapshotting = False
+
+    def start(self, get_results=None):
+        """PlaylogJournalとの互換用。バックグラウンド処理は無い。"""
+        pass
+
+    def stop(self):
+        """未書き込みの変更を書き込んで閉じる"""
+        with self.lock:
+            self.flush()
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    # 検索。DBに書き込み済みの内容が対象のため、ResultDatabaseはin_syncの間だけ使い、dirty_ids()の行は自分で確認する
+    def invalidate(self):
+        """resultsの削除・並べ替えを記録する。次の全件の書き込みまでin_syncはFalseになる"""
+        with self.lock:
+            self._generation += 1
+
+    @property
+    def in_sync(self) -> bool:
+        '''DBの行のidがResultDatabase.resultsでの位置と一致しているかどうか(未書き込みの変更はdirty_ids()で分かる)'''
+        with self.lock:
+            return not self._snapshotting and self._db_generation == self._generation
+
+    def dirty_ids(self) -> set:
+        """未書き込みの変更がある(DBの内容が古い、またはDBに無い)行のid"""
+        with self.lock:
+            return {idx for idx, _ in self._pending}
+
+    def chart_ids(self, key: Optional[tuple], battle: bool = False) -> List[int]:
+        """譜面(calc_chart_lookup_key()の値)とbattleが一致するリザルトの位置(id順)"""
+        text = lookup_key_text(key)
+        cond = 'lookup_key IS NULL' if text is None else 'lookup_key=?'
+        args = (int(bool(battle)),) if text is None else (text, int(bool(battle)))
+        with self.lock:
+            rows = self.conn.execute(f'SELECT id FROM results WHERE {cond} AND battle=? ORDER BY id', args).fetchall()
+        return [idx for idx, in rows]
+
+    def chart_id_ids(self, chart_id: str) -> List[int]:
+        """chart_idが一致するリザルトの位置(id順)"""
+        with self.lock:
+            rows = self.conn.execute('SELECT id FROM results WHERE chart_id=? ORDER BY id', (chart_id,)).fetchall()
+        return [idx for idx, in rows]
+
+    def ids_between(self, t0: Optional[float] = None, t1: Optional[float] = None, mode=None) -> List[int]:
+        """t0 <= timestamp < t1 のリザルトの位置(日時順、同時刻はid順)。日時の無いものは0として扱う(TimeIndexと同じ)。
+        modeを指定した場合はそのdetect_modeのものだけ。
+        """
+        conds, args = [], []
+        if t0 is not None:
+            conds.append('timestamp >= ?')
+            args.append(t0)
+        if t1 is not None:
+            conds.append('timestamp < ?')
+            args.append(t1)
+        where = ' AND '.join(conds) or '1'
+        order = 'timestamp, id'
+        if (t0 is None or t0 <= 0) and (t1 is None or t1 > 0): # 日時の無いもの(NULL)も範囲に入る
+            where = f'({where} OR timestamp IS NULL)'
+            order = 'IFNULL(timestamp, 0), id'
+        if mode is not None:
+            where += ' AND detect_mode=?'
+            args.append(mode.value)
+        with self.lock:
+            rows = self.conn.execute(f'SELECT id FROM results WHERE {where} ORDER BY {order}', args).fetchall()
+        return [idx for idx, in rows]
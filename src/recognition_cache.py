@@ -0,0 +1,52 @@
+"""認識結果のキャッシュ。同じ画面に対する重い認識処理(infnotebook)を繰り返さないためのもの。"""
+
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+
+class RecognitionCache:
+    """画面の指紋をキーに認識結果を覚えておく、件数上限付きのLRUキャッシュ。
+
+    値は呼び出し側で複製してから使うこと(キャッシュ内のオブジェクトを書き換えないため)。
+    """
+    def __init__(self, maxsize: int = 8):
+        self.maxsize = maxsize
+        '''保持する件数。0なら無効'''
+        self._entries: OrderedDict = OrderedDict()
+        self.hits = 0
+        '''キャッシュから返した回数'''
+        self.misses = 0
+        '''キャッシュに無く認識処理を行った回数'''
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """keyに対応する認識結果を返す。無ければNone。"""
+        if self.maxsize <= 0 or key not in self._entries:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return self._entries[key]
+
+    def put(self, key: Hashable, value: Any):
+        """認識結果を登録する。上限を超えた場合は最も古く使われたものから捨てる。"""
+        if self.maxsize <= 0 or value is None:
+            return
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        """全件破棄する(曲情報DBの再読込時など)"""
+        self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def __str__(self):
+        return f"RecognitionCache(size={len(self)}/{self.maxsize}, hits={self.hits}, misses={self.misses}, hit_rate={self.hit_rate*100:.1f}%)"
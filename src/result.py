@@ -8,7 +8,7 @@ from dataclasses import dataclass
 import json
 import math
 import sys
-from typing import Optional
+from typing import Callable, Optional
 from urllib.parse import urlencode
 from urllib.request import Request, urlopen
 
@@ -300,8 +300,39 @@ class CurrentOption(PlayOption):
         
         return ', '.join(parts)
 
+_PLAY_OPTION_POOL = {}
+'''share_play_options()で共有するPlayOptionのインスタンス。属性のtuple -> PlayOption'''
+
+def share_play_options(results: list):
+    """読み込んだリザルトのうち、内容が同じPlayOptionを1つのインスタンスにまとめる(メモリ削減用)。
+    共有されるため、読み込み済みリザルトのoptionは書き換えないこと。
+    """
+    for r in results:
+        option = r.option
+        if type(option) is not PlayOption:
+            continue
+        try:
+            key = tuple(sorted(option.__dict__.items()))
+            r.option = _PLAY_OPTION_POOL.setdefault(key, option)
+        except TypeError: # hashできない値が入っている場合はそのまま
+            pass
+
 class OneResult:
-    """1曲分のリザルトを表すクラス。ファイルへの保存用。"""
+    """1曲分のリザルトを表すクラス。ファイルへの保存用。
+
+    件数が多くなるため__slots__で保持する(__dict__も残しているので任意の属性も追加できる)。
+    pickleの形式は従来と同じく属性のdictで、旧バージョンのplaylog.infdcと相互に読み書きできる。
+    """
+    _FIELDS = (
+        'title', 'play_style', 'difficulty', 'judge', 'detect_mode', 'score', 'bp',
+        'pre_score', 'pre_lamp', 'pre_bp', 'lamp', 'timestamp', 'option', 'playspeed',
+        'is_arcade', 'notes', 'dead', 'average_release', 'bpim2', 'image_path',
+    )
+    '''pickleで保存する属性'''
+    _CACHE_SLOTS = ('_chart_id_cache', '_lookup_key_cache')
+    '''pickleで保存しない計算結果のキャッシュ'''
+    __slots__ = _FIELDS + _CACHE_SLOTS + ('__dict__',)
+
     def __init__(self,
                     title:str,
                     play_style:play_style,
@@ -324,7 +355,11 @@ class OneResult:
                     bpim2:float=None,
                     image_path:str=None,
                 ):
-        self.title = title
+        self._chart_id_cache = None
+        '''((title, play_style, difficulty, battle), chart_id)'''
+        self._lookup_key_cache = None
+        '''((title, play_style, difficulty, battle), calc_chart_lookup_key)'''
+        self.title = sys.intern(title) if isinstance(title, str) else title
         '''曲名'''
         self.play_style = play_style
         '''SP/DP'''
@@ -382,16 +417,54 @@ class OneResult:
         ret = True if self.bp is not None and self.pre_bp is not None and self.bp < self.pre_bp else ret
         return ret
 
+    def __getstate__(self):
+        """pickle用。従来(__slots__導入前)と同じく属性のdictにする。計算結果のキャッシュは含めない。"""
+        state = {name: getattr(self, name) for name in self._FIELDS if hasattr(self, name)}
+        state.update(self.__dict__)
+        return state
+
+    def __setstate__(self, state: dict):
+        self._chart_id_cache = None
+        self._lookup_key_cache = None
+        for name, value in state.items():
+            setattr(self, name, value)
+        title = state.get('title')
+        if type(title) is str:
+            self.title = sys.intern(title)
+
+    def _chart_source(self) -> tuple:
+        """chart_id, chart_lookup_keyの計算元。これが変わっていなければキャッシュを使う"""
+        battle = bool(self.option.battle) if self.option else False
+        return (self.title, self.play_style, self.difficulty, battle)
+
     @property
     def chart_id(self) -> str:
-        """楽曲ID（自動計算）"""
-        battle = self.option.battle if self.option else False
-        return calc_chart_id(self.title, self.play_style, self.difficulty, battle=battle)
+        """楽曲ID（自動計算）。曲名・譜面・BATTLEが変わらない限り前回の計算結果を返す。"""
+        source = self._chart_source()
+        cache = self._chart_id_cache
+        if cache is None or cache[0] != source:
+            cache = self._chart_id_cache = (source, calc_chart_id(source[0], source[1], source[2], battle=source[3]))
+        return cache[1]
+
+    @property
+    def chart_lookup_key(self) -> tuple:
+        """calc_chart_lookup_key()の値。曲名・譜面・BATTLEが変わらない限り前回の計算結果を返す。"""
+        source = self._chart_source()
+        cache = self._lookup_key_cache
+        if cache is None or cache[0] != source:
+            cache = self._lookup_key_cache = (source, calc_chart_lookup_key(source[0], source[1], source[2], battle=source[3]))
+        return cache[1]
+
+    def identity_key(self) -> tuple:
+        """__eq__で比較する項目のtuple。ResultDatabaseの重複確認用の索引のキー。__eq__と項目を揃えること。"""
+        return (self.chart_id, self.lamp, self.timestamp, self.playspeed, self.option, self.is_arcade,
+                self.judge, self.score, self.bp, self.dead, self.detect_mode)
 
     def __eq__(self, other):
         if not isinstance(other, OneResult):
             return False
         # 同一リザルトとみなす条件を絞り込む (例: ID、ランプ、スコア、オプションが同じなら同一)
+        # identity_key()と同じ項目を比較する
         return (self.chart_id == other.chart_id and
                 self.lamp == other.lamp and
                 self.timestamp == other.timestamp and
@@ -430,6 +503,7 @@ class DetailedResult():
                     result:OneResult,
                     result_side:result_side=None,
                     level:int=None,
+                    on_result_updated:Callable[[OneResult], None]=None,
                 ):
         """コンストラクタ。ResultDatabase側でsonginfoとresultを与えて初期化する。"""
         self.result = result
@@ -441,6 +515,8 @@ class DetailedResult():
         '''1P/2Pどちら側であるか'''
         self.level = level
         '''inf-notebook側で認識したレベル'''
+        self.on_result_updated = on_result_updated
+        '''resultのBPIM2を書き換えた際に呼ぶ関数。登録済みリザルトならResultDatabase.mark_updatedを渡す'''
 
         self.score_rate = None
         """スコアレート(0.0-1.0; float)"""
@@ -511,14 +587,23 @@ class DetailedResult():
 
         bpim2 = self._get_bpim2_bpi_detail()
         if bpim2 and bpim2.value is not None:
-            self.result.bpim2 = bpim2.value
-            self.result.bpim2_arena_averages = bpim2.arena_averages
+            self._set_bpim2(bpim2)
             self._bpi_detail = bpim2
             return self._bpi_detail
 
         self._bpi_detail = BpiDetail(value=self._get_local_bpi(), source='local')
         return self._bpi_detail
 
+    def _set_bpim2(self, bpim2: BpiDetail):
+        """取得したBPIM2をresultに書き込み、値が変わった場合はon_result_updatedで通知する"""
+        if (getattr(self.result, 'bpim2', None) == bpim2.value
+                and getattr(self.result, 'bpim2_arena_averages', None) == bpim2.arena_averages):
+            return
+        self.result.bpim2 = bpim2.value
+        self.result.bpim2_arena_averages = bpim2.arena_averages
+        if self.on_result_updated:
+            self.on_result_updated(self.result)
+
     def get_bpim2_bpi_detail(self, force_fetch: bool=False) -> Optional[BpiDetail]:
         """BPIM2のBPI詳細を返す。force_fetch=Trueなら保存済み値があっても現在曲1件だけ再取得する。"""
         saved_bpim2 = getattr(self.result, 'bpim2', None)
@@ -531,8 +616,7 @@ class DetailedResult():
 
         bpim2 = self._get_bpim2_bpi_detail()
         if bpim2 and bpim2.value is not None:
-            self.result.bpim2 = bpim2.value
-            self.result.bpim2_arena_averages = bpim2.arena_averages
+            self._set_bpim2(bpim2)
             return bpim2
         if saved_bpim2 is not None:
             return BpiDetail(
@@ -636,6 +720,22 @@ class OneBestData:
         self.min_bp_result: OneResult = None  # 最小BP時のOneResult
         self.best_lamp_result: OneResult = None  # 最良ランプのOneResult
         self.last_result: OneResult = None  # 最終プレー
+
+    @staticmethod
+    def key_of(result: OneResult) -> tuple | None:
+        """resultを集計する自己ベストのキー(title, play_style, difficulty, battle)。集計対象外のリザルトならNone"""
+        if result.detect_mode == detect_mode.play:
+            return None
+        if result.playspeed not in (None, 1.0):
+            return None
+        if result.option.allscratch:
+            return None
+        if result.option.regularspeed:
+            return None
+        if type(result.score) is not int:
+            return None
+        battle = result.option.battle if result.option else None
+        return (result.title, result.play_style, result.difficulty, battle)
     
     @property
     def chart(self) -> str:
@@ -2,9 +2,16 @@
 from .classes import *
 from .funcs import *
 from .songinfo import *
-from .result import PlayOption, CurrentOption, OneResult, DetailedResult, OneBestData
+from .result import PlayOption, CurrentOption, OneResult, DetailedResult, OneBestData, share_play_options
 from .logger import get_logger
 from .config import Config
+from .playlog_journal import PlaylogJournal
+from .playlog_sqlite import PlaylogSQLite
+from .playlog_segments import PlaylogSegments, segment_key
+from .play_columns import PlayColumns
+from .calendar_rollup import CalendarRollup
+from .time_index import TimeIndex, time_key
+from .debounced_saver import DebouncedSaver
 
 logger = get_logger(__name__)
 import os
@@ -16,11 +23,13 @@ import traceback
 import functools
 import csv
 import urllib.parse
-from collections import defaultdict
+from collections import Counter, defaultdict
 from pathlib import Path
-from typing import Dict, List
+from types import MappingProxyType
+from typing import Dict, List, Mapping, Optional
 import copy
 import threading
+import numpy as np
 from io import BytesIO
 
 from PIL import Image
@@ -116,14 +125,60 @@ def _extract_songinfo_fields(songinfo) -> dict:
     return fields
 
 
+def open_playlog_storage(config: Config = None):
+    """設定に応じたプレーログの保存先を返す。configが無い場合は従来通り毎回全件を書き出す。"""
+    if config is not None and config.playlog_backend == "sqlite":
+        return PlaylogSQLite("playlog.sqlite3")
+    if config is not None and config.playlog_backend == "segments":
+        return PlaylogSegments("playlog_segments", recent_months=config.playlog_recent_months)
+    return PlaylogJournal("playlog.infdc", enabled=config.playlog_journal if config is not None else False)
+
+
 class ResultDatabase:
     """全リザルトを保存するためのクラス"""
 
-    def __init__(self, config: Config = None):
-        self.song_database = SongDatabase()
-        """曲情報クラスのインスタンス。検索用。"""
+    def __init__(self, config: Config = None, storage=None):
+        self.song_database = get_song_database()
+        """曲情報クラスのインスタンス(プロセス内で共有)。検索用。"""
         self.results: List[OneResult] = []
         """全リザルトが格納されるリスト。OneResultが1エントリとなる。"""
+        self.storage = storage or open_playlog_storage(config)
+        """プレーログの保存先(PlaylogJournal / PlaylogSQLite / PlaylogSegments)"""
+        self.last_added_result: OneResult | None = None
+        """最後にadd()で登録したリザルト"""
+        self._needs_full_save = False
+        """削除・並べ替えなど、ジャーナルで表せない変更があったかどうか"""
+        self._saver = DebouncedSaver(self.save_now, name="PlaylogSaveThread")
+        """save()の要求をまとめてバックグラウンドで保存する"""
+        self.save_debounce_ms = 1000 if config is not None else 0
+        """save()の要求をまとめる時間(ms)。0なら要求のたびにその場で書き出す(configの無いスクリプトからの利用時)"""
+        self._chart_index: Dict[tuple, List[int]] | None = defaultdict(list)
+        """(calc_chart_lookup_key, battle) -> resultsでの位置のリスト。SQLite保存ではDBの索引を使えない時だけ作る"""
+        self._chart_id_index: Dict[str, List[int]] | None = None
+        """chart_id -> resultsでの位置のリスト。chart_idのみでの検索時に作る"""
+        self._indexed_count = 0
+        """索引に登録済みの件数"""
+        self._identity_index: Counter | None = None
+        """OneResult.identity_key() -> 件数。add()での重複確認用で、最初の確認時に作る"""
+        self._columns = PlayColumns()
+        """ノーツ数集計用の、resultsと同じ並びの時刻・判定内訳の列"""
+        self._columns_synced = False
+        """_columnsがresultsと一致しているかどうか。Falseなら次の集計時に作り直す"""
+        self._calendar = CalendarRollup()
+        """日・月・年ごとのノーツ数などの集計。_columnsから作り、以降は追加・削除に追従する"""
+        self._time_index = TimeIndex()
+        """resultsの位置を日時順に並べた索引。results_between()などの日時の範囲での検索用"""
+        self._best_view: Dict[tuple, OneBestData] | None = None
+        """get_all_best_results()の集計結果。Noneなら次回の取得時に全件から作る"""
+        self._best_dirty: set = set()
+        """自己ベストを集計し直す必要がある譜面(get_all_best_results()のキー)"""
+        self._best_snapshot: Mapping[tuple, OneBestData] | None = None
+        """get_all_best_results()が返す読み取り専用のスナップショット"""
+        self.best_generation = 0
+        """自己ベストの集計結果が変わりうる変更のたびに1増える。表示側の再読込の判定用"""
+        self._bests_by_chart_id: Dict[str, List[OneBestData]] = {}
+        self._bests_by_chart_id_key = None
+        """_bests_by_chart_idを作った時点の(best_generation, song_database.generation)"""
 
         # WebSocketサーバー関連の初期化
         self.config = config
@@ -144,6 +199,8 @@ class ResultDatabase:
 
         self.load()
         self.save()
+        if self.storage.enabled:
+            self.storage.start(lambda: self.results)
 
     def _write_websocket_config(self):
         """WebSocketポート番号をCSSファイルに書き込む"""
@@ -372,7 +429,7 @@ class ResultDatabase:
             bool(True:登録された / False:登録済み等の理由で却下された)
         """
         if result.detect_mode == detect_mode.play:
-            self.results.append(result)
+            self._append_result(result)
             logger.info(
                 f"result added! hash:{hash(result)}, len:{len(self.results)}, result:{result}"
             )
@@ -386,7 +443,7 @@ class ResultDatabase:
             ):
                 logger.warning(f"result rejected (option is invalid): {result}")
                 return False
-            if result not in self.results:
+            if not self._contains(result):
                 battle = True if result.option and result.option.battle else False
                 if result.pre_lamp is None:
                     result.pre_score, result.pre_bp, result.pre_lamp = self.get_best(
@@ -405,7 +462,7 @@ class ResultDatabase:
                     if not result.is_updated():
                         logger.info(f"select result skipped (no update): {result}")
                         return False
-                self.results.append(result)
+                self._append_result(result)
                 logger.info(
                     f"result added! hash:{hash(result)}, len:{len(self.results)}, result:{result}"
                 )
@@ -413,18 +470,397 @@ class ResultDatabase:
             else:
                 return False
 
+    @staticmethod
+    def _chart_index_key(result: OneResult) -> tuple:
+        """_chart_indexのキー。_result_matches_chartで一致しうるリザルトは同じキーになる"""
+        battle = bool(result.option.battle) if result.option else False
+        return (result.chart_lookup_key, battle)
+
+    def _rebuild_chart_index(self):
+        """譜面の索引を作り直す(読み込み、削除、並べ替えの後)。SQLite保存では必要になった時点で作る"""
+        self._chart_index = None
+        if not isinstance(self.storage, PlaylogSQLite):
+            self._get_chart_index()
+        self._chart_id_index = None
+        self._indexed_count = len(self.results)
+
+    def _get_chart_index(self) -> Dict[tuple, List[int]]:
+        if self._chart_index is None:
+            self._chart_index = defaultdict(list)
+            for idx, r in enumerate(self.results):
+                self._chart_index[self._chart_index_key(r)].append(idx)
+        return self._chart_index
+
+    def _sync_indexes(self):
+        """resultsが直接書き換えられていた場合に、譜面の索引・重複確認用の索引・自己ベストの集計を作り直す"""
+        if self._indexed_count != len(self.results):
+            self._invalidate_storage_positions()
+            self._rebuild_chart_index()
+            self._identity_index = None
+            self._invalidate_aggregates()
+            self.invalidate_best_results()
+
+    def _invalidate_aggregates(self):
+        """ノーツ数集計用の列、日ごとの集計、日時の索引を次の利用時に作り直すようにする"""
+        self._columns_synced = False
+        self._calendar.synced = False
+        self._time_index.synced = False
+
+    def _contains(self, result: OneResult) -> bool:
+        """resultと同一(==)のリザルトが登録済みかどうか。
+        登録済みリザルトのidentity_key()の項目(ランプ、スコア、オプション等)を後から書き換えた場合は、
+        load()し直すまで書き換え前の内容で判定される。
+        """
+        with self.storage.lock:
+            self._load_history_for_chart(key=self._chart_index_key(result))
+            self._sync_indexes()
+            if self._identity_index is None:
+                self._identity_index = Counter(r.identity_key() for r in self.results)
+            return self._identity_index[result.identity_key()] > 0
+
+    def _get_chart_id_index(self) -> Dict[str, List[int]]:
+        if self._chart_id_index is None:
+            self._chart_id_index = defaultdict(list)
+            for idx, r in enumerate(self.results):
+                self._chart_id_index[r.chart_id].append(idx)
+        return self._chart_id_index
+
+    # SQLite保存(PlaylogSQLite)では、譜面・日時の検索をDBの索引で行う
+    def _sqlite_ready(self) -> bool:
+        """DBの索引で検索できるかどうか(DBの行の位置がresultsと一致している)。storage.lockを取った状態で呼ぶこと"""
+        return (
+            isinstance(self.storage, PlaylogSQLite)
+            and self._indexed_count == len(self.results)
+            and self.storage.in_sync
+        )
+
+    def _invalidate_storage_positions(self):
+        """resultsの位置が変わった(削除・並べ替え)ことを保存先に伝える。SQLiteの索引は次の全件の書き出しまで使わない"""
+        if isinstance(self.storage, PlaylogSQLite):
+            self.storage.invalidate()
+
+    def _merge_dirty(self, positions: List[int], matches, sort_key=None) -> List[int]:
+        """DBの索引で引いた位置に、未書き込みの変更がある行の分を反映する。
+        変更のある行はDBの内容によらずmatches(result)で判定し直し、sort_key(位置)の順(省略時は位置順)に並べる。
+        """
+        dirty = self.storage.dirty_ids()
+        if not dirty:
+            return positions
+        ret = [i for i in positions if i not in dirty]
+        ret.extend(i for i in dirty if i < len(self.results) and matches(self.results[i]))
+        ret.sort(key=sort_key)
+        return ret
+
+    def _chart_positions(self, chart_key: tuple) -> List[int]:
+        """譜面(_chart_index_key())のリザルトのresultsでの位置(位置順)。storage.lockを取った状態で呼ぶこと"""
+        self._sync_indexes()
+        if self._sqlite_ready():
+            return self._merge_dirty(
+                self.storage.chart_ids(*chart_key), lambda r: self._chart_index_key(r) == chart_key
+            )
+        return self._get_chart_index().get(chart_key, [])
+
+    def _chart_id_positions(self, chart_id: str) -> List[int]:
+        """chart_idが一致するリザルトのresultsでの位置(位置順)。storage.lockを取った状態で呼ぶこと"""
+        self._sync_indexes()
+        if self._sqlite_ready():
+            return self._merge_dirty(self.storage.chart_id_ids(chart_id), lambda r: r.chart_id == chart_id)
+        return self._get_chart_id_index().get(chart_id, [])
+
+    def _append_result(self, result: OneResult):
+        """resultsへの追加。ジャーナルと譜面の索引にも登録する。"""
+        with self.storage.lock:
+            self._load_history_for_result(result)
+            self.results.append(result)
+            self.storage.record_add(result)
+            self._index_appended(result)
+            self.last_added_result = result
+
+    def _index_appended(self, result: OneResult):
+        """resultsの末尾に追加したresultを各索引・集計に登録する。storage.lockを取った状態で呼ぶこと"""
+        if self._indexed_count == len(self.results) - 1:
+            idx = len(self.results) - 1
+            if self._chart_index is not None:
+                self._chart_index[self._chart_index_key(result)].append(idx)
+            if self._chart_id_index is not None:
+                self._chart_id_index[result.chart_id].append(idx)
+            if self._identity_index is not None:
+                self._identity_index[result.identity_key()] += 1
+            if self._columns_synced:
+                self._columns.append(result)
+                if self._calendar.synced:
+                    self._calendar.add_row(*self._columns.row(idx))
+            if self._time_index.synced:
+                self._time_index.append(result)
+            self._indexed_count += 1
+        self._mark_best_dirty(result)
+
+    # 月ごとの分割保存(PlaylogSegments)で、読み込んでいない古いリザルトを必要になった時点で読み込む
+    @staticmethod
+    def _merge_segment_blocks(results: list, blocks: List[tuple]) -> list:
+        """resultsに、セグメントごとのリザルトのまとまり((セグメントの最も新しいリザルトの日時, list)のセグメント名順のlist)を
+        日時の位置に挿入したlistを返す。resultsの並びは変えず、各まとまりはそれより新しい最初のリザルトの直前に入れる。
+        """
+        merged = []
+        pos = 0
+        for last, block in blocks:
+            start = pos
+            while pos < len(results) and not (results[pos].timestamp or 0) > last:
+                pos += 1
+            merged.extend(results[start:pos])
+            merged.extend(block)
+        merged.extend(results[pos:])
+        return merged
+
+    def _load_segments(self, keys: List[str]):
+        """セグメントを読み込んでresultsに加える(保存済みのため保存先には記録しない)。
+        古いセグメントは日時の位置に挿入し、resultsを全て読み込んだ場合と同じ並びに保つ。
+        """
+        if not keys or not isinstance(self.storage, PlaylogSegments):
+            return
+        with self.storage.lock:
+            loaded = self.storage.load_segments(keys)
+            if not loaded:
+                return
+            for _, segment in loaded:
+                share_play_options(segment)
+            synced = self._indexed_count == len(self.results)
+            self.results[:] = self._merge_segment_blocks(
+                self.results, [(self.storage.headers[key]['last'], segment) for key, segment in loaded]
+            )
+            if synced:
+                if self._identity_index is not None:
+                    for _, segment in loaded:
+                        self._identity_index.update(r.identity_key() for r in segment)
+                # 途中に挿入すると位置がずれるため、譜面の索引は作り直す
+                self._rebuild_chart_index()
+            # 日時の索引・集計は1件ずつ挿入するより作り直す方が速い
+            self._invalidate_aggregates()
+            self.invalidate_best_results()
+
+    def load_history(self):
+        """読み込んでいない古いリザルトを全て読み込む"""
+        if isinstance(self.storage, PlaylogSegments):
+            self._load_segments(self.storage.unloaded_keys())
+
+    def _load_history_between(self, t0: float | None, t1: float | None):
+        """t0 <= timestamp < t1 のリザルトを含む、未読み込みのセグメントを読み込む"""
+        if isinstance(self.storage, PlaylogSegments):
+            self._load_segments(self.storage.segments_between(t0, t1))
+
+    def _load_history_for_chart(self, key: tuple = None, chart_id: str = None):
+        """譜面(_chart_index_key()またはchart_id)のリザルトを含む、未読み込みのセグメントを読み込む"""
+        if isinstance(self.storage, PlaylogSegments):
+            self._load_segments(self.storage.segments_with_chart(key=key, chart_id=chart_id))
+
+    def _load_history_for_result(self, result: OneResult):
+        """resultの追加・更新の前に、resultが入るセグメントを読み込んでおく"""
+        if isinstance(self.storage, PlaylogSegments):
+            self._load_segments([segment_key(result)])
+
+    def _position_of(self, result: OneResult) -> Optional[int]:
+        """登録済みのresult(同一オブジェクト)のresultsでの位置。無ければNone。storage.lockを取った状態で呼ぶこと"""
+        count = len(self.results)
+        for idx in range(count - 1, max(count - 16, 0) - 1, -1): # 書き換えるのはほぼ直近のリザルト
+            if self.results[idx] is result:
+                return idx
+        for idx in self._chart_positions(self._chart_index_key(result)):
+            if self.results[idx] is result:
+                return idx
+        for idx in range(count - 1, -1, -1): # 登録後に曲名・譜面を書き換えた場合は索引に載っていない
+            if self.results[idx] is result:
+                return idx
+        return None
+
+    def mark_updated(self, result: OneResult):
+        """登録済みリザルトの内容(画像パス、BPIなど)を書き換えた場合に呼ぶ。次のsave()で保存される。"""
+        with self.storage.lock:
+            self._load_history_for_result(result)
+            idx = self._position_of(result)
+            if idx is None:
+                return
+            self.storage.record_set(idx, result)
+            self._mark_best_dirty(result)
+            if self._indexed_count != len(self.results):
+                return
+            if self._columns_synced:
+                if self._calendar.synced:
+                    self._calendar.add_row(*self._columns.row(idx), sign=-1)
+                self._columns.set(idx, result)
+                if self._calendar.synced:
+                    self._calendar.add_row(*self._columns.row(idx))
+            if self._time_index.synced:
+                self._time_index.update(idx, result)
+
+    def remove_result(self, result: OneResult) -> bool:
+        """リザルトを削除する。次のsave()で全件を書き出す。"""
+        with self.storage.lock:
+            if not self._contains(result):
+                return False
+            idx = self.results.index(result)
+            del self.results[idx]
+            if self._columns_synced:
+                if self._calendar.synced:
+                    self._calendar.add_row(*self._columns.row(idx), sign=-1)
+                self._columns.delete(idx)
+            self._time_index.synced = False
+            key = result.identity_key()
+            self._identity_index[key] -= 1
+            if self._identity_index[key] <= 0:
+                del self._identity_index[key]
+            self._needs_full_save = True
+            self._invalidate_storage_positions()
+            self._rebuild_chart_index()
+            self._mark_best_dirty(result)
+            return True
+
+    def sort_results(self):
+        """リザルトを並べ替える。次のsave()で全件を書き出す。
+        月ごとの分割保存では読み込み済みのリザルトだけを並べ替える(追加・更新したセグメントは読み込み済みのため)。
+        """
+        with self.storage.lock:
+            self.results.sort()
+            self._needs_full_save = True
+            self._invalidate_storage_positions()
+            self._rebuild_chart_index()
+            self._invalidate_aggregates()
+
+    def _migrate_from_infdc(self):
+        """playlog.infdc(+ジャーナル)の内容をSQLite・月ごとの分割保存に移行する。playlog.infdcはそのまま残す。"""
+        results = PlaylogJournal("playlog.infdc", enabled=False).load()
+        self.storage.write_snapshot(results)
+        logger.info(f"playlog migrated to {self.storage.path}: {len(results)} results, {self.storage.last_snapshot_ms:.0f}ms")
+
+    def _get_play_columns(self) -> PlayColumns:
+        """ノーツ数集計用の列。storage.lockを取った状態で呼び、集計が終わるまで保持すること。"""
+        self._sync_indexes()
+        if not self._columns_synced:
+            self._columns.rebuild(self.results)
+            self._columns_synced = True
+        return self._columns
+
+    def _get_calendar(self) -> CalendarRollup:
+        """日・月・年ごとの集計。storage.lockを取った状態で呼ぶこと。
+        autoload_offsetが変わっていた場合は、その日付の区切りで作り直す。
+        読み込んでいない古いセグメントの分は、セグメントのヘッダの要約から加える。
+        """
+        cols = self._get_play_columns()
+        offset_hours = _to_int_or_none(getattr(self.config, "autoload_offset", 0) if self.config else 0) or 0
+        if not self._calendar.synced or self._calendar.offset_hours != offset_hours:
+            self._calendar.rebuild(cols, offset_hours)
+            if isinstance(self.storage, PlaylogSegments):
+                for header in self.storage.unloaded_headers():
+                    for timestamp, (plays, play_count, judge) in header['days'].items():
+                        self._calendar.add_summary(timestamp, plays, play_count, judge)
+        return self._calendar
+
+    def _positions_between(self, t0: float | None, t1: float | None, mode: detect_mode | None = None) -> List[int]:
+        """t0 <= timestamp < t1 のリザルトのresultsでの位置(日時の古い順)。storage.lockを取った状態で呼ぶこと
+        modeを指定した場合はそのdetect_modeのリザルトのみ。
+        """
+        self._load_history_between(t0, t1)
+        self._sync_indexes()
+        if self._sqlite_ready():
+            def matches(r):
+                ts = time_key(r)
+                return ((t0 is None or ts >= t0) and (t1 is None or ts < t1)
+                        and (mode is None or r.detect_mode == mode))
+            return self._merge_dirty(
+                self.storage.ids_between(t0, t1, mode), matches, sort_key=lambda i: (time_key(self.results[i]), i)
+            )
+        if not self._time_index.synced:
+            self._time_index.rebuild(self.results)
+        positions = self._time_index.between(t0, t1)
+        if mode is not None:
+            positions = [i for i in positions if self.results[i].detect_mode == mode]
+        return positions
+
+    def _rows_between(self, t0: float | None, t1: float | None) -> np.ndarray:
+        """_positions_between()のnumpy配列版。_get_play_columns()の行の指定に使う。
+        古いリザルトを読み込むことがあるため、_get_play_columns()より先に呼ぶこと"""
+        return np.array(self._positions_between(t0, t1), dtype=np.int64)
+
+    def results_between(self, t0: float | None = None, t1: float | None = None, mode: detect_mode | None = None) -> List[OneResult]:
+        """t0 <= timestamp < t1 のリザルトを日時の古い順に返す。
+
+        resultsの並び(登録順)によらず、日時の索引から二分探索で引く。日時の無いリザルトは0として扱う。
+
+        Args:
+            t0 (float | None): 範囲の開始(これを含む)。Noneなら制限なし
+            t1 (float | None): 範囲の終了(これを含まない)。Noneなら制限なし
+            mode (detect_mode | None): 指定した場合はそのdetect_modeのリザルトのみ
+        """
+        with self.storage.lock:
+            return [self.results[i] for i in self._positions_between(t0, t1, mode)]
+
+    def _chart_candidates(self, key, title, style, difficulty, battle) -> List[OneResult]:
+        """search()の対象候補。譜面の索引からその譜面のリザルトだけを取り出す"""
+        with self.storage.lock:
+            if title is not None and style is not None and difficulty is not None:
+                battle = bool(battle)
+                chart_key = (calc_chart_lookup_key(title, style, difficulty, battle=battle), battle)
+                self._load_history_for_chart(key=chart_key)
+                indices = self._chart_positions(chart_key)
+            elif key:
+                self._load_history_for_chart(chart_id=key)
+                indices = self._chart_id_positions(key)
+            else:
+                return []
+            return [self.results[i] for i in indices]
+
     def load(self):
         """保存済みリザルトをロードする"""
         try:
-            with bz2.BZ2File("playlog.infdc", "rb", compresslevel=9) as f:
-                self.results = pickle.load(f)
+            if isinstance(self.storage, (PlaylogSQLite, PlaylogSegments)) and not self.storage.exists() and os.path.exists("playlog.infdc"):
+                self._migrate_from_infdc()
+            if isinstance(self.storage, PlaylogSegments): # 古いリザルトは必要になった時点で読み込む
+                self.results = self.storage.load_recent()
+            else:
+                self.results = self.storage.load()
+            self._needs_full_save = False
+            share_play_options(self.results)
+            self._rebuild_chart_index()
+            self._identity_index = None
+            self._invalidate_aggregates()
+            self.invalidate_best_results()
         except Exception:
             logger.error(traceback.format_exc())
 
     def save(self):
-        """ファイル出力"""
-        with bz2.BZ2File("playlog.infdc", "wb", compresslevel=9) as f:
-            pickle.dump(self.results, f)
+        """保存を要求する。save_debounce_ms以内の要求は1回にまとめ、バックグラウンドで書き出す。
+        save_debounce_msが0の場合はその場で書き出す。
+        """
+        self._saver.request(self.save_debounce_ms)
+
+    def save_now(self):
+        """ファイル出力。ジャーナルモードでは前回からの追加・更新分だけを追記する。
+        全件の書き出しは一時ファイルに書いてから置き換える(SQLiteでは1トランザクション)。
+        """
+        if self.storage.enabled and not self._needs_full_save:
+            self.storage.flush()
+        else:
+            # 書き出し中の削除などで再び全件の書き出しが必要になった場合に備え、先に下ろしておく
+            self._needs_full_save = False
+            try:
+                self.storage.write_snapshot(self.results)
+            except Exception:
+                self._needs_full_save = True
+                raise
+
+    @property
+    def save_pending(self) -> bool:
+        """まだ書き出していない(または書き出し中の)保存要求があるかどうか"""
+        return self._saver.pending
+
+    @property
+    def last_save_ms(self) -> float:
+        """直近の保存の所要時間(ms)"""
+        return self._saver.last_save_ms
+
+    def close(self):
+        """未保存分を書き出し、保存スレッドとジャーナルの畳み込みスレッドを停止する(アプリ終了時に呼び出す)"""
+        self._saver.stop()
+        self.storage.stop()
 
     def _result_matches_chart(
         self,
@@ -446,12 +882,12 @@ class ResultDatabase:
             return True
         if title is None or style is None or difficulty is None:
             return False
-        return calc_chart_lookup_key(
-            result.title, result.play_style, result.difficulty, battle=result_battle
-        ) == calc_chart_lookup_key(title, style, difficulty, battle=battle)
+        return result.chart_lookup_key == calc_chart_lookup_key(title, style, difficulty, battle=battle)
 
     def _search_songinfo_for_result(self, result: OneResult) -> OneSongInfo:
-        """保存当時の曲名表記が古くても現在のsonginfoを返す。"""
+        """保存当時の曲名表記が古くても現在のsonginfoを返す。
+        曲名のあいまい検索は別の曲と取り違えうるため、保存済みのリザルトには使わない(選曲画面の認識時のみ)。
+        """
         return self.song_database.search(
             title=result.title,
             play_style=result.play_style,
@@ -485,10 +921,10 @@ class ResultDatabase:
             title=title, play_style=style, difficulty=difficulty
         ) or self.song_database.search(chart_id=key)
 
-        for r in self.results:
+        for r in self._chart_candidates(key, title, style, difficulty, battle):
             if self._result_matches_chart(r, key, title, style, difficulty, battle):
                 detail_songinfo = songinfo or self._search_songinfo_for_result(r)
-                detail = DetailedResult(detail_songinfo, r)
+                detail = DetailedResult(detail_songinfo, r, on_result_updated=self.mark_updated)
                 ret.append(detail)
         return ret
 
@@ -557,23 +993,49 @@ class ResultDatabase:
 
         return ret
 
+    @staticmethod
+    def _month_start(year: int, month: int) -> float:
+        """その月の1日0時(ローカル時刻)のtimestamp。monthは13以上でもよい"""
+        year += (month - 1) // 12
+        month = (month - 1) % 12 + 1
+        return datetime.datetime(year, month, 1).timestamp()
+
+    @staticmethod
+    def _day_start(date: datetime.date) -> float:
+        """その日の0時(ローカル時刻)のtimestamp"""
+        return datetime.datetime(date.year, date.month, date.day).timestamp()
+
+    @staticmethod
+    def _judge_total(columns: PlayColumns, rows: np.ndarray) -> Judge:
+        """columnsのrows行目のうち、判定のある行の判定の合計"""
+        rows = rows[columns.has_judge[rows]]
+        return Judge(*(int(v) for v in columns.judge[rows].sum(axis=0)))
+
+    @staticmethod
+    def _notes_total(columns: PlayColumns, rows: np.ndarray) -> int:
+        """columnsのrows行目のうち、プレー画面から登録した行のノーツ数(pg+gr+gd+bd)の合計"""
+        rows = rows[columns.play[rows] & columns.has_judge[rows]]
+        return int(columns.judge[rows, :4].sum())
+
+    def _today_play_results(self, start_time: int) -> tuple:
+        """start_time以降にプレー画面から登録したリザルト(新しい順)と、その判定の合計を返す。"""
+        with self.storage.lock:
+            rows = self._rows_between(start_time, None)
+            cols = self._get_play_columns()
+            rows = rows[cols.play[rows]]
+            target = [self.results[i] for i in rows[::-1]]
+            total = self._judge_total(cols, rows)
+        return target, total
+
     def get_monthly_notes(self, target: datetime.datetime = None):
         """その月のノーツ数を算出"""
         if target is None:
             target = datetime.datetime.now()
-        ret = 0
-        for r in reversed(self.results):
-            result_date = datetime.datetime.fromtimestamp(r.timestamp)
-            if r.detect_mode != detect_mode.play:
-                continue
-            if (result_date.month == target.month) and (
-                result_date.year == target.year
-            ):
-                if r.judge:
-                    ret += r.judge.notes
-            else:
-                break
-        return ret
+        t0 = self._month_start(target.year, target.month)
+        t1 = self._month_start(target.year, target.month + 1)
+        with self.storage.lock:
+            rows = self._rows_between(t0, t1)
+            return self._notes_total(self._get_play_columns(), rows)
 
     def get_recent_monthly_notes(
         self, target: datetime.datetime = None, months: int = 3
@@ -592,27 +1054,24 @@ class ResultDatabase:
                 month = 12
                 year -= 1
 
-        totals = {key: 0 for key in month_keys}
-        oldest_year, oldest_month = month_keys[-1]
-
-        for r in reversed(self.results):
-            if r.detect_mode != detect_mode.play or not r.judge:
-                continue
-
-            result_date = datetime.datetime.fromtimestamp(r.timestamp)
-            key = (result_date.year, result_date.month)
-            if key not in totals and key < (oldest_year, oldest_month):
-                break
-
-            if key in totals:
-                totals[key] += r.judge.notes
+        # 古い月から順の各月の開始時刻と、targetの翌月の開始時刻
+        bounds = [self._month_start(y, m) for y, m in reversed(month_keys)]
+        bounds.append(self._month_start(target.year, target.month + 1))
+        with self.storage.lock:
+            rows = self._rows_between(bounds[0], bounds[-1])
+            cols = self._get_play_columns()
+            rows = rows[cols.play[rows] & cols.has_judge[rows]]
+            month_idx = np.searchsorted(bounds, cols.timestamp[rows], side="right") - 1
+            notes = cols.judge[rows, :4].sum(axis=1)
+        totals = np.zeros(months, dtype=np.int64)
+        np.add.at(totals, month_idx, notes)
 
         return [
             {
                 "label": f"{year}/{month:02d}",
-                "notes": totals[(year, month)],
+                "notes": int(totals[i]),
             }
-            for year, month in reversed(month_keys)
+            for i, (year, month) in enumerate(reversed(month_keys))
         ]
 
     def get_yearly_notes(self, target: datetime.datetime = None) -> int:
@@ -620,131 +1079,174 @@ class ResultDatabase:
         if target is None:
             target = datetime.datetime.now()
 
-        ret = 0
-        for r in reversed(self.results):
-            if r.detect_mode != detect_mode.play or not r.judge:
-                continue
+        t0 = self._month_start(target.year, 1)
+        t1 = self._month_start(target.year + 1, 1)
+        with self.storage.lock:
+            rows = self._rows_between(t0, t1)
+            return self._notes_total(self._get_play_columns(), rows)
 
-            result_date = datetime.datetime.fromtimestamp(r.timestamp)
-            if result_date.year < target.year:
-                break
+    @staticmethod
+    def _best_key(result: OneResult) -> tuple | None:
+        """get_all_best_results()でのキー。集計対象外のリザルトならNone"""
+        return OneBestData.key_of(result)
 
-            if result_date.year == target.year:
-                ret += r.judge.notes
+    def _apply_best(self, best_results: Dict[tuple, OneBestData], key: tuple, result: OneResult):
+        """1件のリザルトをbest_results[key]に反映する。
+        ベストとして保持するリザルトは属性を差し替えるため、ログのリザルトの浅いコピーとする。
+        """
+        if key not in best_results:
+            best = OneBestData()
+            best.title = result.title
+            best.style = result.play_style
+            best.difficulty = result.difficulty
+            best.songinfo = self._search_songinfo_for_result(result)
+            best_results[key] = best
+        else:
+            best = best_results[key]
+
+        # ベストスコア更新
+        if result.score and (
+            not best.best_score_result
+            or result.score > best.best_score_result.score
+        ):
+            best.best_score_result = copy.copy(result)
+        elif (
+            result.score
+            and best.best_score_result
+            and result.score == best.best_score_result.score
+        ):
+            if result.detect_mode == detect_mode.result:
+                best.best_score_result.option = result.option
+            if getattr(result, "bpim2", None) is not None:
+                best.best_score_result.bpim2 = result.bpim2
+            if getattr(result, "bpim2_arena_averages", None):
+                best.best_score_result.bpim2_arena_averages = result.bpim2_arena_averages
+
+        # 最小BP更新
+        current_bp = (
+            result.bp if (result.bp is not None and not result.dead) else 99999
+        )
+        best_bp = (
+            best.min_bp_result.bp
+            if best.min_bp_result and best.min_bp_result.bp is not None
+            else 99999
+        )
+        if current_bp < best_bp:
+            best.min_bp_result = copy.copy(result)
+        elif current_bp == best_bp and result.detect_mode == detect_mode.result:
+            if best.min_bp_result:
+                best.min_bp_result.option = result.option
+
+        # ベストランプ更新
+        if result.lamp:
+            if (
+                not best.best_lamp_result
+                or result.lamp.value > best.best_lamp_result.lamp.value
+            ):
+                best.best_lamp_result = copy.copy(result)
+            elif (
+                result.lamp.value == best.best_lamp_result.lamp.value
+                and result.detect_mode == detect_mode.result
+            ):
+                if best.best_lamp_result:
+                    best.best_lamp_result.option = result.option
+
+        # 最終プレー日更新
+        if not best.last_result or result.timestamp > best.last_result.timestamp:
+            best.last_result = result
+
+        # ノーツ数を埋めておく
+        if result.notes:
+            if best.best_score_result:
+                best.best_score_result.notes = result.notes
+            if best.best_lamp_result:
+                best.best_lamp_result.notes = result.notes
+            if best.min_bp_result:
+                best.min_bp_result.notes = result.notes
+
+    def _collect_best(self, results) -> Dict[tuple, OneBestData]:
+        """resultsを先頭から順に集計した自己ベストの辞書を返す"""
+        best_results: Dict[tuple, OneBestData] = {}
+        for result in results:
+            key = self._best_key(result)
+            if key is not None:
+                self._apply_best(best_results, key, result)
+        return best_results
 
-        return ret
+    def _rebuild_best_chart(self, key: tuple):
+        """1譜面分の自己ベストを、譜面の索引から引いたその譜面のリザルトだけで集計し直す"""
+        title, style, diff, battle = key
+        indices = self._chart_positions((calc_chart_lookup_key(title, style, diff, battle=bool(battle)), bool(battle)))
+        results = [r for r in (self.results[i] for i in indices) if self._best_key(r) == key]
+        chart = self._collect_best(self._with_unloaded_best_candidates(results, key))
+        if key in chart:
+            self._best_view[key] = chart[key]
+        else:
+            self._best_view.pop(key, None)
 
-    def get_all_best_results(self) -> Dict[tuple, OneBestData]:
+    def _with_unloaded_best_candidates(self, results: List[OneResult], key: tuple = None) -> List[OneResult]:
+        """resultsに、読み込んでいない古いセグメントの自己ベストの集計に影響しうるリザルト(セグメントのヘッダから)を
+        読み込んだ場合と同じ位置に挿入して返す
+        """
+        if isinstance(self.storage, PlaylogSegments):
+            blocks = self.storage.best_candidates(key)
+            if blocks:
+                return self._merge_segment_blocks(results, blocks)
+        return results
+
+    def _mark_best_dirty(self, result: OneResult):
+        """resultが属する譜面の自己ベストを次回の取得時に集計し直す"""
+        key = self._best_key(result)
+        if key is None:
+            return
+        with self.storage.lock:
+            if self._best_view is not None:
+                self._best_dirty.add(key)
+            self._best_snapshot = None
+            self.best_generation += 1
+
+    def invalidate_best_results(self):
+        """自己ベストの集計結果を破棄し、次回の取得時に全件から作り直す(曲情報DBの再読込時など)"""
+        with self.storage.lock:
+            self._best_view = None
+            self._best_dirty.clear()
+            self._best_snapshot = None
+            self.best_generation += 1
+
+    def get_all_best_results(self) -> Mapping[tuple, OneBestData]:
         """全譜面のベストリザルトをOneBestDataとして集計（battle有効/無効を別々に集計）
         detect_mode.playのリザルトは除外する。
         playspeedがNoneまたは1.0以外のリザルトは除外する。
         optionはdetect_mode.resultの場合にのみ有効とする。
         bp, lamp, scoreが同点の場合、detect_mode.resultのオプションで上書きする。
 
+        集計結果は保持しておき、追加・更新・削除があった譜面だけを集計し直す。
+        返り値は読み取り専用のスナップショットで、以降の変更の影響を受けない。
+        中のOneBestDataは次のスナップショットと共有されるため書き換えないこと。
+        変更の有無はbest_generationで判定できる。
+
         Returns:
-            Dict[tuple, OneBestData]: (title, play_style, difficulty, battle)をキーとした辞書
+            Mapping[tuple, OneBestData]: (title, play_style, difficulty, battle)をキーとした辞書
         """
-        best_results: Dict[tuple, OneBestData] = {}
-
-        for result in self.results:
-            if result.detect_mode == detect_mode.play:
-                continue
-            if result.playspeed not in (None, 1.0):
-                continue
-            if result.option.allscratch:
-                continue
-            if result.option.regularspeed:
-                continue
-            if type(result.score) is not int:
-                continue
-
-            battle = result.option.battle if result.option else None
-            key = (result.title, result.play_style, result.difficulty, battle)
-
-            if key not in best_results:
-                best = OneBestData()
-                best.title = result.title
-                best.style = result.play_style
-                best.difficulty = result.difficulty
-                best.songinfo = self._search_songinfo_for_result(result)
-                best_results[key] = best
-            else:
-                best = best_results[key]
-
-            # ベストスコア更新
-            if result.score and (
-                not best.best_score_result
-                or result.score > best.best_score_result.score
-            ):
-                best.best_score_result = copy.deepcopy(result)
-            elif (
-                result.score
-                and best.best_score_result
-                and result.score == best.best_score_result.score
-            ):
-                if result.detect_mode == detect_mode.result:
-                    best.best_score_result.option = result.option
-                if getattr(result, "bpim2", None) is not None:
-                    best.best_score_result.bpim2 = result.bpim2
-                if getattr(result, "bpim2_arena_averages", None):
-                    best.best_score_result.bpim2_arena_averages = result.bpim2_arena_averages
-
-            # 最小BP更新
-            current_bp = (
-                result.bp if (result.bp is not None and not result.dead) else 99999
-            )
-            best_bp = (
-                best.min_bp_result.bp
-                if best.min_bp_result and best.min_bp_result.bp is not None
-                else 99999
-            )
-            if current_bp < best_bp:
-                best.min_bp_result = copy.deepcopy(result)
-            elif current_bp == best_bp and result.detect_mode == detect_mode.result:
-                if best.min_bp_result:
-                    best.min_bp_result.option = result.option
-
-            # ベストランプ更新
-            if result.lamp:
-                if (
-                    not best.best_lamp_result
-                    or result.lamp.value > best.best_lamp_result.lamp.value
-                ):
-                    best.best_lamp_result = copy.deepcopy(result)
-                elif (
-                    result.lamp.value == best.best_lamp_result.lamp.value
-                    and result.detect_mode == detect_mode.result
-                ):
-                    if best.best_lamp_result:
-                        best.best_lamp_result.option = result.option
-
-            # 最終プレー日更新
-            if not best.last_result or result.timestamp > best.last_result.timestamp:
-                best.last_result = result
-
-            # ノーツ数を埋めておく
-            if result.notes:
-                if best.best_score_result:
-                    best.best_score_result.notes = result.notes
-                if best.best_lamp_result:
-                    best.best_lamp_result.notes = result.notes
-                if best.min_bp_result:
-                    best.min_bp_result.notes = result.notes
-
-        return best_results
+        with self.storage.lock:
+            self._sync_indexes()
+            if self._best_view is None:
+                # 読み込んでいない古いセグメントは、ヘッダに載せた候補のリザルトだけで集計する
+                self._best_view = self._collect_best(self._with_unloaded_best_candidates(self.results))
+                self._best_dirty.clear()
+                self._best_snapshot = None
+            elif self._best_dirty:
+                for key in self._best_dirty:
+                    self._rebuild_best_chart(key)
+                self._best_dirty.clear()
+                self._best_snapshot = None
+            if self._best_snapshot is None:
+                self._best_snapshot = MappingProxyType(dict(self._best_view))
+            return self._best_snapshot
 
     def get_graph_data(self, start_time: int) -> dict:
         """本日のノーツ数用データを辞書形式で返す"""
-        target = []
-        total = Judge()
-        for r in reversed(self.results):
-            if r.detect_mode == detect_mode.play:
-                if r.timestamp >= start_time:
-                    target.append(r)
-                    if r.judge:
-                        total += r.judge
-                else:
-                    break
+        target, total = self._today_play_results(start_time)
 
         # 現在のスコアレートを計算
         current_score_rate = "0.00%"
@@ -793,13 +1295,7 @@ class ResultDatabase:
 
     def get_today_updates_data(self, start_time: int) -> dict:
         """本日のプレー履歴のデータを辞書形式で返す"""
-        target: List[OneResult] = []
-        for r in reversed(self.results):
-            if r.detect_mode == detect_mode.result:
-                if r.timestamp >= start_time:
-                    target.append(r)
-                else:
-                    break
+        target = self.results_between(start_time, None, detect_mode.result)[::-1]
 
         items = []
         for r in target:
@@ -811,6 +1307,7 @@ class ResultDatabase:
                 r,
                 None,
                 songinfo.level if hasattr(songinfo, "level") else None,
+                on_result_updated=self.mark_updated,
             )
             lamp = r.lamp or clear_lamp.noplay
 
@@ -878,69 +1375,56 @@ class ResultDatabase:
         now = datetime.datetime.now()
 
         # --- playcount, score_rate (get_graph_dataと同等のロジック) ---
-        today_target = []
-        total_judge = Judge()
-        for r in reversed(self.results):
-            if r.detect_mode == detect_mode.play:
-                if r.timestamp >= start_time:
-                    today_target.append(r)
-                    if r.judge:
-                        total_judge += r.judge
-                else:
-                    break
+        today_target, total_judge = self._today_play_results(start_time)
 
         playcount = len(today_target)
         score_rate_str = f"{total_judge.score_rate * 100:.1f}%"
 
         # --- daily_notes: 直近14日分の日別ノーツ ---
-        daily_judges = defaultdict(Judge)
-        for r in reversed(self.results):
-            if r.detect_mode != detect_mode.play or not r.judge:
-                continue
-            r_date = datetime.datetime.fromtimestamp(r.timestamp).date()
-            days_ago = (now.date() - r_date).days
-            if days_ago > 14:
-                break
-            daily_judges[r_date] += r.judge
+        days = [now.date() - datetime.timedelta(days=i) for i in range(14, -1, -1)]
+        bounds = [self._day_start(d) for d in days]
+        bounds.append(self._day_start(now.date() + datetime.timedelta(days=1)))
+        with self.storage.lock:
+            rows = self._rows_between(bounds[0], bounds[-1])
+            cols = self._get_play_columns()
+            rows = rows[cols.play[rows] & cols.has_judge[rows]]
+            day_idx = np.searchsorted(bounds, cols.timestamp[rows], side="right") - 1
+            judges = cols.judge[rows, :4]
+        daily = np.zeros((len(days), 4), dtype=np.int64)
+        np.add.at(daily, day_idx, judges)
 
         daily_notes = []
-        for i in range(14, -1, -1):
-            d = now.date() - datetime.timedelta(days=i)
-            j = daily_judges.get(d, Judge())
+        for d, (pg, gr, gd, bd) in zip(days, daily.tolist()):
             daily_notes.append(
                 {
                     "date": d.strftime("%m/%d"),
-                    "pg": j.pg,
-                    "gr": j.gr,
-                    "gd": j.gd,
-                    "bd": j.bd,
+                    "pg": pg,
+                    "gr": gr,
+                    "gd": gd,
+                    "bd": bd,
                 }
             )
 
         # --- today_level_distribution: 本日のレベル分布 ---
         level_dist = {}
-        for r in reversed(self.results):
-            if r.detect_mode == detect_mode.result:
-                if r.timestamp >= start_time:
-                    songinfo = self.song_database.search(
-                        title=r.title, play_style=r.play_style, difficulty=r.difficulty
-                    )
-                    lv = (
-                        str(songinfo.level)
-                        if songinfo and hasattr(songinfo, "level")
-                        else "?"
-                    )
-                    if lv not in level_dist:
-                        level_dist[lv] = {"sp": 0, "dp": 0, "battle": 0}
-                    is_battle = r.option and r.option.battle
-                    if is_battle:
-                        level_dist[lv]["battle"] += 1
-                    elif r.play_style == play_style.sp:
-                        level_dist[lv]["sp"] += 1
-                    else:
-                        level_dist[lv]["dp"] += 1
-                else:
-                    break
+        for r in reversed(self.results_between(start_time, None, detect_mode.result)):
+            songinfo = self.song_database.search(
+                title=r.title, play_style=r.play_style, difficulty=r.difficulty
+            )
+            lv = (
+                str(songinfo.level)
+                if songinfo and hasattr(songinfo, "level")
+                else "?"
+            )
+            if lv not in level_dist:
+                level_dist[lv] = {"sp": 0, "dp": 0, "battle": 0}
+            is_battle = r.option and r.option.battle
+            if is_battle:
+                level_dist[lv]["battle"] += 1
+            elif r.play_style == play_style.sp:
+                level_dist[lv]["sp"] += 1
+            else:
+                level_dist[lv]["dp"] += 1
 
         # --- level_stats: 全レベルのランプ/スコアレート統計 ---
         bests = self.get_all_best_results()
@@ -1144,7 +1628,9 @@ class ResultDatabase:
             data["bpi_coef"] = f"{songinfo.bpi_coef}"
 
         if detail:
-            detail.result.notes = notes
+            if detail.result.notes != notes:
+                detail.result.notes = notes
+                self.mark_updated(detail.result)
             if detail.result.notes:
                 data["notes"] = notes
                 data["best_score_rate"] = best_score / detail.result.notes / 2
@@ -1361,7 +1847,7 @@ class ResultDatabase:
 
     def _serialize_mobile_result(self, result: OneResult) -> dict:
         songinfo = self._songinfo_for_result(result)
-        detail = DetailedResult(songinfo, result)
+        detail = DetailedResult(songinfo, result, on_result_updated=self.mark_updated)
         lamp = result.lamp or clear_lamp.noplay
         bpi = None
         bpi_label = ""
@@ -1382,6 +1868,7 @@ class ResultDatabase:
         score_rate = score / (notes * 2) if score is not None and notes else detail.score_rate
         if notes and not result.notes:
             result.notes = notes
+            self.mark_updated(result)
             detail.update_details()
         rankdiff = "".join(detail.score_rate_with_rankdiff) if detail.score_rate_with_rankdiff else ""
         data = {
@@ -1446,7 +1933,7 @@ class ResultDatabase:
         timestamp = _to_int_or_none(timestamp)
         if timestamp is None:
             return None
-        for result in self.results:
+        for result in self.results_between(timestamp, timestamp + 1):
             if result.timestamp != timestamp:
                 continue
             image_path = getattr(result, "image_path", None)
@@ -1472,22 +1959,14 @@ class ResultDatabase:
         return data.get("bpi_near_averages", []) or []
 
     def _notes_by_date(self) -> dict[str, int]:
-        totals = defaultdict(int)
-        for result in self.results:
-            if result.detect_mode != detect_mode.play or not result.judge:
-                continue
-            date_key = self._timestamp_text(result.timestamp, "%Y-%m-%d")
-            totals[date_key] += result.judge.notes
-        return totals
+        """日付('%Y-%m-%d')ごとのノーツ数。日付の区切りはautoload_offsetに従う"""
+        with self.storage.lock:
+            return self._get_calendar().notes_by_date()
 
     def _notes_since(self, start_timestamp: int) -> int:
-        total = 0
-        for result in reversed(self.results):
-            if result.timestamp < start_timestamp:
-                break
-            if result.detect_mode == detect_mode.play and result.judge:
-                total += result.judge.notes
-        return total
+        with self.storage.lock:
+            rows = self._rows_between(start_timestamp, None)
+            return self._notes_total(self._get_play_columns(), rows)
 
     def get_mobile_folders_data(self) -> dict:
         """スマホビューのトップ階層を返す。"""
@@ -1561,7 +2040,8 @@ class ResultDatabase:
                             "count": count,
                         }
                     )
-        result_count = sum(1 for r in self.results if r.detect_mode == detect_mode.result)
+        with self.storage.lock:
+            result_count = self._get_calendar().total.play_count
         saved_image_count = len(self._mobile_saved_image_results())
         bpi_best_count = len(self._mobile_bpi_best_items())
         receipt_start = self._mobile_receipt_start_timestamp()
@@ -1612,6 +2092,8 @@ class ResultDatabase:
         }
 
     def _mobile_saved_image_results(self) -> list[tuple[int, OneResult]]:
+        if isinstance(self.storage, PlaylogSegments): # 画像を保存したリザルトのあるセグメントだけを読み込む
+            self._load_segments(self.storage.segments_with_images())
         items = []
         for index, result in enumerate(self.results):
             if result.detect_mode != detect_mode.result:
@@ -1634,11 +2116,15 @@ class ResultDatabase:
             timestamp = int(timestamp_text)
         except (TypeError, ValueError):
             return None
-        if index < 0 or index >= len(self.results):
-            return None
-        result = self.results[index]
-        if result.timestamp != timestamp or result.detect_mode != detect_mode.result:
-            return None
+        # 古いセグメントの読み込みで位置がずれることがあるため、日時で引いて位置は同じ日時のリザルトの区別にだけ使う
+        with self.storage.lock:
+            positions = [
+                i for i in self._positions_between(timestamp, timestamp + 1) # 画像IDの日時はint(timestamp)
+                if self.results[i].detect_mode == detect_mode.result and getattr(self.results[i], "image_path", None)
+            ]
+            if not positions:
+                return None
+            result = self.results[index if index in positions else positions[0]]
         image_path = getattr(result, "image_path", None)
         if not image_path:
             return None
@@ -1748,15 +2234,29 @@ class ResultDatabase:
                 return body
         return None
 
+    def _bests_for_songs(self, songs: List[OneSongInfo]) -> List[OneBestData]:
+        """SongDatabase.query()で引いた譜面の自己ベスト(DBxを含む)。全自己ベストを走査せずにレベル別などの一覧を作る"""
+        bests = self.get_all_best_results()
+        key = (self.best_generation, self.song_database.generation)
+        if self._bests_by_chart_id_key != key:
+            index = defaultdict(list)
+            for best in bests.values():
+                if best.songinfo is not None:
+                    index[best.songinfo.chart_id].append(best)
+            self._bests_by_chart_id = index
+            self._bests_by_chart_id_key = key
+        return [best for song in songs for best in self._bests_by_chart_id.get(song.chart_id, ())]
+
     def get_mobile_level_folder_data(self, level: int, style_text: str | None = None, battle_only: bool = False) -> dict:
         style_value = None
         style_label = ""
         if style_text:
             style_label = style_text.upper()
             style_value = play_style.sp if style_label == "SP" else play_style.dp if style_label == "DP" else None
+        songs = self.song_database.query(level=level, play_style=None if battle_only else style_value)
         bests = [
             best
-            for best in self.get_all_best_results().values()
+            for best in self._bests_for_songs(songs)
             if _to_int_or_none(best.level) == level
             and (best.is_battle if battle_only else not best.is_battle)
             and (style_value is None or best.style == style_value)
@@ -1782,9 +2282,10 @@ class ResultDatabase:
                 "items": [],
                 "notes": 0,
             }
+        songs = self.song_database.query(play_style=play_style.sp, level=level, katate=bool)
         bests = [
             best
-            for best in self.get_all_best_results().values()
+            for best in self._bests_for_songs(songs)
             if best.style == play_style.sp
             and _to_int_or_none(best.level) == level
             and self._mobile_katate_band_for_best(best)
@@ -1814,9 +2315,10 @@ class ResultDatabase:
         if not self._mobile_katate_enabled():
             items = []
         else:
+            songs = self.song_database.query(play_style=play_style.sp, level=level, katate=lambda v: _to_int_or_none(v) == band)
             bests = [
                 best
-                for best in self.get_all_best_results().values()
+                for best in self._bests_for_songs(songs)
                 if best.style == play_style.sp
                 and _to_int_or_none(best.level) == level
                 and _to_int_or_none(self._mobile_katate_band_for_best(best)) == band
@@ -1836,7 +2338,7 @@ class ResultDatabase:
     def get_mobile_history_data(self, limit: int = 200, offset: int = 0) -> dict:
         limit = max(1, min(1000, int(limit or 200)))
         offset = max(0, int(offset or 0))
-        all_results = [r for r in reversed(self.results) if r.detect_mode == detect_mode.result]
+        all_results = self.results_between(mode=detect_mode.result)[::-1]
         page = all_results[offset : offset + limit]
         return {
             "folder": {"id": "history", "label": "PLAY HISTORY"},
@@ -1933,13 +2435,7 @@ class ResultDatabase:
         }
 
     def _collect_mobile_tweet_updates(self, start_time: int) -> str:
-        today_results = []
-        for result in reversed(self.results):
-            if result.detect_mode == detect_mode.result:
-                if result.timestamp >= start_time:
-                    today_results.append(result)
-                else:
-                    break
+        today_results = self.results_between(start_time, None, detect_mode.result)[::-1]
         if not today_results:
             return ""
 
@@ -2039,76 +2535,59 @@ class ResultDatabase:
             return f"☆{level}-{band}"
         return f"☆{level}"
 
-    def _mobile_daily_rows(self) -> list[dict]:
-        notes_by_date = self._notes_by_date()
-        play_counts = defaultdict(int)
-        for result in self.results:
-            if result.detect_mode == detect_mode.result:
-                play_counts[self._timestamp_text(result.timestamp, "%Y-%m-%d")] += 1
-        dates = sorted(set(notes_by_date.keys()) | set(play_counts.keys()), reverse=True)
+    def _mobile_daily_rows(self, month_key: str | None = None) -> list[dict]:
+        with self.storage.lock:
+            days = self._get_calendar().days(month_key)
         return [
             {
                 "date": date_key,
-                "notes": notes_by_date.get(date_key, 0),
-                "play_count": play_counts.get(date_key, 0),
+                "notes": day.notes,
+                "play_count": day.play_count,
+            }
+            for date_key, day in days
+        ]
+
+    @staticmethod
+    def _mobile_monthly_rows(months) -> list[dict]:
+        return [
+            {
+                "month": month_key,
+                "notes": month.notes,
+                "play_count": month.play_count,
+                "day_count": len(month.children),
             }
-            for date_key in dates
+            for month_key, month in months
         ]
 
     def get_mobile_daily_folders_data(self, mode: str = "daily") -> dict:
         mode = (mode or "daily").lower()
-        daily_items = self._mobile_daily_rows()
-        if mode == "monthly":
-            monthly = {}
-            for item in daily_items:
-                key = item["date"][:7]
-                entry = monthly.setdefault(key, {"month": key, "notes": 0, "play_count": 0, "day_count": 0})
-                entry["notes"] += item["notes"]
-                entry["play_count"] += item["play_count"]
-                entry["day_count"] += 1
-            items = [monthly[key] for key in sorted(monthly.keys(), reverse=True)]
-            return {
-                "folder": {"id": "daily", "label": "DAILY LOG"},
-                "mode": "monthly",
-                "total_notes": sum(item["notes"] for item in daily_items),
-                "items": items,
-            }
-        if mode == "yearly":
-            yearly = {}
-            for item in daily_items:
-                key = item["date"][:4]
-                entry = yearly.setdefault(key, {"year": key, "notes": 0, "play_count": 0, "month_count": 0})
-                entry["notes"] += item["notes"]
-                entry["play_count"] += item["play_count"]
-            for entry in yearly.values():
-                entry["month_count"] = len(
+        with self.storage.lock:
+            calendar = self._get_calendar()
+            total_notes = calendar.total.notes
+            if mode == "monthly":
+                items = self._mobile_monthly_rows(calendar.months())
+            elif mode == "yearly":
+                items = [
                     {
-                        item["date"][:7]
-                        for item in daily_items
-                        if item["date"].startswith(entry["year"])
+                        "year": year_key,
+                        "notes": year.notes,
+                        "play_count": year.play_count,
+                        "month_count": len(year.children),
                     }
-                )
-            items = [yearly[key] for key in sorted(yearly.keys(), reverse=True)]
-            return {
-                "folder": {"id": "daily", "label": "DAILY LOG"},
-                "mode": "yearly",
-                "total_notes": sum(item["notes"] for item in daily_items),
-                "items": items,
-            }
-        items = daily_items
+                    for year_key, year in calendar.years()
+                ]
+            else:
+                mode = "daily"
+                items = self._mobile_daily_rows()
         return {
             "folder": {"id": "daily", "label": "DAILY LOG"},
-            "mode": "daily",
-            "total_notes": sum(item["notes"] for item in daily_items),
+            "mode": mode,
+            "total_notes": total_notes,
             "items": items,
         }
 
     def get_mobile_monthly_daily_folders_data(self, month_key: str) -> dict:
-        items = [
-            item
-            for item in self._mobile_daily_rows()
-            if item["date"].startswith(f"{month_key}-")
-        ]
+        items = self._mobile_daily_rows(month_key)
         return {
             "folder": {"id": f"daily/month/{month_key}", "label": month_key},
             "mode": "daily",
@@ -2117,33 +2596,36 @@ class ResultDatabase:
         }
 
     def get_mobile_yearly_month_folders_data(self, year_key: str) -> dict:
-        daily_items = [
-            item
-            for item in self._mobile_daily_rows()
-            if item["date"].startswith(f"{year_key}-")
-        ]
-        monthly = {}
-        for item in daily_items:
-            key = item["date"][:7]
-            entry = monthly.setdefault(key, {"month": key, "notes": 0, "play_count": 0, "day_count": 0})
-            entry["notes"] += item["notes"]
-            entry["play_count"] += item["play_count"]
-            entry["day_count"] += 1
-        items = [monthly[key] for key in sorted(monthly.keys(), reverse=True)]
+        with self.storage.lock:
+            calendar = self._get_calendar()
+            year = calendar.total.children.get(year_key)
+            items = self._mobile_monthly_rows(calendar.months(year_key))
         return {
             "folder": {"id": f"daily/year/{year_key}", "label": year_key},
             "mode": "monthly",
-            "total_notes": sum(item["notes"] for item in daily_items),
+            "total_notes": year.notes if year else 0,
             "items": items,
         }
 
+    def _day_result_indices(self, date_key: str) -> list[int]:
+        """日付date_keyにリザルト画面から登録したリザルトの位置。storage.lockを取った状態で呼ぶこと"""
+        calendar = self._get_calendar()
+        day = calendar.day(date_key)
+        if day is None or day.play_count == 0:
+            return []
+        day_range = calendar.day_range(date_key)
+        if day_range is None: # 日時の無いリザルト
+            cols = self._get_play_columns()
+            return [int(i) for i in np.flatnonzero(cols.result) if calendar.day_key(cols.timestamp[i]) == date_key]
+        rows = self._rows_between(*day_range) # 古いセグメントを読み込むことがあるため列より先に引く
+        cols = self._get_play_columns()
+        return [int(i) for i in rows[cols.result[rows]]]
+
     def get_mobile_daily_log_data(self, date_key: str) -> dict:
-        items = [
-            r for r in reversed(self.results)
-            if r.detect_mode == detect_mode.result
-            and self._timestamp_text(r.timestamp, "%Y-%m-%d") == date_key
-        ]
-        notes = self._notes_by_date().get(date_key, 0)
+        with self.storage.lock:
+            items = [self.results[i] for i in reversed(self._day_result_indices(date_key))]
+            day = self._get_calendar().day(date_key)
+            notes = day.notes if day else 0
         return {
             "folder": {"id": f"daily/{date_key}", "label": date_key},
             "notes": notes,
@@ -1,5 +1,4 @@
 """ライバルスコアデータの取得・管理モジュール"""
-import bz2
 import csv
 import io
 import os
@@ -13,6 +12,7 @@ from PySide6.QtCore import QObject, QThread, Signal
 
 from src.classes import clear_lamp
 from src.funcs import convert_lamp
+from src import file_codec
 from src.logger import get_logger
 logger = get_logger(__name__)
 
@@ -207,7 +207,7 @@ class RivalManager(QObject):
     def load_cache(self):
         """キャッシュからライバルデータを読み込み、即座に反映する"""
         try:
-            with bz2.BZ2File(self.CACHE_PATH, 'rb') as f:
+            with file_codec.open_read(self.CACHE_PATH) as f:
                 self.rivals = pickle.load(f)
             rival_count = len([r for r in self.rivals if not r.error])
             logger.info(f"ライバルキャッシュを読み込みました ({rival_count}人)")
@@ -219,7 +219,7 @@ class RivalManager(QObject):
         """ライバルデータをキャッシュに保存する"""
         try:
             os.makedirs('out', exist_ok=True)
-            with bz2.BZ2File(self.CACHE_PATH, 'wb', compresslevel=9) as f:
+            with file_codec.write_file(self.CACHE_PATH) as f:
                 pickle.dump(self.rivals, f)
             logger.info("ライバルキャッシュを保存しました")
         except Exception:
@@ -13,6 +13,7 @@ from PySide6.QtGui import QColor, QBrush, QPainter, QFont, QPen
 from datetime import datetime
 from typing import Dict, List, Optional
 import traceback
+import copy
 
 from src.result import OneResult, DetailedResult, OneBestData
 from src.result_database import ResultDatabase
@@ -136,6 +137,7 @@ class ScoreViewer(QMainWindow):
         self.result_database = result_database
         self.rival_manager = rival_manager
         self.scores: Dict[str, OneBestData] = {}  # key: (title, style, difficulty, battle)
+        self._scores_generation: Optional[int] = None  # scoresを作った時点のresult_database.best_generation
         self.current_selected_score: Optional[OneBestData] = None  # 現在選択中の譜面
         self._rival_win_filter: Optional[str] = None  # "my_wins", "rival_wins", "draws", or None
         self._rival_win_filter_name: str = ""  # フィルタ対象のライバル名
@@ -505,20 +507,28 @@ class ScoreViewer(QMainWindow):
     def load_scores(self):
         """全スコアを読み込んで集計。result_database.get_all_best_results()を使用。"""
         try:
+            # 前回の読み込みから自己ベストに変化が無ければ作り直さない
+            if self.result_database and self.scores and self._scores_generation == self.result_database.best_generation:
+                return
             self.scores.clear()
+            self._scores_generation = None
 
-            if not self.result_database or not self.result_database.results:
-                logger.warning("プレーログが空です")
+            if not self.result_database:
                 return
 
             # result_databaseの共通処理で全譜面の自己べを取得
+            generation = self.result_database.best_generation
             all_bests = self.result_database.get_all_best_results()
+            if not all_bests: # 読み込んでいない古いリザルトの分も含むため、resultsではなく自己べの有無で判定する
+                logger.warning("プレーログが空です")
+                return
 
             # BattleはDBxとして別譜面扱いにする。通常プレーのNone/Falseだけマージする。
             for (title, style, diff, battle), best in all_bests.items():
                 key = (title, style, diff, bool(battle))
                 if key not in self.scores:
-                    self.scores[key] = best
+                    # マージで書き換えるため、result_database側のスナップショットとは別のオブジェクトにする
+                    self.scores[key] = copy.copy(best)
                 else:
                     existing = self.scores[key]
                     # ベストスコアが高い方を採用
@@ -534,6 +544,7 @@ class ScoreViewer(QMainWindow):
                     if best.last_result and (not existing.last_result or best.last_result.timestamp > existing.last_result.timestamp):
                         existing.last_result = best.last_result
 
+            self._scores_generation = generation
             logger.info(f"{len(self.scores)}件の譜面データを読み込みました")
 
         except Exception as e:
@@ -1082,8 +1093,12 @@ class ScoreViewer(QMainWindow):
                 self.playlog_title_label.setText(chart_info)
             
             # 選択中の曲のプレーログをフィルタ（全てのdetect_modeを対象）
+            # 譜面の索引から引く(読み込んでいない古いリザルトもその譜面の分だけ読み込まれる)
             playlogs = []
-            for result in self.result_database.results:
+            for detail in self.result_database.search(
+                title=score.title, style=score.style, difficulty=score.difficulty, battle=bool(score.is_battle)
+            ):
+                result = detail.result
                 result_battle = result.option.battle if result.option else False
                 if (result.title == score.title and 
                     result.play_style == score.style and 
@@ -1183,9 +1198,7 @@ class ScoreViewer(QMainWindow):
             
             if reply == QMessageBox.Yes:
                 # プレーログを削除
-                if result_to_delete in self.result_database.results:
-                    self.result_database.results.remove(result_to_delete)
-                    
+                if self.result_database.remove_result(result_to_delete):
                     # データベースを保存
                     self.result_database.save()
                     
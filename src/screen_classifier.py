@@ -0,0 +1,73 @@
+"""画面判定(is_result/is_select/is_option/is_play)を1回のバッチ計算で行う"""
+
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from src.classes import detect_mode, play_mode
+from src.define import *
+from src.fast_imagehash import BatchAverageHasher, hex_to_bits
+
+# (判定名, 矩形, 目標ハッシュ, 閾値)。ScreenReader.is_*と同じ内容
+_CHECKS = [
+    ('result', PosResultScreen.IS_RESULT_L, PosResultScreen.HASH_RESULT, 10),
+    ('result', PosResultScreen.IS_RESULT_R, PosResultScreen.HASH_RESULT, 10),
+    ('select', PosMusicSelectScreen.IS_SELECT_1P, PosMusicSelectScreen.HASH_SELECT, 10),
+    ('select', PosMusicSelectScreen.IS_SELECT_2P, PosMusicSelectScreen.HASH_SELECT, 10),
+    ('select', PosMusicSelectScreen.IS_SELECT_KB_1P, PosMusicSelectScreen.HASH_SELECT_KB, 10),
+    ('select', PosMusicSelectScreen.IS_SELECT_KB_2P, PosMusicSelectScreen.HASH_SELECT_KB, 10),
+    ('option', PosOptionScreen.IS_OPTION_AREA, PosOptionScreen.IS_OPTION_HASH, 5),
+    ('option', PosOptionScreen.IS_OPTION_AREA, PosOptionScreen.IS_OPTION_HASH_DP, 5),
+] + [
+    (mode, PosIsPlay.get(mode), PosIsPlayHash.HASH, 10) for mode in play_mode
+]
+
+_BOXES = list(dict.fromkeys(box for _, box, _, _ in _CHECKS))
+'''重複を除いた判定領域。ハッシュは領域ごとに1回だけ計算する'''
+_CHECK_BOX = np.array([_BOXES.index(box) for _, box, _, _ in _CHECKS])
+_CHECK_TARGET = np.stack([hex_to_bits(h) for _, _, h, _ in _CHECKS])
+_CHECK_THRESHOLD = np.array([th for _, _, _, th in _CHECKS])
+_CHECK_NAMES = [name for name, _, _, _ in _CHECKS]
+_RESULT = np.array([name == 'result' for name in _CHECK_NAMES])
+_SELECT = np.array([name == 'select' for name in _CHECK_NAMES])
+_OPTION = np.array([name == 'option' for name in _CHECK_NAMES])
+_PLAY = [(i, name) for i, name in enumerate(_CHECK_NAMES) if isinstance(name, play_mode)]
+
+
+class ScreenClassifier:
+    """フレームのnumpy配列から画面モードを判定するクラス。
+
+    detect_current_mode()と同じ優先順(result > select > option > play > init)で、
+    ScreenReader.is_*と同じ結果を返す。縮小フレームにも対応する。
+    """
+    def __init__(self):
+        self._hashers: Dict[Tuple[int, int], BatchAverageHasher] = {}
+
+    def _get_hasher(self, np_value: np.ndarray) -> BatchAverageHasher:
+        shape = np_value.shape[:2]
+        hasher = self._hashers.get(shape)
+        if hasher is None:
+            scale = shape[1] / CAPTURE_SIZE[0]
+            hasher = BatchAverageHasher([scale_box(box, scale) for box in _BOXES])
+            self._hashers[shape] = hasher
+        return hasher
+
+    def matches(self, np_value: np.ndarray) -> np.ndarray:
+        """全判定の成否をbool配列で返す(並びは_CHECKS)"""
+        bits = self._get_hasher(np_value).hash_bits(np_value)
+        distances = (bits[_CHECK_BOX] != _CHECK_TARGET).sum(axis=1)
+        return distances < _CHECK_THRESHOLD
+
+    def classify(self, np_value: np.ndarray) -> Tuple[detect_mode, Optional[play_mode]]:
+        """画面モードと、プレー画面ならそのplay_modeを返す"""
+        hit = self.matches(np_value)
+        if hit[_RESULT].any():
+            return detect_mode.result, None
+        if hit[_SELECT].any():
+            return detect_mode.select, None
+        if hit[_OPTION].any():
+            return detect_mode.option, None
+        for i, mode in _PLAY:
+            if hit[i]:
+                return detect_mode.play, mode
+        return detect_mode.init, None
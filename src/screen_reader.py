@@ -4,6 +4,7 @@ from PIL import Image
 import numpy as np
 import imagehash
 import copy
+import zlib
 
 import cv2
 
@@ -15,6 +16,10 @@ from define import Define as define
 from src.classes import *
 from src.result import *
 from src.define import *
+from src.frame_gate import FrameGate
+from src.recognition_cache import RecognitionCache
+from src.screen_classifier import ScreenClassifier
+from src.fast_imagehash import average_hash_bits, hex_to_bits, phash_bits, to_luma
 from src.logger import get_logger
 logger = get_logger(__name__)
 
@@ -25,11 +30,87 @@ def _get_attr(obj, *names):
             return getattr(obj, name)
     return None
 
+_JUDGE_UNKNOWN = 10
+_JUDGE_BLANK = 11
+_JUDGE_CHARS = [str(i) for i in range(10)] + ['?', '']
+'''decode_judge_cellsのコード -> 文字'''
+_JUDGE_LUT = np.full(PosPlayJudge.CELL * PosPlayJudge.CELL + 1, _JUDGE_UNKNOWN, dtype=np.int8)
+'''閾値を超えた画素数 -> 数字のコード'''
+_JUDGE_LUT[0] = _JUDGE_BLANK
+for _digit, _val in reversed(list(enumerate(judge_digits))):
+    _JUDGE_LUT[_val // 255] = _digit # 6と9は合計値が同じなので6を入れておき、decode時に判別する
+
+def decode_judge_cells(cells:np.ndarray) -> np.ndarray:
+    '''(..., 11, 11)の判定数字セル群を数字のコード(0-9, 10='?', 11=空白)に変換する'''
+    mask = cells > 100
+    codes = _JUDGE_LUT[mask.sum(axis=(-2, -1))]
+    # 6,9がひっくり返しただけで画素数が同じなので、左下寄りの画素で判別する
+    six_nine = codes == 6
+    codes[six_nine] = np.where(mask[..., 8, 0][six_nine], 6, 9)
+    return codes
+
+_RESULT_JUDGE_ITEMS = ['pg', 'gr', 'gd', 'bd', 'pr']
+'''リザルト画面から読む判定(cbはリザルトの値から計算する)'''
+_RESULT_DIGIT_HASHES = np.stack([hex_to_bits(h) for h in hash_digits])
+'''hash_digitsを(10, 64)のbool配列にしたもの'''
+
+def _build_option_probes():
+    '''オプション画面の読み取り座標表を作る。
+
+    Returns:
+        dict: 項目 -> 座標表のインデックス。項目はPosOption.get()の引数tuple、またはチェックボックス名
+        np.ndarray: y座標
+        np.ndarray: x座標
+        np.ndarray: 読むチャンネル(ハイライトはR、チェックボックスはB)
+        np.ndarray: チェックボックスかどうか(チェックボックスは暗いとON、それ以外は明るいと選択中)
+    '''
+    probes = []
+    for style in play_style:
+        for i in range(5):
+            if style == play_style.dp:
+                probes.append(((style, option_arrange(i), True), PosOption.get(style, option_arrange(i), is_left=True)))
+                probes.append(((style, option_arrange(i), False), PosOption.get(style, option_arrange(i), is_left=False)))
+            else:
+                probes.append(((style, option_arrange(i)), PosOption.get(style, option_arrange(i))))
+            probes.append(((style, option_gauge(i)), PosOption.get(style, option_gauge(i))))
+            probes.append(((style, option_assist(i)), PosOption.get(style, option_assist(i))))
+    for key in ((play_style.dp, option_arrange.sync_ran), (play_style.dp, option_arrange.symm_ran), (play_style.dp, option_flip.flip)):
+        probes.append((key, PosOption.get(*key)))
+    checkboxes = [
+        ('hran', PosOptionScreen.CHECKBOX_HRAN),
+        ('battle', PosOptionScreen.CHECKBOX_BATTLE),
+        ('allscratch', PosOptionScreen.CHECKBOX_ALL_SCRATCH),
+        ('regularspeed', PosOptionScreen.CHECKBOX_REGUL_SPEED),
+    ]
+    index = {key:i for i, (key, _) in enumerate(probes + checkboxes)}
+    pos = np.array([xy for _, xy in probes + checkboxes])
+    is_checkbox = np.array([False] * len(probes) + [True] * len(checkboxes))
+    return index, pos[:, 1], pos[:, 0], np.where(is_checkbox, 2, 0), is_checkbox
+
+_OPTION_INDEX, _OPTION_Y, _OPTION_X, _OPTION_CH, _OPTION_IS_CHECKBOX = _build_option_probes()
+_OPTION_STYLE_HASH = hex_to_bits(PosOptionScreen.STYLE_HASH)
+
 class ScreenReader:
     """ゲーム画面を読むためのクラス。ループの先頭でupdate_screenを叩いてから使うこと。"""
     def __init__(self):
-        self.songinfo = SongDatabase()
+        self.songinfo = get_song_database()
         self.screen = None
+        self.screen_timestamp = None
+        '''screenのキャプチャ時刻(time.monotonic())'''
+        self.screen_scale = 1.0
+        '''screenの基準解像度(1920x1080)に対する倍率'''
+        self.frame_gate = FrameGate({
+            detect_mode.result: PosFrameGate.RESULT,
+            detect_mode.select: [define.musicselect_trimarea_np],
+            detect_mode.option: PosFrameGate.OPTION,
+        })
+        '''画面が変わっていないフレームの認識を省略するためのゲート'''
+        self.classifier = ScreenClassifier()
+        '''is_result/is_select/is_option/is_playをまとめて行う判定器'''
+        self.recognition_cache = RecognitionCache()
+        '''リザルト/選曲画面の認識結果のキャッシュ。キーは画面モードと認識領域の指紋'''
+        self._option_cache = None
+        '''(オプション画面の読み取り画素の指紋, CurrentOption)'''
         self.last_select_title = None
         '''最後に選曲画面で認識した曲名'''
         self.last_select_difficulty = None
@@ -39,6 +120,7 @@ class ScreenReader:
 
     def update_screen_from_file(self, _file:str):
         self.screen = open_screenimage(_file)
+        self.screen_scale = 1.0
         # ライバル欄をカットした画像だった場合の対応
         if 'cut2p' in _file or 'cut1p' in _file:
             canvas = Image.new("RGB", (1920,1080), (0, 0, 0))
@@ -63,9 +145,28 @@ class ScreenReader:
                 self.screen.original = canvas
                 self.screen.np_value = canvas_array
 
-    def update_screen(self, screen):
-        '''OBSManagerから受け取ったscreenをセットする'''
+    def update_screen(self, screen, timestamp:float=None):
+        '''OBSManagerから受け取ったscreenをセットする
+
+        Args:
+            screen: infnotebook.capture.Screen
+            timestamp: キャプチャ時刻(time.monotonic())。不明ならNone
+        '''
         self.screen = screen
+        self.screen_timestamp = timestamp
+        self.screen_scale = screen.np_value.shape[1] / CAPTURE_SIZE[0] if screen is not None else 1.0
+
+    def is_full_resolution(self) -> bool:
+        '''現在の画面が等倍(1920x1080)かどうか。縮小フレームでは画面判定(is_*)のみ行える。'''
+        return self.screen_scale == 1.0
+
+    def is_changed(self, mode:detect_mode) -> bool:
+        '''modeの認識対象領域が前フレームから変化したかどうか。Falseなら認識を省略してよい。'''
+        return self.frame_gate.check(mode, self.screen.np_value)
+
+    def _crop_for_detect(self, box:tuple):
+        '''画面判定用の切り出し。縮小フレームの場合は座標を変換する。'''
+        return self.screen.original.crop(scale_box(box, self.screen_scale))
 
     def save_image(self, dst):
         '''最後に読み込んだゲーム画面を保存'''
@@ -76,38 +177,63 @@ class ScreenReader:
             return False
 
     def read_judge_from_result(self, side:result_side) -> Judge:
-        """リザルト画面から判定部分を読み取る"""
-        img = self.screen.original
+        """リザルト画面から判定部分を読み取る。
+
+        判定ブロック全体を一度だけ2値化し、全20桁のphashとhash_digitsとの距離をまとめて計算する。
+        結果は1桁ずつphashを取る従来版(misc/legacy_screen_reader.pyのread_judge_from_result_phash)と同じになる。
+        """
+        rows, digits = len(_RESULT_JUDGE_ITEMS), 4
+        x0, y0, _, _ = PosResultJudge.get(side, _RESULT_JUDGE_ITEMS[0], 0)
+        _, _, x1, y1 = PosResultJudge.get(side, _RESULT_JUDGE_ITEMS[-1], digits - 1)
+        mono = to_luma(self.screen.np_value[y0:y1, x0:x1, :3]) > 220
+        s0, s1 = mono.strides
+        cells = np.lib.stride_tricks.as_strided(
+            mono,
+            shape=(rows, digits, PosResultJudge.H, PosResultJudge.W),
+            strides=(PosResultJudge.PITCH * s0, PosResultJudge.PITCH * s1, s0, s1),
+            writeable=False,
+        ).reshape(rows * digits, PosResultJudge.H, PosResultJudge.W)
+        bits = phash_bits(cells.astype(np.uint8) * 255)
+        hit = (bits[:, None, :] != _RESULT_DIGIT_HASHES[None, :, :]).sum(axis=2) < 10
+        matched = hit.any(axis=1)
+        codes = hit.argmax(axis=1) # 従来通り、閾値を下回った最初の数字を採用
+        # 0と8はphashでほぼ区別できないので白画素数で判別する
+        zero_eight = matched & ((codes == 0) | (codes == 8))
+        codes[zero_eight] = np.where(cells[zero_eight].sum(axis=(1, 2)) > 215, 8, codes[zero_eight])
         out = []
-        # for item in ['pg', 'gr', 'gd', 'bd', 'pr', 'cb']:
-        for item in ['pg', 'gr', 'gd', 'bd', 'pr']:
-            line = ''
-            for idx in range(4):
-                digit = img.crop(PosResultJudge.get(side, item, idx))
-
-                fn = lambda x: 255 if x > 220 else 0
-                digit_mono = digit.convert('L').point(fn, mode='1')
-                # digit.save(f"hoge_{['pg', 'gr', 'gd', 'bd', 'pr', 'cb'].index(item)}{item}_{idx}.png")
-                hash = imagehash.phash(digit_mono)
-                # print(item, idx, hash)
-                for i,h in enumerate(hash_digits):
-                    hash_target = imagehash.hex_to_hash(h)
-                    if abs(hash - hash_target) < 10:
-                        if i in (0,8): # 0:198, 
-                            d_sum = np.sum(np.array(digit_mono))
-                            if d_sum > 215:
-                                line += '8'
-                            else:
-                                line += str(i)
-                        else:
-                            line += str(i)
-                        break
-            out.append(line)
+        for line, ok in zip(codes.reshape(rows, digits).tolist(), matched.reshape(rows, digits).tolist()):
+            out.append(''.join(str(c) for c, m in zip(line, ok) if m))
         out.append('0')
-        ret = Judge.from_list(out)
+        return Judge.from_list(out)
+
+    def _recognition_key(self, mode:detect_mode) -> tuple:
+        '''認識結果キャッシュのキー。認識に使う領域(FrameGateの監視領域)の指紋'''
+        np_value = self.screen.np_value
+        return (mode, np_value.shape, self.frame_gate.fingerprint(mode, np_value))
+
+    @staticmethod
+    def _copy_detailed_result(detailed_result:DetailedResult) -> DetailedResult:
+        '''キャッシュ用の複製。songinfoは曲情報DBのものをそのまま共有する'''
+        return copy.deepcopy(detailed_result, {id(detailed_result.songinfo): detailed_result.songinfo})
+
+    def _read_cached(self, mode:detect_mode, reader) -> DetailedResult:
+        '''同じ画面の認識結果があればその複製を返し、無ければreaderで認識してキャッシュする'''
+        key = self._recognition_key(mode)
+        cached = self.recognition_cache.get(key)
+        if cached is not None:
+            ret = self._copy_detailed_result(cached)
+            ret.result.timestamp = int(datetime.datetime.now().timestamp())
+            return ret
+        ret = reader()
+        if ret:
+            self.recognition_cache.put(key, self._copy_detailed_result(ret))
         return ret
 
     def read_result_screen(self) -> DetailedResult:
+        """リザルト画面を読み取ってDetailedResultを返す。同じ画面なら前回の認識結果を返す。"""
+        return self._read_cached(detect_mode.result, self._recognize_result_screen)
+
+    def _recognize_result_screen(self) -> DetailedResult:
         """pngファイルを入力してDetailedResultを返す"""
         ret = None
         try:
@@ -177,6 +303,16 @@ class ScreenReader:
         return ret
 
     def read_music_select_screen(self) -> DetailedResult:
+        """選曲画面を読み取ってDetailedResultを返す。同じ画面なら前回の認識結果を返す。"""
+        ret = self._read_cached(detect_mode.select, self._recognize_music_select_screen)
+        if ret:
+            # 最後に認識したものを記憶
+            self.last_select_title = ret.result.title
+            self.last_select_difficulty = ret.result.difficulty
+            self.last_select_style = ret.result.play_style
+        return ret
+
+    def _recognize_music_select_screen(self) -> DetailedResult:
         """pngファイルを入力してDetailedResultを返す"""
         ret = None
         np_value = self.screen.np_value[define.musicselect_trimarea_np]
@@ -214,6 +350,12 @@ class ScreenReader:
                 )
             chart_id = calc_chart_id(title=title, play_style=style, difficulty=diff)
             songinfo = self.songinfo.search(chart_id=chart_id)
+            if songinfo is None and style is not None and diff is not None:
+                # 曲名の読み違いを、曲名のあいまい検索で登録済みの曲名に直す
+                songinfo, confidence = self.songinfo.search_fuzzy(title, style, diff)
+                if songinfo is not None and songinfo.title != title:
+                    logger.info(f"music select title corrected: {title} -> {songinfo.title} (confidence={confidence:.2f})")
+                    title = songinfo.title
             timestamp = int(datetime.datetime.now().timestamp())
             option = PlayOption(None)
             option.valid = False
@@ -221,11 +363,6 @@ class ScreenReader:
                                judge=None,score=score,bp=bp,detect_mode=detect_mode.select)
             ret = DetailedResult(songinfo=songinfo, result=result)
             ret.music_select_difficulty_confirmed = is_difficulty_confirmed
-
-            # 最後に認識したものを記憶
-            self.last_select_title = title
-            self.last_select_difficulty = diff
-            self.last_select_style = style
         return ret
     
     def read_play_screen(self, judge:Judge) -> OneResult:
@@ -245,95 +382,74 @@ class ScreenReader:
         return result
     
     def read_option_screen(self) -> CurrentOption:
-        '''オプション画面を読み取り、現在のオプションを取得'''
-        img = self.screen.original
-        ret = CurrentOption()
-        ret.valid = True
+        '''オプション画面を読み取り、現在のオプションを取得。
 
-        def read_style() -> play_style:
-            area = img.crop(PosOptionScreen.STYLE_AREA)
-            tmp = imagehash.average_hash(area)
-            hash_target = imagehash.hex_to_hash(PosOptionScreen.STYLE_HASH)
-            if (hash_target - tmp) < 10:
-                return play_style.dp
-            else:
-                return play_style.sp
-            
-        def read_option(is_hran:bool, style:play_style) -> tuple:
-            arrange = None
-            gauge = None
-            assist = None
-            flip = None
-            if style == play_style.sp:
-                for i in range(5):
-                    tmp_arrange = option_arrange(i)
-                    tmp_gauge = option_gauge(i)
-                    tmp_assist = option_assist(i)
-                    if img.getpixel(PosOption.get(style, tmp_arrange))[0] > 100:
-                        arrange = str(tmp_arrange)
-                        if tmp_arrange == option_arrange.s_random and is_hran:
-                            arrange = 'H-RANDOM'
-                    if img.getpixel(PosOption.get(style, tmp_gauge))[0] > 100:
-                        gauge = tmp_gauge
-                    if img.getpixel(PosOption.get(style, tmp_assist))[0] > 100:
-                        assist = tmp_assist
-            else: # DP
-                left_arrange = None
-                right_arrange = None
-                if img.getpixel(PosOption.get(style, option_arrange.sync_ran))[0] > 100:
-                    arrange = str(option_arrange.sync_ran)
-                elif img.getpixel(PosOption.get(style, option_arrange.symm_ran))[0] > 100:
-                    arrange = str(option_arrange.symm_ran)
-                else:
-                    for i in range(5): # 左右レーン
-                        tmp_arrange = option_arrange(i)
-                        if img.getpixel(PosOption.get(style, tmp_arrange, is_left=True))[0] > 100:
-                            left_arrange = str(tmp_arrange)
-                            if tmp_arrange == option_arrange.s_random and is_hran:
-                                left_arrange = 'H-RANDOM'
-                        if img.getpixel(PosOption.get(style, tmp_arrange, is_left=False))[0] > 100:
-                            right_arrange = str(tmp_arrange)
-                            if tmp_arrange == option_arrange.s_random and is_hran:
-                                right_arrange = 'H-RANDOM'
-                    arrange = f'{left_arrange} / {right_arrange}'
-                for i in range(5): # ゲージ、アシスト
-                    tmp_gauge = option_gauge(i)
-                    tmp_assist = option_assist(i)
-                    if img.getpixel(PosOption.get(style, tmp_gauge))[0] > 100:
-                        gauge = tmp_gauge
-                    if img.getpixel(PosOption.get(style, tmp_assist))[0] > 100:
-                        assist = tmp_assist
-                if img.getpixel(PosOption.get(style, option_flip(1)))[0] > 100:
-                    flip = 'FLIP'
-            # print(arrange, gauge, assist, flip)
-            return (arrange, gauge, assist, flip)
-
-        def read_hran() -> bool:
-            '''H乱かどうか'''
-            return img.getpixel(PosOptionScreen.CHECKBOX_HRAN)[-1] < 100
-
-        def read_battle() -> bool:
-            '''Battleかどうか'''
-            return img.getpixel(PosOptionScreen.CHECKBOX_BATTLE)[-1] < 100
-
-        def read_allscratch() -> bool:
-            '''ALL-SCRATCHかどうか'''
-            return img.getpixel(PosOptionScreen.CHECKBOX_ALL_SCRATCH)[-1] < 100
-
-        def read_regularspeed() -> bool:
-            '''REGUL-SPEEDかどうか'''
-            return img.getpixel(PosOptionScreen.CHECKBOX_REGUL_SPEED)[-1] < 100
-
-        ret.play_style = read_style()
-        is_hran = read_hran()
-        ret.arrange, ret.option_gauge, ret.option_assist, ret.flip = read_option(is_hran, ret.play_style)
-        if ret.play_style == play_style.dp: # SPを除外しておくことで、灰色になる場合をケアしないようにする
-            ret.battle = read_battle()
-        ret.allscratch = read_allscratch()
-        ret.regularspeed = read_regularspeed()
+        全項目の画素を座標表から1回のfancy indexで読む。
+        読み取った画素とSP/DP判定領域が前回と同じなら、前回の結果を返す。
+        '''
+        np_value = self.screen.np_value
+        values = np_value[_OPTION_Y, _OPTION_X, _OPTION_CH]
+        x0, y0, x1, y1 = PosOptionScreen.STYLE_AREA
+        style_area = np_value[y0:y1, x0:x1, :3]
+        # 読み取り結果はこの2つだけで決まるので、そのまま指紋にする
+        key = (values.tobytes(), zlib.crc32(np.ascontiguousarray(style_area)))
+        if self._option_cache is not None and self._option_cache[0] == key:
+            return copy.deepcopy(self._option_cache[1])
+
+        lit = np.where(_OPTION_IS_CHECKBOX, values < 100, values > 100).tolist()
+        def is_lit(key) -> bool:
+            return lit[_OPTION_INDEX[key]]
 
+        ret = CurrentOption()
+        ret.valid = True
+        style_bits = average_hash_bits(style_area[None])[0]
+        style = play_style.dp if (style_bits != _OPTION_STYLE_HASH).sum() < 10 else play_style.sp
+        is_hran = is_lit('hran')
+
+        def arrange_str(item:option_arrange) -> str:
+            if item == option_arrange.s_random and is_hran:
+                return 'H-RANDOM'
+            return str(item)
+
+        arrange = None
+        gauge = None
+        assist = None
+        flip = None
+        if style == play_style.sp:
+            for i in range(5):
+                if is_lit((style, option_arrange(i))):
+                    arrange = arrange_str(option_arrange(i))
+        elif is_lit((style, option_arrange.sync_ran)):
+            arrange = str(option_arrange.sync_ran)
+        elif is_lit((style, option_arrange.symm_ran)):
+            arrange = str(option_arrange.symm_ran)
+        else: # 左右レーン
+            left_arrange = None
+            right_arrange = None
+            for i in range(5):
+                if is_lit((style, option_arrange(i), True)):
+                    left_arrange = arrange_str(option_arrange(i))
+                if is_lit((style, option_arrange(i), False)):
+                    right_arrange = arrange_str(option_arrange(i))
+            arrange = f'{left_arrange} / {right_arrange}'
+        for i in range(5): # ゲージ、アシスト
+            if is_lit((style, option_gauge(i))):
+                gauge = option_gauge(i)
+            if is_lit((style, option_assist(i))):
+                assist = option_assist(i)
+        if style == play_style.dp and is_lit((style, option_flip.flip)):
+            flip = 'FLIP'
+
+        ret.play_style = style
+        ret.arrange, ret.option_gauge, ret.option_assist, ret.flip = arrange, gauge, assist, flip
+        if style == play_style.dp: # SPを除外しておくことで、灰色になる場合をケアしないようにする
+            ret.battle = is_lit('battle')
+        ret.allscratch = is_lit('allscratch')
+        ret.regularspeed = is_lit('regularspeed')
+
+        self._option_cache = (key, copy.deepcopy(ret))
         return ret
-        
+
     def get_judge_from_play_screen(self, mode:play_mode):
         """プレー画面から判定を取得"""
         try:
@@ -343,61 +459,42 @@ class ScreenReader:
             print(traceback.format_exc())
             return None
 
-    def get_judge_img(self, playside:play_mode):
-        '''判定部分を切り出す'''
-        img = self.screen.original
-        # 判定内訳部分のみを切り取る
-        sc = img.crop(PosPlayJudge.get(playside))
-        d = []
-        for j in range(6): # pg～prの5つ
-            tmp_sec = []
-            for i in range(4): # 4文字
-                W = 11
-                H = 11
-                DSEPA = 3
-                HSEPA = 5
-                sx = i*(W+DSEPA)
-                ex = sx+W
-                sy = j*(H+HSEPA)
-                ey = sy+H
-                tmp = np.array(sc.crop((sx,sy,ex,ey)))
-                tmp_sec.append(tmp)
-            d.append(tmp_sec)
-        return np.array(sc), d
+    def get_judge_cells(self, playside:play_mode) -> np.ndarray:
+        '''判定部分の青チャンネルを(行, 桁, 11, 11)のビューとして返す(コピーしない)'''
+        x, y, ex, ey = PosPlayJudge.get(playside)
+        area = self.screen.np_value[y:ey, x:ex, 2]
+        if area.shape != (ey - y, ex - x):
+            raise ValueError(f'judge area is out of frame: {playside}')
+        s0, s1 = area.strides
+        return np.lib.stride_tricks.as_strided(
+            area,
+            shape=(PosPlayJudge.ROWS, PosPlayJudge.DIGITS, PosPlayJudge.CELL, PosPlayJudge.CELL),
+            strides=(PosPlayJudge.PITCH_Y * s0, PosPlayJudge.PITCH_X * s1, s0, s1),
+            writeable=False,
+        )
 
     def detect_judge(self, playside):
         '''プレー画面から判定内訳を取得'''
-        sc,digits = self.get_judge_img(playside)
-        ret = []
-        for jj in digits: # 各判定、ピカグレー>POORの順
-            line = ''
-            for d in jj:
-                dd = d[:,:,2]
-                dd = (dd>100)*255
-                val = dd.sum()
-                tmp = '?'
-                if val == 0:
-                    tmp  = '' # 従来スペースを入れていたが、消しても動く?
-                elif val in judge_digits:
-                    if val == judge_digits[6]: # 6,9がひっくり返しただけで合計値が同じなのでケア
-                        if dd[8,0] == 0:
-                            tmp = '9'
-                        else:
-                            tmp = '6'
-                    else:
-                        tmp = str(judge_digits.index(val))
-                line += tmp 
-            ret.append(line)
-        return ret
+        codes = decode_judge_cells(self.get_judge_cells(playside))
+        # 各判定、ピカグレー>POORの順
+        return [''.join(_JUDGE_CHARS[c] for c in line) for line in codes.tolist()]
 
     def detect_playside(self) -> play_mode:
-        '''プレイサイド検出を行う'''
-        ret = None
-        for mode in play_mode:
-            det = self.detect_judge(mode)
-            if det[0] == '0':
-                ret = mode
-        return ret
+        '''プレイサイド検出を行う。全play_modeの判定部分をまとめて読み、PGが'0'と読めたもの(複数あれば最後)を返す'''
+        modes = list(play_mode)
+        codes = decode_judge_cells(np.stack([self.get_judge_cells(mode) for mode in modes]))
+        pg = codes[:, 0, :]
+        hit = ((pg == 0).sum(axis=1) == 1) & ((pg == _JUDGE_BLANK).sum(axis=1) == PosPlayJudge.DIGITS - 1)
+        idx = np.flatnonzero(hit)
+        return modes[idx[-1]] if len(idx) else None
+
+    def classify(self) -> tuple:
+        '''画面モードを判定する。is_result→is_select→is_option→is_playの順に呼ぶのと同じ結果を返す。
+
+        Returns:
+            tuple: (detect_mode, play_mode | None)
+        '''
+        return self.classifier.classify(self.screen.np_value)
 
     def is_option(self) -> bool:
         '''オプション設定画面かどうかを判定し、判定結果(True/False)を返す
@@ -405,8 +502,7 @@ class ScreenReader:
             bool: オプション設定画面であればTrue
         '''
         ret = False
-        img = self.screen.original
-        tmp = imagehash.average_hash(img.crop(PosOptionScreen.IS_OPTION_AREA))
+        tmp = imagehash.average_hash(self._crop_for_detect(PosOptionScreen.IS_OPTION_AREA))
         # img.crop(PosOptionScreen.IS_OPTION_AREA).save('hoge.png')
         hash_target = imagehash.hex_to_hash(PosOptionScreen.IS_OPTION_HASH)
         hash_target_dp = imagehash.hex_to_hash(PosOptionScreen.IS_OPTION_HASH_DP)
@@ -420,19 +516,18 @@ class ScreenReader:
             bool: 選曲画面であればTrue
         """
         ret = False
-        img = self.screen.original
 
         hash_target = imagehash.hex_to_hash(PosMusicSelectScreen.HASH_SELECT)
-        img_1p = img.crop(PosMusicSelectScreen.IS_SELECT_1P)
+        img_1p = self._crop_for_detect(PosMusicSelectScreen.IS_SELECT_1P)
         h_1p = imagehash.average_hash(img_1p)
-        img_2p = img.crop(PosMusicSelectScreen.IS_SELECT_2P)
+        img_2p = self._crop_for_detect(PosMusicSelectScreen.IS_SELECT_2P)
         h_2p = imagehash.average_hash(img_2p)
         ret = ((hash_target - h_1p) < 10) or ((hash_target - h_2p) < 10)
         # キーボードプレイの場合
         hash_target = imagehash.hex_to_hash(PosMusicSelectScreen.HASH_SELECT_KB)
-        img_1p = img.crop(PosMusicSelectScreen.IS_SELECT_KB_1P)
+        img_1p = self._crop_for_detect(PosMusicSelectScreen.IS_SELECT_KB_1P)
         h_1p = imagehash.average_hash(img_1p)
-        img_2p = img.crop(PosMusicSelectScreen.IS_SELECT_KB_2P)
+        img_2p = self._crop_for_detect(PosMusicSelectScreen.IS_SELECT_KB_2P)
         h_2p = imagehash.average_hash(img_2p)
         ret |= ((hash_target - h_1p) < 10) or ((hash_target - h_2p) < 10)
         #logger.debug(f"ret = {ret}")
@@ -445,11 +540,10 @@ class ScreenReader:
             bool: Trueならimgがリザルト画面である
         """
         ret = False
-        img = self.screen.original
 
         hash_target = imagehash.hex_to_hash(PosResultScreen.HASH_RESULT)
-        tmpl = imagehash.average_hash(img.crop(PosResultScreen.IS_RESULT_L))
-        tmpr = imagehash.average_hash(img.crop(PosResultScreen.IS_RESULT_R))
+        tmpl = imagehash.average_hash(self._crop_for_detect(PosResultScreen.IS_RESULT_L))
+        tmpr = imagehash.average_hash(self._crop_for_detect(PosResultScreen.IS_RESULT_R))
         ret = ((hash_target - tmpl) < 10) or ((hash_target - tmpr) < 10)
         #logger.debug(f"ret = {ret}")
 
@@ -462,11 +556,10 @@ class ScreenReader:
             play_mode | None: 判定結果。どのモードかも返すようにする。
         """
         ret = None
-        img = self.screen.original
 
         hash_target = imagehash.hex_to_hash(PosIsPlayHash.HASH)
         for mode in play_mode:
-            tmp = imagehash.average_hash(img.crop(PosIsPlay.get(mode)))
+            tmp = imagehash.average_hash(self._crop_for_detect(PosIsPlay.get(mode)))
             judge = (hash_target - tmp) < 10
             # x = img.crop(PosIsPlay.get(mode)).save(f'hoge{mode.value}.png')
             if judge:
@@ -475,8 +568,7 @@ class ScreenReader:
 
     def is_endselect(self):
         """選曲画面の終了時かどうかを判定"""
-        img = self.screen.original
-        tmp = imagehash.average_hash(img.crop(PosMusicSelectScreen.END_SELECT_AREA))
+        tmp = imagehash.average_hash(self._crop_for_detect(PosMusicSelectScreen.END_SELECT_AREA))
         hash_target = imagehash.hex_to_hash(PosMusicSelectScreen.END_SELECT_HASH)
         ret = (hash_target - tmp) < 10
         return ret
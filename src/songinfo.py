@@ -1,16 +1,24 @@
 from .classes import *
 from .funcs import *
 from .logger import get_logger
+from . import file_codec
+from .title_index import TitleIndex
 logger = get_logger(__name__)
-import bz2, pickle
+import hashlib
+import pickle
 import os
+import threading
+import time
 import urllib.request
-from typing import List, Dict
+from typing import Any, Callable, List, Dict, Iterable, Set
 import traceback
 from pathlib import Path
 
 # dbfile = Path('src')/'songinfo.infdc'
 dbfile = Path('.')/'songinfo.infdc'
+cachefile = Path('.')/'songinfo.cache'
+"""songinfo.infdcを展開済みの状態で持つ高速読み込み用キャッシュ。songinfo.infdcが変わると作り直す"""
+CACHE_VERSION = 2
 songinfo_download_url = "https://github.com/dj-kata/inf_daken_counter_obsw/raw/refs/heads/master/songinfo.infdc"
 
 class OneSongInfo:
@@ -121,15 +129,119 @@ class OneSongInfo:
         ret += f", Lv:{self.level}, notes:{self.notes}, version:{self.version}"
         return ret
 
+def _level_key(value):
+    """索引でのレベルの値。数値に直せないものはNone"""
+    try:
+        return int(value) if value is not None and value != '' else None
+    except (TypeError, ValueError):
+        return None
+
+def _katate_key(song) -> int:
+    """譜面のレベル(11/12)に対応する片手難易度帯"""
+    level = _level_key(song.level)
+    if level == 12:
+        return song.katate_12
+    if level == 11:
+        return song.katate_11
+    return None
+
+INDEXED_FIELDS:Dict[str, Callable[[Any], Any]] = {
+    'title':         lambda song: song.title,
+    'play_style':    lambda song: song.play_style,
+    'difficulty':    lambda song: song.difficulty,
+    'level':         lambda song: _level_key(song.level),
+    'version':       lambda song: song.version,
+    'music_pack':    lambda song: song.music_pack,
+    'sp12_hard':     lambda song: song.sp12_hard,
+    'sp12_clear':    lambda song: song.sp12_clear,
+    'sp11_hard':     lambda song: song.sp11_hard,
+    'sp11_clear':    lambda song: song.sp11_clear,
+    'katate':        _katate_key,
+    'dp_unofficial': lambda song: song.dp_unofficial,
+}
+"""SongDatabaseが索引を持つ項目 -> 譜面から索引のキーを取り出す関数"""
+
+class SongQuery:
+    """SongDatabase.query()の検索条件。指定した条件を全て満たす譜面を探す。
+
+    各条件には値(一致)、値のset/list/tuple(いずれかに一致)、キーを受け取ってboolを返す関数
+    (例: dp_unofficial=lambda v: v is not None and 12.0 <= v < 12.5)を指定できる。Noneの条件は無視する。
+    where()や&で条件を追加でき、同じ項目の条件は両方を満たすものになる。
+
+    例: SongQuery(play_style=play_style.sp, level=12).where(sp12_hard={unofficial_difficulty.jiriki_a})
+    """
+    def __init__(self, **conditions):
+        self.conditions:Dict[str, Any] = {}
+        """項目 -> 条件"""
+        self._add(conditions)
+
+    def _add(self, conditions:dict):
+        for field, cond in conditions.items():
+            if field not in INDEXED_FIELDS:
+                raise ValueError(f'not an indexed field: {field}')
+            if cond is None:
+                continue
+            if isinstance(cond, (list, tuple)):
+                cond = frozenset(cond)
+            if field in self.conditions:
+                first = self.conditions[field]
+                cond = (lambda a, b: lambda key: SongQuery.match(a, key) and SongQuery.match(b, key))(first, cond)
+            self.conditions[field] = cond
+
+    def where(self, **conditions) -> 'SongQuery':
+        """条件を追加した新しいSongQueryを返す"""
+        ret = SongQuery()
+        ret.conditions = dict(self.conditions)
+        ret._add(conditions)
+        return ret
+
+    def __and__(self, other:'SongQuery') -> 'SongQuery':
+        return self.where(**other.conditions)
+
+    @staticmethod
+    def match(cond, key) -> bool:
+        """索引のキーが条件を満たすかどうか"""
+        if callable(cond):
+            return bool(cond(key))
+        if isinstance(cond, (set, frozenset)):
+            return key in cond
+        return key == cond
+
+    def __repr__(self):
+        return f'SongQuery({self.conditions})'
+
 class SongDatabase:
-    """全曲の情報を保持するクラス。検索もできる。"""
-    def __init__(self):
+    """全曲の情報を保持するクラス。検索もできる。
+
+    アプリ内ではget_song_database()で取得した1つのインスタンスを共有する。
+    読み込みのみで、曲情報を書き換えるツール(misc/update_db.pyなど)以外はsave()しない。
+    """
+    def __init__(self, use_cache:bool=False):
         self.songs:Dict[str, OneSongInfo] = {}
         """曲情報(OneSongInfo)を格納するリスト.keyはchart_idとする。"""
         self.lookup_keys:Dict[tuple, str] = {}
         """軽微な表記差を吸収する検索用キーからchart_idへの索引。"""
+        self.indexes:Dict[str, Dict[Any, Set[str]]] = {field: {} for field in INDEXED_FIELDS}
+        """項目(INDEXED_FIELDS) -> その項目の値 -> chart_idのset。query()で使う"""
+        self._indexed_keys:Dict[str, tuple] = {}
+        """chart_id -> 索引に登録したキー(INDEXED_FIELDSの順)。add()で書き換えられた譜面を索引から外すのに使う"""
+        self._order:Dict[str, int] = {}
+        """chart_id -> songsでの並び順"""
+        self.generation = 0
+        """曲情報が変わるたびに1増える"""
+        self.fuzzy_threshold = 0.85
+        """search_fuzzy()で曲名の読み違いとみなす確からしさの下限(0.0〜1.0)。1より大きければあいまい検索をしない"""
+        self._title_index:TitleIndex = None
+        self._title_index_generation = None
+        self._fuzzy_cache:Dict[str, list] = {}
+        """曲名 -> あいまい検索の候補(曲名, 確からしさ)のlist"""
+        self.use_cache = use_cache
+        """songinfo.cacheから読み込むかどうか"""
+        self._signature = None
+        """読み込んだsonginfo.infdcの(サイズ, 更新日時)。変わっていなければload()で読み直さない"""
+        self.last_load_ms = 0.0
+        """直近の読み込みの所要時間(ms)"""
         self.load()
-        self.save()
 
     def _rebuild_lookup_keys(self):
         """songinfo更新前のログ表記でも現在のsonginfoを引けるように索引を作る。"""
@@ -158,19 +270,112 @@ class SongDatabase:
         return ret
     
     def filter(self, title:str=None, play_style:play_style=None, difficulty:difficulty=None, level:int=None) -> List[OneSongInfo]:
-        '''条件に合う曲情報を検索し、結果をリストで返す'''
-        ret:List[OneSongInfo] = []
-        for v in self.songs.values():
-            if title and v.title != title:
-                continue
-            if play_style and v.play_style != play_style:
-                continue
-            if difficulty and v.difficulty != difficulty:
-                continue
-            if level and v.level and level != v.level:
-                continue
-            ret.append(v)
-        return ret
+        '''条件に合う曲情報を検索し、結果をリストで返す(レベル不明の譜面はlevelによらず含む)'''
+        return self.query(
+            title=title or None,
+            play_style=play_style or None,
+            difficulty=difficulty or None,
+            level=(lambda v: not v or v == level) if level else None,
+        )
+
+    def _get_title_index(self) -> TitleIndex:
+        """曲名のあいまい検索用の索引。曲情報が変わっていれば作り直す"""
+        if self._title_index is None or self._title_index_generation != self.generation:
+            self._title_index = TitleIndex(song.title for song in self.songs.values())
+            self._title_index_generation = self.generation
+            self._fuzzy_cache = {}
+        return self._title_index
+
+    def fuzzy_title(self, title:str) -> tuple:
+        """最も近い登録済みの曲名と確からしさ(0.0〜1.0)を返す。候補が無ければ(None, 0.0)"""
+        return self._get_title_index().best(title)
+
+    def search_fuzzy(self, title:str, play_style:play_style, difficulty:difficulty, threshold:float=None) -> tuple:
+        """search()で見つからない曲名を、あいまい検索で近い曲名に読み替えて探す。
+
+        確からしさがthreshold(省略時はfuzzy_threshold)以上の曲名のうち、指定の譜面があるものを返す。
+
+        Returns:
+            OneSongInfo: 見つかった曲情報。見つからなければNone
+            float: 確からしさ。search()で見つかった場合は1.0
+        """
+        songinfo = self.search(title=title, play_style=play_style, difficulty=difficulty)
+        if songinfo is not None:
+            return songinfo, 1.0
+        threshold = self.fuzzy_threshold if threshold is None else threshold
+        if not title or play_style is None or difficulty is None or threshold > 1.0:
+            return None, 0.0
+        index = self._get_title_index()
+        candidates = self._fuzzy_cache.get(title)
+        if candidates is None: # 同じ曲名の別譜面でも使うため曲名ごとに覚えておく
+            candidates = index.candidates(title)
+            if len(self._fuzzy_cache) >= 4096:
+                self._fuzzy_cache = {}
+            self._fuzzy_cache[title] = candidates
+        for candidate, confidence in candidates:
+            if confidence < threshold:
+                break
+            songinfo = self.search(title=candidate, play_style=play_style, difficulty=difficulty)
+            if songinfo is not None:
+                return songinfo, confidence
+        return None, 0.0
+
+    def query(self, query:SongQuery=None, **conditions) -> List[OneSongInfo]:
+        """索引を使って条件(SongQuery、またはその引数と同じキーワード引数)に合う譜面をsongsの並び順で返す。
+
+        各条件に合うchart_idのsetを索引から引き、小さいものから順に積集合を取る。
+        """
+        query = (query or SongQuery()).where(**conditions)
+        if not query.conditions:
+            return list(self.songs.values())
+        matched = []
+        for field, cond in query.conditions.items():
+            index = self.indexes[field]
+            if callable(cond): # 関数の条件は索引のキーごとに判定する
+                ids = set().union(*(ids for key, ids in index.items() if cond(key)))
+            elif isinstance(cond, (set, frozenset)):
+                ids = set().union(*(index.get(key, ()) for key in cond))
+            else:
+                ids = index.get(cond, set())
+            if not ids:
+                return []
+            matched.append(ids)
+        matched.sort(key=len)
+        candidates = matched[0]
+        for ids in matched[1:]:
+            candidates = candidates & ids
+        if len(candidates) * 8 > len(self.songs): # 大半が該当する場合は並べ替えるより順に辿る方が速い
+            return [song for chart_id, song in self.songs.items() if chart_id in candidates]
+        return [self.songs[chart_id] for chart_id in sorted(candidates, key=self._order.__getitem__)]
+
+    def _index_song(self, chart_id:str, song:OneSongInfo):
+        self._unindex_song(chart_id)
+        keys = tuple(func(song) for func in INDEXED_FIELDS.values())
+        for field, key in zip(INDEXED_FIELDS, keys):
+            self.indexes[field].setdefault(key, set()).add(chart_id)
+        self._indexed_keys[chart_id] = keys
+        if chart_id not in self._order:
+            self._order[chart_id] = len(self._order)
+
+    def _unindex_song(self, chart_id:str):
+        keys = self._indexed_keys.pop(chart_id, None)
+        if keys is None:
+            return
+        for field, key in zip(INDEXED_FIELDS, keys):
+            ids = self.indexes[field].get(key)
+            if ids is not None:
+                ids.discard(chart_id)
+                if not ids:
+                    del self.indexes[field][key]
+
+    def rebuild_indexes(self):
+        """query()用の索引を作り直す。songsの譜面の項目を直接書き換えた場合に呼ぶ(add()し直してもよい)"""
+        self.indexes = {field: {} for field in INDEXED_FIELDS}
+        self._indexed_keys = {}
+        self._order = {}
+        for chart_id, song in self.songs.items():
+            self._index_song(chart_id, song)
+        self.generation += 1
 
 
     def add(self, songinfo:OneSongInfo):
@@ -179,20 +384,78 @@ class SongDatabase:
         lookup_key = calc_chart_lookup_key(songinfo.title, songinfo.play_style, songinfo.difficulty)
         if lookup_key:
             self.lookup_keys[lookup_key] = songinfo.chart_id
+        self._index_song(songinfo.chart_id, songinfo) # 書き換え済みの譜面を渡された場合も索引を直す
+        self.generation += 1
+
+    @staticmethod
+    def _file_signature():
+        st = os.stat(dbfile)
+        return (st.st_size, st.st_mtime_ns)
 
-    def load(self):
-        """pklファイルから曲情報を読み出す"""
+    @staticmethod
+    def _file_hash() -> str:
+        with open(dbfile, 'rb') as f:
+            return hashlib.sha256(f.read()).hexdigest()
+
+    def load(self, force:bool=False):
+        """pklファイルから曲情報を読み出す。前回の読み込みからsonginfo.infdcが変わっていなければ何もしない"""
         try:
-            with bz2.BZ2File(dbfile, 'rb', compresslevel=9) as f:
-                self.songs = pickle.load(f)
-            self._rebuild_lookup_keys()
+            signature = self._file_signature()
+            if not force and signature == self._signature:
+                return
+            started = time.perf_counter()
+            if not (self.use_cache and self._load_cache(signature)):
+                with file_codec.open_read(dbfile) as f:
+                    self.songs = pickle.load(f)
+                self._rebuild_lookup_keys()
+                self.rebuild_indexes()
+                if self.use_cache:
+                    self._save_cache(signature)
+            self._signature = signature
+            self.last_load_ms = (time.perf_counter() - started) * 1000
+            logger.debug(f"songinfo loaded: {len(self.songs)} charts, {self.last_load_ms:.0f}ms")
+        except Exception:
+            logger.error(traceback.format_exc())
+
+    def _load_cache(self, signature) -> bool:
+        """songinfo.cacheがsonginfo.infdcと一致していれば読み込む。
+        更新日時だけが変わった場合は内容のハッシュで確認する。
+        """
+        if not cachefile.exists():
+            return False
+        try:
+            with file_codec.open_read(cachefile) as f:
+                header = pickle.load(f)
+                if header.get('version') != CACHE_VERSION:
+                    return False
+                if header.get('signature') != signature and header.get('hash') != self._file_hash():
+                    return False
+                self.songs, self.lookup_keys, self.indexes, self._indexed_keys, self._order = pickle.load(f)
+                self.generation += 1
+            if header.get('signature') != signature: # 内容は同じなので更新日時だけ書き直す
+                self._save_cache(signature, header['hash'])
+            return True
+        except Exception:
+            logger.debug(traceback.format_exc())
+            return False
+
+    def _save_cache(self, signature, file_hash:str=None):
+        """展開済みの曲情報と索引をsonginfo.cacheに書き出す(無圧縮)"""
+        try:
+            header = {'version': CACHE_VERSION, 'signature': signature, 'hash': file_hash or self._file_hash()}
+            with file_codec.write_file(str(cachefile), 'none') as f:
+                pickle.dump(header, f, protocol=pickle.HIGHEST_PROTOCOL)
+                pickle.dump((self.songs, self.lookup_keys, self.indexes, self._indexed_keys, self._order), f, protocol=pickle.HIGHEST_PROTOCOL)
         except Exception:
             logger.error(traceback.format_exc())
 
     def save(self):
         """曲情報をpklへ書き出す"""
-        with bz2.BZ2File(dbfile, 'wb', compresslevel=9) as f:
+        with file_codec.write_file(str(dbfile)) as f:
             pickle.dump(self.songs, f)
+        self._signature = self._file_signature()
+        if self.use_cache:
+            self._save_cache(self._signature)
 
     def __str__(self):
         '''全データを表示'''
@@ -202,6 +465,25 @@ class SongDatabase:
         return ret
 
 
+_shared_database:SongDatabase = None
+_shared_lock = threading.Lock()
+
+def get_song_database(use_cache:bool=None) -> SongDatabase:
+    """プロセス内で共有する曲情報DBを返す。初回の呼び出しで読み込む。
+
+    Args:
+        use_cache (bool, optional): songinfo.cacheを使うかどうか。Noneなら変更しない(初回はFalse)
+    """
+    global _shared_database
+    with _shared_lock:
+        if _shared_database is None:
+            _shared_database = SongDatabase(use_cache=bool(use_cache))
+        elif use_cache is not None and use_cache != _shared_database.use_cache:
+            _shared_database.use_cache = use_cache
+            if use_cache and _shared_database._signature:
+                _shared_database._save_cache(_shared_database._signature)
+        return _shared_database
+
 def download_latest_songinfo(url: str = songinfo_download_url, dst: Path = dbfile) -> int:
     """最新のsonginfo.infdcをダウンロードし、検証できた場合だけ差し替える"""
     dst = Path(dst)
@@ -216,7 +498,7 @@ def download_latest_songinfo(url: str = songinfo_download_url, dst: Path = dbfil
                         break
                     f.write(chunk)
 
-        with bz2.BZ2File(tmp, "rb", compresslevel=9) as f:
+        with file_codec.open_read(tmp) as f:
             songs = pickle.load(f)
 
         if not isinstance(songs, dict) or not songs:
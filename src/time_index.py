@@ -0,0 +1,69 @@
+"""リザルトの日時順の索引。
+
+ResultDatabase.resultsは登録順のため、画像からの取り込みや選曲画面からの登録(timestampが0)があると日時順にならない。
+resultsの並びはそのまま(ジャーナル・SQLiteの位置と一致させるため)にして、
+日時順に並べた位置のリストを別に持ち、bisectで日時の範囲に含まれるリザルトの位置を引く。
+"""
+
+from bisect import bisect_left, bisect_right
+from typing import List, Optional
+
+
+def time_key(result) -> float:
+    """索引での並び順に使う日時。日時が無いもの(0, None)は0"""
+    return float(result.timestamp or 0)
+
+
+class TimeIndex:
+    """resultsでの位置を日時順(同時刻なら位置順)に並べた索引"""
+    def __init__(self):
+        self._keys: List[float] = []
+        '''日時順に並べた日時'''
+        self._positions: List[int] = []
+        '''_keysと同じ並びの、resultsでの位置'''
+        self._key_of: List[float] = []
+        '''resultsでの位置 -> 索引に登録した日時'''
+        self.synced = False
+        '''索引がresultsと一致しているかどうか。Falseなら次の参照時に作り直す'''
+
+    def rebuild(self, results: list):
+        """resultsから作り直す"""
+        self._key_of = [time_key(r) for r in results]
+        self._positions = sorted(range(len(results)), key=self._key_of.__getitem__)
+        self._keys = [self._key_of[i] for i in self._positions]
+        self.synced = True
+
+    def append(self, result):
+        """resultsの末尾に追加したresultを登録する"""
+        key = time_key(result)
+        i = bisect_right(self._keys, key) # 同時刻のものより後ろ(位置順)に入れる
+        self._keys.insert(i, key)
+        self._positions.insert(i, len(self._key_of))
+        self._key_of.append(key)
+
+    def update(self, idx: int, result):
+        """results[idx]の日時が書き換えられていれば並び順を直す"""
+        old = self._key_of[idx]
+        key = time_key(result)
+        if key == old:
+            return
+        i = bisect_left(self._keys, old)
+        while self._positions[i] != idx:
+            i += 1
+        del self._keys[i]
+        del self._positions[i]
+        # 同時刻のものの中では位置順を保つ
+        lo, hi = bisect_left(self._keys, key), bisect_right(self._keys, key)
+        i = lo + bisect_left(self._positions[lo:hi], idx)
+        self._keys.insert(i, key)
+        self._positions.insert(i, idx)
+        self._key_of[idx] = key
+
+    def between(self, t0: Optional[float] = None, t1: Optional[float] = None) -> List[int]:
+        """t0 <= 日時 < t1 のリザルトの位置(日時の古い順)。Noneの側は範囲の制限なし"""
+        lo = 0 if t0 is None else bisect_left(self._keys, t0)
+        hi = len(self._keys) if t1 is None else bisect_left(self._keys, t1)
+        return self._positions[lo:hi]
+
+    def __len__(self):
+        return len(self._positions)
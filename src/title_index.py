@@ -0,0 +1,102 @@
+"""曲名のあいまい検索用の文字n-gram索引。
+
+選曲画面の曲名認識は1〜2文字誤ることがあり、そのままではsonginfoが引けない。
+全曲名を正規化して文字bigramの転置索引を作り、bigramの共通数(Dice係数)で候補を絞ってから
+編集距離で確からしさ(0.0〜1.0)を計算し、最も近い曲名を返す。
+"""
+
+import heapq
+import unicodedata
+from collections import Counter
+from typing import Dict, Iterable, List, Tuple
+
+from src.funcs import normalize_song_title_for_lookup
+
+NGRAM = 2
+CANDIDATES = 8
+'''編集距離を計算する候補数(bigramの共通数の多い順)'''
+
+
+def normalize_title(title: str) -> str:
+    """索引での曲名。空白・☆★を除き、全角半角・大文字小文字の差を無くす"""
+    return unicodedata.normalize('NFKC', normalize_song_title_for_lookup(title or '')).casefold()
+
+
+def ngrams(text: str) -> List[str]:
+    """前後に区切りを付けた文字bigram(1文字の曲名でも1つ以上できる)"""
+    padded = f'\x02{text}\x03'
+    return [padded[i:i + NGRAM] for i in range(len(padded) - NGRAM + 1)]
+
+
+def similarity(a: str, b: str) -> float:
+    """編集距離(レーベンシュタイン距離)を長い方の長さで割って1から引いたもの"""
+    if a == b:
+        return 1.0
+    if not a or not b:
+        return 0.0
+    if len(a) < len(b):
+        a, b = b, a
+    prev = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        cur = [i]
+        for j, cb in enumerate(b, 1):
+            cur.append(min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (ca != cb)))
+        prev = cur
+    return 1.0 - prev[-1] / len(a)
+
+
+class TitleIndex:
+    """曲名の集合に対するあいまい検索"""
+    def __init__(self, titles: Iterable[str] = ()):
+        self.titles: List[str] = []
+        '''登録した曲名(元の表記)'''
+        self._normalized: List[str] = []
+        self._gram_counts: List[int] = []
+        self._postings: Dict[str, List[int]] = {}
+        '''bigram -> それを含む曲名の番号'''
+        self._exact: Dict[str, int] = {}
+        '''正規化した曲名 -> 番号'''
+        for title in titles:
+            self.add(title)
+
+    def add(self, title: str):
+        """曲名を登録する(正規化して同じになるものは最初の1つだけ)"""
+        norm = normalize_title(title)
+        if not norm or norm in self._exact:
+            return
+        idx = len(self.titles)
+        self.titles.append(title)
+        self._normalized.append(norm)
+        self._exact[norm] = idx
+        grams = set(ngrams(norm))
+        self._gram_counts.append(len(grams))
+        for gram in grams:
+            self._postings.setdefault(gram, []).append(idx)
+
+    def __len__(self):
+        return len(self.titles)
+
+    def candidates(self, title: str, limit: int = 5) -> List[Tuple[str, float]]:
+        """titleに近い曲名を(曲名, 確からしさ)の確からしさの高い順で返す"""
+        norm = normalize_title(title)
+        if not norm:
+            return []
+        if norm in self._exact:
+            return [(self.titles[self._exact[norm]], 1.0)]
+        grams = set(ngrams(norm))
+        shared = Counter()
+        for gram in grams:
+            shared.update(self._postings.get(gram, ()))
+        # Dice係数で候補を絞る
+        dice = heapq.nlargest(
+            max(CANDIDATES, limit), shared.items(),
+            key=lambda item: 2 * item[1] / (len(grams) + self._gram_counts[item[0]]),
+        )
+        scored = [(self.titles[idx], similarity(norm, self._normalized[idx])) for idx, _ in dice]
+        scored.sort(key=lambda item: -item[1])
+        return scored[:limit]
+
+    def best(self, title: str) -> Tuple[str, float]:
+        """最も近い曲名と確からしさ。候補が無ければ(None, 0.0)"""
+        found = self.candidates(title, 1)
+        return found[0] if found else (None, 0.0)
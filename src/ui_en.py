@@ -71,6 +71,8 @@ class UIText:
         capture_method_obs = 'via OBS WebSocket'
         direct_capture_all_monitors = 'Always capture all monitors without auto-detection'
         direct_capture_all_monitors_tip = 'When off, all monitors are used automatically only if the target window needs them.'
+        obs_capture_in_memory = 'Get screenshots from OBS without writing image files'
+        obs_capture_in_memory_tip = 'Falls back to capturing via image files if this fails.'
         tweet_group = 'Tweet Function'
         enable_autotweet = 'Enable auto-tweet on exit'
         enable_judge = 'Include judge data'
@@ -83,6 +85,8 @@ class UIText:
         websocket_port = 'Data display port:'
         mobile_score_server_enabled = 'Start mobile score viewer server'
         mobile_score_server_port = 'Mobile HTTP port:'
+        songinfo_cache = 'Cache the decompressed song database for faster startup'
+        songinfo_cache_tip = 'Creates songinfo.cache. It is rebuilt when songinfo.infdc is updated.'
         keep_on_top = 'Always on Top'
     
     class music_pack:
@@ -126,6 +130,19 @@ class UIText:
         from_pkl_description = 'Select alllog.pkl file saved by inf_daken_counter v2'
         from_pkl_dialog_description = 'Select alllog.pkl'
         include_legacy_v2_logs = 'Include logs from v2 or earlier in stats'
+
+        playlog_group = 'Play Log Storage'
+        playlog_restart_note = 'Changes take effect after restarting'
+        playlog_backend = 'Format:'
+        playlog_backend_pickle = 'playlog.infdc'
+        playlog_backend_sqlite = 'SQLite'
+        playlog_backend_segments = 'Split by month'
+        playlog_journal = 'Save only added or changed results by appending them'
+        playlog_journal_tip = 'When off, playlog.infdc is fully rewritten on every save.'
+        playlog_recent_months = 'Months to load at startup:'
+        playlog_recent_months_tip = 'Older months are loaded when they are needed.'
+        file_codec = 'Compression:'
+        file_codec_tip = 'Compression of saved files such as playlog.infdc. The format is detected automatically when loading.'
         
         cancel_button = 'Cancel'
         processing = 'Processing...'
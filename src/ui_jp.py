@@ -71,6 +71,8 @@ class UIText:
         capture_method_obs = 'OBS WebSocket経由'
         direct_capture_all_monitors = '自動判定せずに常に全モニターを対象にする'
         direct_capture_all_monitors_tip = 'OFFの場合は、対象ウィンドウの位置から必要なときだけ自動で全モニターを対象にします。'
+        obs_capture_in_memory = 'OBSから画像ファイルを介さずに取得する'
+        obs_capture_in_memory_tip = '失敗した場合は自動でファイル経由の取得に戻します。'
         tweet_group = 'ツイート機能'
         enable_autotweet = '終了時の自動ツイートを有効にする'
         enable_judge = '判定部分を含める'
@@ -83,6 +85,8 @@ class UIText:
         websocket_port = 'データ表示用port:'
         mobile_score_server_enabled = 'スマホ用スコア閲覧サーバを起動する'
         mobile_score_server_port = 'スマホ用HTTP port:'
+        songinfo_cache = '曲情報を展開済みの状態で保存し、起動を速くする'
+        songinfo_cache_tip = 'songinfo.cacheを作成します。songinfo.infdcが更新されると作り直します。'
         keep_on_top = '常に最前面表示する'
     
     class music_pack:
@@ -126,6 +130,19 @@ class UIText:
         from_pkl_description = 'v2で出力したalllog.pklからプレーログを登録します'
         from_pkl_dialog_description = 'alllog.pklを選択してください'
         include_legacy_v2_logs = 'v2以前のログを集計対象とする'
+
+        playlog_group = 'プレーログの保存'
+        playlog_restart_note = '変更は次回起動時に反映されます'
+        playlog_backend = '保存形式:'
+        playlog_backend_pickle = 'playlog.infdc'
+        playlog_backend_sqlite = 'SQLite'
+        playlog_backend_segments = '月ごとに分割'
+        playlog_journal = '追加・変更分だけを追記して保存する'
+        playlog_journal_tip = 'OFFの場合は保存のたびにplaylog.infdcを全件書き出します。'
+        playlog_recent_months = '起動時に読み込む月数:'
+        playlog_recent_months_tip = 'これより古い月のプレーログは必要になった時点で読み込みます。'
+        file_codec = '圧縮形式:'
+        file_codec_tip = 'playlog.infdcなどの保存ファイルの圧縮形式。読み込み時は形式を自動で判別します。'
         
         cancel_button = 'キャンセル'
         processing = '処理中...'